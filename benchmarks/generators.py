@@ -0,0 +1,148 @@
+"""Generate synthetic projects and runtimes to benchmark against.
+"""
+
+__all__ = ["generate_project", "generate_runtimes"]
+
+import hashlib
+import itertools
+import os
+import pathlib
+import sys
+import typing
+
+
+_SETUP_PY = """\
+from setuptools import Extension, find_packages, setup
+
+setup(
+    name={name!r},
+    version="0.1",
+    package_dir={{"": "src"}},
+    packages=find_packages("src"),
+    ext_modules={ext_modules},
+)
+"""
+
+_EXT_MODULES = '[Extension("{package}._speedups", ["native/speedups.c"])]'
+
+_SPEEDUPS_C = """\
+#include <Python.h>
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "_speedups", NULL, -1, NULL
+};
+
+PyMODINIT_FUNC PyInit__speedups(void) { return PyModule_Create(&module); }
+"""
+
+_MODULE = """\
+import os
+
+
+def function_{index}(value):
+    return os.fspath(value) * {index}
+"""
+
+
+def _iter_package_dirs(
+    base: pathlib.Path, depth: int, fanout: int
+) -> typing.Iterator[pathlib.Path]:
+    """Iterate through packages, breadth-first, forever.
+
+    Packages are nested up to depth levels under base. Each package has
+    fanout subpackages.
+    """
+    level = [base]
+    for _ in range(depth - 1):
+        level = [
+            parent.joinpath("sub{}".format(i))
+            for parent in level
+            for i in range(fanout)
+        ]
+    while True:
+        yield from level
+
+
+def generate_project(
+    root: pathlib.Path,
+    modules: int,
+    *,
+    depth: int = 1,
+    fanout: int = 4,
+    extension: bool = False,
+) -> pathlib.Path:
+    """Generate a project with given number of modules.
+
+    Modules are spread evenly across packages nested depth levels deep. If
+    extension is true, the project also contains a C extension.
+
+    Returns the project root.
+    """
+    name = "synthetic_{}".format(modules)
+    package = root.joinpath("src", name)
+    root.mkdir(parents=True, exist_ok=True)
+    root.joinpath("pyproject.toml").write_text(
+        '[build-system]\nrequires = ["setuptools", "wheel"]\n'
+    )
+    if extension:
+        root.joinpath("native").mkdir(exist_ok=True)
+        root.joinpath("native", "speedups.c").write_text(_SPEEDUPS_C)
+        ext_modules = _EXT_MODULES.format(package=name)
+    else:
+        ext_modules = "[]"
+    root.joinpath("setup.py").write_text(
+        _SETUP_PY.format(name=name, ext_modules=ext_modules)
+    )
+
+    directories = _iter_package_dirs(package, depth, fanout)
+    for index, directory in zip(range(modules), directories):
+        if not directory.is_dir():
+            directory.mkdir(parents=True)
+            # Make every level a package.
+            for parent in itertools.chain([directory], directory.parents):
+                if parent == package.parent:
+                    break
+                parent.joinpath("__init__.py").touch()
+        module = directory.joinpath("module_{}.py".format(index))
+        module.write_text(_MODULE.format(index=index))
+    return root
+
+
+_IMPLEMENTATIONS = ["cpython", "pypy"]
+
+_MACHINES = ["x86_64", "aarch64", "i686"]
+
+
+def generate_runtimes(
+    project_root: pathlib.Path, count: int
+) -> typing.List[str]:
+    """Generate runtimes in a project without creating real venvs.
+
+    Each runtime is a minimal venv-like directory, with its interpreter
+    linked to the current one. Names are unique and vary in implementation,
+    version, and machine, like a project tested against many interpreters.
+
+    Returns names of the generated runtimes.
+    """
+    container = project_root.joinpath(".venvs")
+    names = []
+    for serial in range(count):
+        implementation = _IMPLEMENTATIONS[serial % len(_IMPLEMENTATIONS)]
+        minor = serial // len(_IMPLEMENTATIONS) % 30
+        machine = _MACHINES[serial // (len(_IMPLEMENTATIONS) * 30) % 3]
+        digest = hashlib.sha256(str(serial).encode("ascii")).hexdigest()[:8]
+        name = "{}-3.{}-{}-{}-{}".format(
+            implementation, minor, sys.platform, machine, digest
+        )
+        runtime = container.joinpath(name)
+        bin_dir = runtime.joinpath("bin")
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        runtime.joinpath(
+            "lib", "python3.{}".format(minor), "site-packages"
+        ).mkdir(parents=True, exist_ok=True)
+        runtime.joinpath("pyvenv.cfg").write_text("include-system = false\n")
+        python = bin_dir.joinpath("python")
+        if not python.exists():
+            os.symlink(sys.executable, str(python))
+        names.append(name)
+    return names
@@ -0,0 +1,383 @@
+"""Benchmark pypro against synthetic projects.
+
+Usage::
+
+    python benchmarks/run.py [--sizes 10,1000,50000] [--output FILE]
+    python benchmarks/run.py --compare OLD NEW
+
+Everything is generated in a temporary directory, and pypro's cache is
+redirected there too, so the user's cache is never touched. Results are
+written as JSON, with one record per benchmark and parameter set, holding
+the time (in seconds) of each repetition.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(ROOT.joinpath("src")))
+
+from generators import generate_project, generate_runtimes  # noqa: E402
+
+
+_Result = typing.Dict[str, typing.Any]
+
+
+def _measure(
+    func: typing.Callable[[], typing.Any],
+    repeat: int,
+    setup: typing.Optional[typing.Callable[[], typing.Any]] = None,
+) -> typing.List[float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _record(name: str, params: dict, times: typing.List[float]) -> _Result:
+    result = {
+        "benchmark": name,
+        "params": params,
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+    }
+    line = "{:<36} {:<32} min {:>9.4f}s  median {:>9.4f}s".format(
+        name,
+        json.dumps(params, sort_keys=True),
+        result["min"],
+        result["median"],
+    )
+    print(line, file=sys.stderr)
+    return result
+
+
+def bench_discover(
+    workdir: pathlib.Path, repeat: int
+) -> typing.List[_Result]:
+    from pypro.projects import Project
+
+    results = []
+    for depth in [1, 8, 32]:
+        root = workdir.joinpath("discover-{}".format(depth))
+        generate_project(root, 1)
+        start = root.joinpath(*["d{}".format(i) for i in range(depth)])
+        start.mkdir(parents=True, exist_ok=True)
+        times = _measure(lambda: Project.discover(start), repeat)
+        results.append(_record("Project.discover", {"depth": depth}, times))
+    return results
+
+
+def bench_find_runtime(
+    workdir: pathlib.Path, repeat: int
+) -> typing.List[_Result]:
+    from pypro.projects import Project
+
+    results = []
+    for count in [1, 100, 1000]:
+        root = workdir.joinpath("runtimes-{}".format(count))
+        generate_project(root, 1)
+        names = generate_runtimes(root, count)
+        alias = names[-1]
+        state = root.joinpath(".venvs", ".pypro", "state.db")
+
+        def find():
+            Project(root=root).find_runtime(alias)
+
+        def forget():
+            if state.exists():
+                state.unlink()
+
+        params = {"runtimes": count}
+        times = _measure(find, repeat, setup=forget)
+        results.append(_record("find_runtime (cold)", params, times))
+        times = _measure(find, repeat)
+        results.append(_record("find_runtime (warm)", params, times))
+    return results
+
+
+def bench_quintuplet(python: str, repeat: int) -> typing.List[_Result]:
+    from pypro import interpreters
+    from pypro.projects._envs import get_interpreter_quintuplet
+
+    def forget_memo():
+        interpreters._memo.clear()
+
+    def forget_all():
+        forget_memo()
+        path = interpreters._get_cache_path()
+        if path.exists():
+            path.unlink()
+
+    def get():
+        get_interpreter_quintuplet(python)
+
+    return [
+        _record(
+            "get_interpreter_quintuplet (probe)",
+            {},
+            _measure(get, repeat, setup=forget_all),
+        ),
+        _record(
+            "get_interpreter_quintuplet (disk)",
+            {},
+            _measure(get, repeat, setup=forget_memo),
+        ),
+        _record(
+            "get_interpreter_quintuplet (memo)", {}, _measure(get, repeat)
+        ),
+    ]
+
+
+def bench_virtenv(
+    workdir: pathlib.Path, python: str, repeat: int
+) -> typing.List[_Result]:
+    from pypro import _virtenv
+
+    env_dir = workdir.joinpath("virtenv")
+
+    def clean():
+        shutil.rmtree(str(env_dir), ignore_errors=True)
+
+    results = []
+    for bare in [True, False]:
+
+        def create():
+            _virtenv.create(
+                python=python,
+                env_dir=env_dir,
+                system=False,
+                prompt=None,
+                bare=bare,
+            )
+
+        times = _measure(create, repeat, setup=clean)
+        results.append(_record("_virtenv.create", {"bare": bare}, times))
+    clean()
+    return results
+
+
+def _create_project(
+    workdir: pathlib.Path, python: str, modules: int, depth: int
+) -> typing.Tuple[typing.Any, typing.Any]:
+    from pypro.projects import Project
+
+    root = workdir.joinpath("project-{}-{}".format(modules, depth))
+    generate_project(root, modules, depth=depth, extension=True)
+    project = Project(root=root)
+    runtime = project.create_runtime(python)
+    project.activate_runtime(runtime)
+    return project, runtime
+
+
+def bench_pipeline(
+    workdir: pathlib.Path,
+    python: str,
+    sizes: typing.List[int],
+    depth: int,
+    repeat: int,
+) -> typing.List[_Result]:
+    from pypro.actions import builds
+    from pypro.cli.ready import ready_runtime
+
+    results = []
+    for modules in sizes:
+        project, runtime = _create_project(workdir, python, modules, depth)
+        params = {"modules": modules, "depth": depth}
+        build = builds.get_build(project, runtime)
+
+        def forget_hooks():
+            if build.hook_index.exists():
+                build.hook_index.unlink()
+
+        def forget_all():
+            builds._close_workers()
+            forget_hooks()
+
+        def start_worker():
+            # Start a hook worker, so calls are measured on their own.
+            forget_all()
+            builds.build_py(project, build)
+
+        def call_noop():
+            builds._call_api(build.env.python, "os:getpid", {}, project.root)
+
+        def collect():
+            builds.build_py(project, build)
+
+        times = _measure(collect, min(repeat, 3), setup=forget_all)
+        results.append(_record("build_py (new worker)", params, times))
+        start_worker()
+        times = _measure(collect, repeat, setup=forget_hooks)
+        results.append(_record("build_py (warm)", params, times))
+        results.append(
+            _record("build_py (memoized)", params, _measure(collect, repeat))
+        )
+        results.append(
+            _record("_call_api (no-op)", params, _measure(call_noop, repeat))
+        )
+
+        def ready():
+            ready_runtime(project, runtime)
+
+        def reset():
+            # Keep the build env, but remove everything built with it.
+            builds._close_workers()
+            shutil.rmtree(str(build.root_for_build_ext), ignore_errors=True)
+            paths = [
+                build.hook_index,
+                build.trigger_index,
+                runtime.root.joinpath("pypro-installed.csv"),
+                runtime.root.joinpath("pypro-synced.json"),
+            ]
+            for path in paths:
+                if path.exists():
+                    path.unlink()
+
+        times = _measure(ready, min(repeat, 3), setup=reset)
+        results.append(_record("ready (cold)", params, times))
+        times = _measure(ready, repeat)
+        results.append(_record("ready (warm)", params, times))
+        builds._close_workers()
+    return results
+
+
+def _get_revision() -> typing.Optional[str]:
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=str(ROOT),
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode("ascii").strip()
+
+
+def run(options) -> dict:
+    workdir = pathlib.Path(tempfile.mkdtemp(prefix="pypro-bench-"))
+    os.environ["PYPRO_CACHE_DIR"] = str(workdir.joinpath("cache"))
+    try:
+        results = []
+        results.extend(bench_discover(workdir, options.repeat))
+        results.extend(bench_find_runtime(workdir, options.repeat))
+        results.extend(bench_quintuplet(options.python, options.repeat))
+        results.extend(bench_virtenv(workdir, options.python, 3))
+        results.extend(
+            bench_pipeline(
+                workdir,
+                options.python,
+                options.sizes,
+                options.depth,
+                options.repeat,
+            )
+        )
+    finally:
+        if options.keep:
+            print("Kept files in {}".format(workdir), file=sys.stderr)
+        else:
+            shutil.rmtree(str(workdir), ignore_errors=True)
+    return {
+        "revision": _get_revision(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old_path: str, new_path: str):
+    """Print the change of median time of benchmarks in both runs.
+    """
+
+    def load(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {
+            (r["benchmark"], json.dumps(r["params"], sort_keys=True)): r
+            for r in data["results"]
+        }
+
+    old, new = load(old_path), load(new_path)
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key]["median"], new[key]["median"]
+        ratio = after / before if before else float("inf")
+        print(
+            "{:<36} {:<32} {:>9.4f}s -> {:>9.4f}s ({:.2f}x)".format(
+                key[0], key[1], before, after, ratio
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        help="module counts of generated projects (default: %(default)s)",
+        default="10,1000,50000",
+    )
+    parser.add_argument(
+        "--depth",
+        help="depth of package trees in generated projects",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--python",
+        help="base interpreter of runtimes (default: this one)",
+        default=sys.executable,
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument(
+        "--keep", help="keep generated files", action="store_true"
+    )
+    parser.add_argument(
+        "--compare",
+        help="compare two result files instead of running",
+        metavar=("OLD", "NEW"),
+        nargs=2,
+    )
+    options = parser.parse_args(argv)
+
+    if options.compare:
+        compare(*options.compare)
+        return
+
+    options.sizes = [int(s) for s in options.sizes.split(",")]
+
+    # Send output of everything benchmarked (including subprocesses) to
+    # stderr, so stdout only contains results.
+    sys.stdout.flush()
+    stdout = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        data = run(options)
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout, 1)
+        os.close(stdout)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    else:
+        json.dump(data, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import argparse
+import pathlib
 import sys
 
-from . import cli
+from . import _trace, cli
 
 
 def _no_subcommand(options):
@@ -10,14 +11,30 @@ def _no_subcommand(options):
 
 
 def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--trace",
+        help="write how long each step takes to FILE (Chrome trace format)",
+        metavar="FILE",
+        type=pathlib.Path,
+    )
     parser.set_defaults(func=_no_subcommand)
-    cli.build_subcommands(parser.add_subparsers())
+    cli.build_subcommands(parser.add_subparsers(), argv)
 
     options = parser.parse_args(argv)
     options.parser = parser
 
-    retcode = options.func(options)
+    if options.trace:
+        _trace.enable()
+    try:
+        with _trace.span("pypro"):
+            retcode = options.func(options)
+    finally:
+        if options.trace:
+            _trace.write(options.trace)
     if retcode:
         sys.exit(retcode)
 
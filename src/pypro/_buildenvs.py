@@ -0,0 +1,144 @@
+"""Build environments shared between projects.
+
+A build env is identified by the interpreter quintuplet, and the set of
+requirements installed into it. Projects building with the same interpreter
+and requirements (e.g. ``setuptools>=40.8`` and ``wheel``) use the same env,
+so each set of requirements is only installed once per interpreter.
+"""
+
+__all__ = ["get_env"]
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import typing
+
+from . import _store, _trace, wheels
+from .projects._envs import create_venv
+from .utils import get_cache_dir, write_text_atomic
+from .venvs import VirtualEnvironment
+
+
+# Written into an env last, recording the requirements installed into it.
+_MARKER_NAME = "pypro-build-env.json"
+
+# Held while an env is being created, so threads needing the same env at once
+# (e.g. projects in a workspace) only create it once.
+_create_locks: typing.Dict[str, threading.Lock] = {}
+
+
+def _get_envs_dir() -> pathlib.Path:
+    return get_cache_dir().joinpath("build-envs")
+
+
+def _normalize(requires: typing.Iterable[str]) -> typing.List[str]:
+    return sorted({r.strip() for r in requires if r.strip()})
+
+
+def _get_key(quintuplet: str, requires: typing.List[str]) -> str:
+    digest = hashlib.sha256(json.dumps(requires).encode("utf-8"))
+    return "{}-{}".format(quintuplet, digest.hexdigest()[:16])
+
+
+def _is_complete(env_dir: pathlib.Path) -> bool:
+    return env_dir.joinpath(_MARKER_NAME).is_file()
+
+
+def get_env(
+    python: os.PathLike, quintuplet: str, requires: typing.Iterable[str]
+) -> VirtualEnvironment:
+    """Get the build env of requirements for an interpreter.
+
+    The env is created if needed, in a temporary directory, and moved into
+    the cache when it is complete, so concurrent processes never see a
+    partially created env.
+    """
+    requires = _normalize(requires)
+    env_dir = _get_envs_dir().joinpath(_get_key(quintuplet, requires))
+    if _is_complete(env_dir):
+        return VirtualEnvironment(env_dir)
+    with _create_locks.setdefault(env_dir.name, threading.Lock()):
+        if not _is_complete(env_dir):  # Created while we waited?
+            _create_env(python, quintuplet, env_dir, requires)
+    return VirtualEnvironment(env_dir)
+
+
+def _relocate_scripts(env: VirtualEnvironment, old: str, new: str):
+    # Scripts installed by pip refer to the interpreter by absolute path.
+    scripts_dir = env.python.parent
+    old_bytes, new_bytes = os.fsencode(old), os.fsencode(new)
+    for path in scripts_dir.iterdir():
+        if path.is_symlink() or not path.is_file():
+            continue
+        content = path.read_bytes()
+        if old_bytes in content:
+            path.write_bytes(content.replace(old_bytes, new_bytes))
+
+
+def _install_requires(
+    env: VirtualEnvironment, quintuplet: str, requires: typing.List[str]
+):
+    """Install requirements into the env, from local wheels if possible.
+
+    The index is only used if some requirement cannot be satisfied by seed
+    packages or wheels downloaded for the interpreter before, so envs can
+    be created offline once those are present.
+    """
+    from . import _seeds  # Slow to import; only needed here.
+
+    args = [str(env.python), "-m", "pip", "install"]
+    args.extend(["--disable-pip-version-check", "--quiet"])
+    local = [_seeds.get_wheels_dir(), wheels.get_wheel_cache(quintuplet)]
+    for directory in local:
+        if directory.is_dir():
+            args.extend(["--find-links", str(directory)])
+    code = _trace.call(
+        args + ["--no-index"] + requires,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if code:
+        _trace.check_call(args + requires, stdout=sys.stderr)
+
+
+@_trace.span("create build env")
+def _create_env(
+    python: os.PathLike,
+    quintuplet: str,
+    env_dir: pathlib.Path,
+    requires: typing.List[str],
+):
+    env_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging = pathlib.Path(
+        tempfile.mkdtemp(
+            prefix=".{}-".format(env_dir.name), dir=env_dir.parent
+        )
+    )
+    try:
+        env = VirtualEnvironment(staging.joinpath("venv"))
+        create_venv(python=python, env_dir=env.root, prompt="pypro-build")
+        if requires:
+            _install_requires(env, quintuplet, requires)
+            _store.link_tree(env.site_packages)
+        _relocate_scripts(env, str(env.root), str(env_dir))
+        marker = {"requires": requires}
+        write_text_atomic(env.root.joinpath(_MARKER_NAME), json.dumps(marker))
+        if _is_complete(env_dir):
+            return  # Another process created it meanwhile. It may be in use.
+        if env_dir.exists():
+            # Left over by an interrupted run.
+            shutil.rmtree(str(env_dir))
+        try:
+            env.root.rename(env_dir)
+        except OSError:
+            # Another process beat us to it. Use theirs.
+            if not _is_complete(env_dir):
+                raise
+    finally:
+        shutil.rmtree(str(staging), ignore_errors=True)
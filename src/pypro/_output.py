@@ -0,0 +1,189 @@
+"""Send output of each thread to a stream of its own.
+
+Threads doing work concurrently (e.g. creating runtimes) would interleave
+their output on the terminal. `redirect` makes what a thread writes to
+``sys.stdout`` and ``sys.stderr`` go elsewhere instead, by replacing both
+with proxies that look the stream up for the calling thread.
+
+Subprocesses write to the file descriptors directly, so their output is only
+redirected if it is piped, and written to ``sys.stdout`` by the caller (see
+`get_redirected` and `relay`).
+"""
+
+__all__ = [
+    "PrefixedWriter",
+    "bind",
+    "get_original",
+    "get_redirected",
+    "prefixed",
+    "redirect",
+    "relay",
+]
+
+import contextlib
+import functools
+import locale
+import sys
+import threading
+import typing
+
+
+_T = typing.TypeVar("_T")
+
+_local = threading.local()
+
+_install_lock = threading.Lock()
+
+# Held while a prefixed writer writes, so lines from threads are not mixed.
+# Reentrant, since a prefixed writer may write to another.
+_write_lock = threading.RLock()
+
+
+class _Proxy:
+    def __init__(self, name: str, stream: typing.TextIO):
+        self._name = name
+        self.stream = stream
+
+    def _get_target(self) -> typing.TextIO:
+        return getattr(_local, self._name, None) or self.stream
+
+    def write(self, s: str) -> int:
+        return self._get_target().write(s)
+
+    def flush(self):
+        self._get_target().flush()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.stream, name)
+
+
+class PrefixedWriter:
+    """Write to a stream with a prefix on each line.
+
+    Text is held until a line is complete, and written one whole line at a
+    time, so lines written by threads at once are never mixed. Call `close`
+    to write an incomplete last line.
+    """
+
+    def __init__(self, stream: typing.TextIO, prefix: str):
+        self._stream = stream
+        self._prefix = prefix
+        self._pending = ""
+
+    def write(self, s: str) -> int:
+        lines = (self._pending + s).split("\n")
+        self._pending = lines.pop()
+        if lines:
+            with _write_lock:
+                for line in lines:
+                    self._stream.write("{}{}\n".format(self._prefix, line))
+                self._stream.flush()
+        return len(s)
+
+    def flush(self):
+        pass  # Incomplete lines are held until they complete.
+
+    def close(self):
+        if self._pending:
+            self.write("\n")
+
+
+def _install():
+    with _install_lock:
+        if not isinstance(sys.stdout, _Proxy):
+            sys.stdout = _Proxy("stdout", sys.stdout)  # type: ignore
+        if not isinstance(sys.stderr, _Proxy):
+            sys.stderr = _Proxy("stderr", sys.stderr)  # type: ignore
+
+
+def get_original(stream: typing.TextIO) -> typing.TextIO:
+    """Get the stream a proxy installed by `redirect` writes to by default.
+    """
+    if isinstance(stream, _Proxy):
+        return stream.stream
+    return stream
+
+
+def get_redirected(name: str) -> typing.Optional[typing.TextIO]:
+    """Get where the current thread's ``sys.stdout`` or ``sys.stderr`` goes.
+
+    name is "stdout" or "stderr". Returns None if it is not redirected.
+    """
+    return getattr(_local, name, None)
+
+
+def bind(func: typing.Callable[..., _T]) -> typing.Callable[..., _T]:
+    """Make func write where the current thread's output goes.
+
+    Threads do not inherit redirections. Bind functions handed to other
+    threads (e.g. an executor's) to keep their output with the caller's.
+    """
+    stdout = get_redirected("stdout")
+    stderr = get_redirected("stderr")
+    if stdout is None or stderr is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with redirect(stdout, stderr):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def relay(pipe: typing.IO[bytes], stream: typing.TextIO) -> threading.Thread:
+    """Write lines read from a subprocess's pipe to stream, in a thread.
+
+    The pipe is closed once the subprocess closes it. Join the returned thread
+    to wait until everything is written.
+    """
+
+    def run():
+        encoding = locale.getpreferredencoding(False)
+        with pipe:
+            for line in iter(pipe.readline, b""):
+                stream.write(line.decode(encoding, "replace"))
+        stream.flush()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+@contextlib.contextmanager
+def redirect(
+    stdout: typing.TextIO, stderr: typing.Optional[typing.TextIO] = None
+) -> typing.Iterator[None]:
+    """Send what the current thread writes to stdout and stderr elsewhere.
+
+    stderr defaults to the same stream as stdout. Other threads are not
+    affected.
+    """
+    _install()
+    saved = getattr(_local, "stdout", None), getattr(_local, "stderr", None)
+    _local.stdout = stdout
+    _local.stderr = stderr or stdout
+    try:
+        yield
+    finally:
+        _local.stdout, _local.stderr = saved
+
+
+@contextlib.contextmanager
+def prefixed(prefix: str) -> typing.Iterator[None]:
+    """Prefix each line the current thread writes to stdout and stderr.
+
+    Lines go where they would go otherwise, so prefixes can be nested.
+    """
+    writers = [
+        PrefixedWriter(
+            get_redirected(name) or get_original(getattr(sys, name)), prefix
+        )
+        for name in ["stdout", "stderr"]
+    ]
+    with redirect(*typing.cast(typing.List[typing.TextIO], writers)):
+        try:
+            yield
+        finally:
+            for writer in writers:
+                writer.close()
@@ -0,0 +1,95 @@
+"""Run steps that depend on each other, concurrently where possible.
+
+Steps are declared with the names of steps they depend on, forming a graph.
+Each step starts as soon as all its dependencies have finished, so the total
+time is close to that of the longest chain of steps, instead of the sum of
+all steps.
+
+Steps are plain functions run in threads. Most of their time is spent
+waiting on subprocesses (hook workers, pip) and the file system, which does
+not hold the GIL.
+"""
+
+__all__ = ["Pipeline"]
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import typing
+
+from . import _output
+
+
+@dataclasses.dataclass()
+class _Step:
+    name: str
+    func: typing.Callable[..., typing.Any]
+    requires: typing.List[str]
+
+
+class Pipeline:
+    def __init__(self, jobs: typing.Optional[int] = None):
+        self._jobs = jobs
+        self._steps: typing.Dict[str, _Step] = {}
+
+    def add(
+        self,
+        name: str,
+        func: typing.Callable[..., typing.Any],
+        requires: typing.Sequence[str] = (),
+    ):
+        """Add a step.
+
+        func is called with results of the required steps, in the order they
+        are listed. Required steps must have been added already, so the
+        graph cannot have cycles.
+        """
+        for dependency in requires:
+            if dependency not in self._steps:
+                raise ValueError("unknown step {!r}".format(dependency))
+        self._steps[name] = _Step(name, func, list(requires))
+
+    def run(self) -> typing.Dict[str, typing.Any]:
+        """Run all steps, with at most `jobs` at a time.
+
+        Returns results of the steps, by name. If a step fails, steps not
+        started yet are cancelled, and the first error is raised after steps
+        already running finish (threads cannot be interrupted).
+        """
+        jobs = self._jobs or max(1, len(self._steps))
+        loop = asyncio.new_event_loop()
+        executor = concurrent.futures.ThreadPoolExecutor(jobs)
+        try:
+            return loop.run_until_complete(self._run(loop, executor))
+        finally:
+            executor.shutdown(wait=True)
+            loop.close()
+
+    async def _run(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        executor: concurrent.futures.Executor,
+    ) -> typing.Dict[str, typing.Any]:
+        tasks: typing.Dict[str, asyncio.Future] = {}
+
+        async def run_step(step):
+            args = [await tasks[name] for name in step.requires]
+            func = _output.bind(step.func)
+            return await loop.run_in_executor(executor, func, *args)
+
+        for step in self._steps.values():
+            tasks[step.name] = loop.create_task(run_step(step))
+
+        done, pending = await asyncio.wait(
+            list(tasks.values()), return_when=asyncio.FIRST_EXCEPTION
+        )
+        # Steps depending on a failed one fail with the same error, but only
+        # after it, so they are never done before it.
+        errors = [e for e in (t.exception() for t in done) if e is not None]
+        if not errors:
+            return {name: task.result() for name, task in tasks.items()}
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        raise errors[0]
@@ -0,0 +1,227 @@
+__all__ = ["get_seeds", "get_wheels_dir", "refresh", "seed"]
+
+import csv
+import io
+import json
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+
+from . import _store, _trace, interpreters
+from .utils import (
+    RECORD_CSV_KWARGS,
+    get_cache_dir,
+    hash_file,
+    place_file,
+    write_text_atomic,
+)
+from .venvs import VirtualEnvironment
+from .wheels import unpack, write_console_scripts
+
+
+_SEED_PACKAGES = ["setuptools", "pip", "wheel"]
+
+# Run in the target interpreter to find wheels bundled with it.
+_FIND_BUNDLED_CODE = """
+import ensurepip, os
+print(os.path.join(os.path.dirname(ensurepip.__file__), "_bundled"))
+"""
+
+
+def _get_store_dir() -> pathlib.Path:
+    return get_cache_dir().joinpath("seeds")
+
+
+def get_wheels_dir() -> pathlib.Path:
+    """Get the directory keeping wheels of all seed packages in the store.
+    """
+    return _get_store_dir().joinpath("wheels")
+
+
+def _get_index_dir() -> pathlib.Path:
+    return _get_store_dir().joinpath("index")
+
+
+def _get_index_path(quintuplet: str) -> pathlib.Path:
+    # Seeds are chosen per interpreter, since not every version of a seed
+    # package supports every interpreter (e.g. pip 23.2 needs Python 3.7).
+    return _get_index_dir().joinpath("{}.json".format(quintuplet))
+
+
+def _unpack_into_store(
+    python: os.PathLike, quintuplet: str, wheels: typing.List[pathlib.Path]
+) -> typing.List[str]:
+    """Unpack wheels into the store, as the interpreter's current seeds.
+    """
+    store = _get_store_dir()
+    wheels_dir = get_wheels_dir()
+    wheels_dir.mkdir(parents=True, exist_ok=True)
+    names = []
+    for wheel in wheels:
+        kept = wheels_dir.joinpath(wheel.name)
+        if not kept.is_file():
+            place_file(wheel, kept, ["hardlink", "copy"])
+        name = "-".join(wheel.name.split("-", 2)[:2])  # E.g. "pip-19.3.1".
+        target = store.joinpath(name)
+        if not target.is_dir():
+            staging = tempfile.mkdtemp(prefix=".{}-".format(name), dir=store)
+            try:
+                unpack(wheel, pathlib.Path(staging))
+                _store.link_tree(pathlib.Path(staging))
+                os.rename(staging, str(target))
+            except OSError:
+                if not target.is_dir():
+                    raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        names.append(name)
+    index = {"python": os.path.abspath(python), "seeds": names}
+    write_text_atomic(_get_index_path(quintuplet), json.dumps(index))
+    return names
+
+
+def _bootstrap(python: os.PathLike, quintuplet: str) -> typing.List[str]:
+    """Populate the store with wheels bundled in the interpreter's ensurepip.
+
+    This works offline. The result may be empty if ensurepip is unavailable
+    (e.g. removed by the distribution).
+    """
+    try:
+        out = subprocess.check_output(
+            [str(python), "-I", "-c", _FIND_BUNDLED_CODE],
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        bundled = []
+    else:
+        directory = pathlib.Path(os.fsdecode(out).strip())
+        bundled = sorted(directory.glob("*.whl"))
+    return _unpack_into_store(python, quintuplet, bundled)
+
+
+def get_seeds(
+    python: os.PathLike, quintuplet: str
+) -> typing.List[pathlib.Path]:
+    """Get unpacked seed packages in the store for an interpreter.
+
+    The store is populated from the interpreter's ensurepip the first time it
+    is used. It is only updated afterwards if `refresh` is called.
+    """
+    try:
+        with _get_index_path(quintuplet).open(encoding="utf-8") as f:
+            names = json.load(f)["seeds"]
+    except (OSError, ValueError, KeyError):
+        names = _bootstrap(python, quintuplet)
+    store = _get_store_dir()
+    return [store.joinpath(n) for n in names if store.joinpath(n).is_dir()]
+
+
+def _refresh_one(python: os.PathLike, quintuplet: str) -> typing.List[str]:
+    version = interpreters.get_interpreter(python).version
+    with tempfile.TemporaryDirectory() as td:
+        # Pick versions supporting the interpreter. Our pip is used since the
+        # interpreter's may be too old to check Requires-Python reliably.
+        _trace.check_call(
+            [
+                sys.executable,
+                "-m",
+                "pip",
+                "download",
+                "--disable-pip-version-check",
+                "--only-binary=:all:",
+                "--no-deps",
+                "--python-version",
+                "{}.{}".format(*version[:2]),
+                "--dest",
+                td,
+            ]
+            + _SEED_PACKAGES
+        )
+        wheels = sorted(pathlib.Path(td).glob("*.whl"))
+        return _unpack_into_store(python, quintuplet, wheels)
+
+
+def _iter_indexes() -> typing.Iterator[typing.Tuple[str, dict]]:
+    index_dir = _get_index_dir()
+    if not index_dir.is_dir():
+        return
+    for path in sorted(index_dir.glob("*.json")):
+        try:
+            with path.open(encoding="utf-8") as f:
+                yield path.stem, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def refresh() -> typing.Dict[str, typing.List[str]]:
+    """Download the latest seed packages into the store.
+
+    Seeds are refreshed for each interpreter the store has seeded (and still
+    exists). Returns names of the new seeds, by interpreter quintuplet. Seeds
+    no longer used are removed from the store (venvs seeded with them are not
+    affected since they do not link to the store symbolically).
+    """
+    refreshed = {}
+    for quintuplet, index in list(_iter_indexes()):
+        python = index.get("python")
+        if python and os.path.exists(python):
+            refreshed[quintuplet] = _refresh_one(python, quintuplet)
+    if not refreshed:
+        return refreshed
+
+    used = {name for _, index in _iter_indexes() for name in index["seeds"]}
+    kept = {_get_index_dir().name, get_wheels_dir().name}
+    for entry in _get_store_dir().iterdir():
+        if entry.is_dir() and entry.name not in kept | used:
+            shutil.rmtree(str(entry), ignore_errors=True)
+    for entry in get_wheels_dir().iterdir():
+        if "-".join(entry.name.split("-", 2)[:2]) not in used:
+            entry.unlink()
+    return refreshed
+
+
+def _update_record(
+    site_packages: pathlib.Path,
+    dist_info: pathlib.Path,
+    paths: typing.List[pathlib.Path],
+):
+    record = dist_info.joinpath("RECORD")
+    f = io.StringIO()
+    f.write(record.read_text(encoding="utf-8"))
+    csv.writer(f, **RECORD_CSV_KWARGS).writerows(
+        (
+            os.path.relpath(str(path), str(site_packages)),
+            hash_file(path),
+            path.stat().st_size,
+        )
+        for path in paths
+    )
+    # Write to a new file. The old one may be linked to the store.
+    write_text_atomic(record, f.getvalue())
+
+
+def seed(env: VirtualEnvironment, seeds: typing.List[pathlib.Path]):
+    """Install seed packages into a venv without running pip.
+
+    Files are linked from the store if possible. Console scripts and
+    INSTALLER are written, and recorded in RECORD.
+    """
+    site_packages = env.site_packages
+    python = env.python
+    for tree in seeds:
+        for root, _, filenames in os.walk(str(tree)):
+            for filename in filenames:
+                source = pathlib.Path(root, filename)
+                target = site_packages.joinpath(source.relative_to(tree))
+                place_file(source, target, _store.SHARE_METHODS)
+
+        for path in tree.glob("*.dist-info"):
+            dist_info = site_packages.joinpath(path.name)
+            installer = dist_info.joinpath("INSTALLER")
+            write_text_atomic(installer, "pypro\n")
+            scripts = write_console_scripts(dist_info, python.parent, python)
+            _update_record(site_packages, dist_info, scripts + [installer])
@@ -0,0 +1,216 @@
+"""A content-addressed store of files shared by venvs.
+
+Files installed into venvs are put into the store, named by the hash of
+their content, and hardlinked into each venv. Identical files in many venvs
+then take space only once.
+
+Files are never modified in place once installed (installers, pip included,
+replace files instead of writing into them), so it is safe to share them,
+here or with any other copy of a venv's files (see `SHARE_METHODS`).
+The store keeps no index. A file in it is referenced by nothing once its
+link count drops to one, and can be removed by `collect_garbage`.
+"""
+
+__all__ = [
+    "SHARE_METHODS",
+    "Usage",
+    "collect_garbage",
+    "create_temp",
+    "get_usage",
+    "link",
+    "link_tree",
+    "put",
+]
+
+import dataclasses
+import hashlib
+import os
+import pathlib
+import shutil
+import stat
+import tempfile
+import typing
+
+from . import _trace
+from .utils import get_cache_dir, place_file
+
+
+# Methods to place a venv's file with (see `place_file`), sharing its content
+# with the source. Reflinks first, which can be written to without changing
+# the source if a file is modified in place after all.
+SHARE_METHODS = ["reflink", "hardlink", "copy"]
+
+# Hardlinks first, so link counts tell whether a file is referenced. Reflinks
+# still save space if hardlinks are not supported.
+_LINK_METHODS = ["hardlink", "reflink", "copy"]
+
+
+def _get_store_dir() -> pathlib.Path:
+    return get_cache_dir().joinpath("store")
+
+
+def _get_temp_dir() -> pathlib.Path:
+    return _get_store_dir().joinpath("tmp")
+
+
+def _get_blob_path(digest: str, executable: bool) -> pathlib.Path:
+    # Links share permission bits, so executables are stored separately.
+    name = digest[2:] + ".x" if executable else digest[2:]
+    return _get_store_dir().joinpath(digest[:2], name)
+
+
+_Blob = typing.Tuple[pathlib.Path, os.stat_result]
+
+
+def _iter_blobs() -> typing.Iterator[_Blob]:
+    store = _get_store_dir()
+    if not store.is_dir():
+        return
+    for directory in store.iterdir():
+        if len(directory.name) != 2 or not directory.is_dir():
+            continue
+        for blob in directory.iterdir():
+            yield blob, blob.lstat()
+
+
+def create_temp() -> pathlib.Path:
+    """Create an empty file to write new content into before calling `put`.
+
+    The file is in the store, so it can be moved in without copying.
+    """
+    directory = _get_temp_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=str(directory))
+    os.close(fd)
+    return pathlib.Path(path)
+
+
+def put(temp: pathlib.Path, digest: str, executable: bool) -> pathlib.Path:
+    """Move a file created by `create_temp` into the store.
+
+    digest is the hex SHA-256 of the file's content. If the store already
+    has the content, the file is removed instead. Returns the stored file.
+    """
+    blob = _get_blob_path(digest, executable)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    temp.chmod(0o755 if executable else 0o644)
+    try:
+        # Unlike renaming, this never replaces a file already linked out.
+        os.link(str(temp), str(blob))
+    except FileExistsError:
+        pass
+    finally:
+        temp.unlink()
+    return blob
+
+
+def link(blob: pathlib.Path, target: pathlib.Path) -> str:
+    """Place a stored file at target. Returns the method used.
+    """
+    return place_file(blob, target, _LINK_METHODS)
+
+
+def _hash(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _put_copy(path: pathlib.Path, digest: str, executable: bool):
+    temp = create_temp()
+    shutil.copyfile(str(path), str(temp))
+    put(temp, digest, executable)
+
+
+@_trace.span("link into store")
+def link_tree(
+    directory: pathlib.Path, exclude: typing.Collection[pathlib.Path] = ()
+) -> typing.Tuple[int, int]:
+    """Replace files in directory with links to identical stored files.
+
+    Files whose content is not in the store yet are added to it. A file only
+    becomes the stored file itself if nothing else links to it; otherwise a
+    copy is stored, so changes made through other links never reach the
+    store. Paths in exclude (e.g. files linked from a project's sources),
+    symlinks, files with permissions other than the store's, and files on
+    other file systems than the store are left alone.
+
+    Returns the number of files replaced, and the bytes reclaimed.
+    """
+    count = reclaimed = 0
+    store = _get_store_dir()
+    store.mkdir(parents=True, exist_ok=True)
+    if directory.stat().st_dev != store.stat().st_dev:
+        return count, reclaimed  # Files cannot be linked across devices.
+    excluded = {os.path.normcase(str(p)) for p in exclude}
+    for root, _, filenames in os.walk(str(directory)):
+        for name in filenames:
+            path = pathlib.Path(root, name)
+            if os.path.normcase(str(path)) in excluded:
+                continue
+            st = path.lstat()
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            executable = bool(st.st_mode & 0o111)
+            if stat.S_IMODE(st.st_mode) != (0o755 if executable else 0o644):
+                continue  # Linking would change its permissions.
+            digest = _hash(path)
+            blob = _get_blob_path(digest, executable)
+            if not blob.exists():
+                if st.st_nlink > 1:
+                    _put_copy(path, digest, executable)
+                    continue
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(str(path), str(blob))
+                except OSError:
+                    pass  # Added meanwhile, or not supported here.
+                continue
+            if os.path.samestat(st, blob.stat()):
+                continue
+            if link(blob, path) == "copy":
+                continue
+            count += 1
+            if st.st_nlink == 1:  # Otherwise the content is kept elsewhere.
+                reclaimed += st.st_size
+    return count, reclaimed
+
+
+@dataclasses.dataclass()
+class Usage:
+    files: int  # Number of stored files.
+    size: int  # Bytes taken by stored files.
+    saved: int  # Bytes saved by sharing stored files.
+    unreferenced: int  # Bytes taken by stored files not used anymore.
+
+
+def get_usage() -> Usage:
+    usage = Usage(0, 0, 0, 0)
+    for _, st in _iter_blobs():
+        usage.files += 1
+        usage.size += st.st_size
+        if st.st_nlink > 1:
+            usage.saved += (st.st_nlink - 2) * st.st_size
+        else:
+            usage.unreferenced += st.st_size
+    return usage
+
+
+def collect_garbage() -> typing.Tuple[int, int]:
+    """Remove stored files not linked from anywhere else.
+
+    Returns the number of files removed, and the bytes reclaimed.
+    """
+    count = reclaimed = 0
+    for blob, st in _iter_blobs():
+        if st.st_nlink > 1:
+            continue
+        try:
+            blob.unlink()
+        except FileNotFoundError:
+            continue
+        count += 1
+        reclaimed += st.st_size
+    return count, reclaimed
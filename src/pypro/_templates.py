@@ -0,0 +1,181 @@
+__all__ = ["clone", "get_template"]
+
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+import typing
+
+from . import _output, _seeds, _store, _trace, _virtenv
+from .utils import get_cache_dir, place_file, write_text_atomic
+from .venvs import VirtualEnvironment
+
+
+# Templates are created with this prompt, so it can be replaced when cloning.
+_PLACEHOLDER_PROMPT = "__pypro_template_prompt__"
+
+# Written into a template last, recording where it was originally created.
+# Absolute paths in the template refer to that location.
+_MARKER_NAME = "pypro-template.json"
+
+# Held while a template is being built, so threads creating runtimes of the
+# same interpreter at once (e.g. projects in a workspace) only build it once.
+_build_locks: typing.Dict[str, threading.Lock] = {}
+
+
+def _get_templates_dir() -> pathlib.Path:
+    return get_cache_dir().joinpath("templates")
+
+
+def _read_marker(template: pathlib.Path) -> typing.Optional[dict]:
+    try:
+        with template.joinpath(_MARKER_NAME).open(encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _get_template_path(
+    quintuplet: str, seed_names: typing.List[str]
+) -> pathlib.Path:
+    # Named by the seeds too, so a template made with other seeds (that may
+    # be being cloned right now) never needs to be replaced.
+    digest = hashlib.sha256(json.dumps(seed_names).encode("utf-8"))
+    name = "{}-{}".format(quintuplet, digest.hexdigest()[:8])
+    return _get_templates_dir().joinpath(name)
+
+
+def get_template(python: os.PathLike, quintuplet: str) -> pathlib.Path:
+    """Get the template venv for an interpreter, creating it if needed.
+
+    The template is created in a temporary directory, and moved into the
+    cache when it is complete, so concurrent processes never see a partially
+    created template. A complete template is never modified or removed, so
+    it is safe to clone while other threads and processes create templates.
+    A new template is created if the seed store has been refreshed.
+    """
+    seeds = _seeds.get_seeds(python, quintuplet)
+    template = _get_template_path(quintuplet, [seed.name for seed in seeds])
+    if _is_complete(template):
+        return template
+    with _build_locks.setdefault(template.name, threading.Lock()):
+        if not _is_complete(template):  # Built while we waited?
+            _build_template(python, template, seeds)
+    return template
+
+
+def _is_complete(template: pathlib.Path) -> bool:
+    return _read_marker(template) is not None
+
+
+@_trace.span("build template")
+def _build_template(
+    python: os.PathLike,
+    template: pathlib.Path,
+    seeds: typing.List[pathlib.Path],
+):
+    template.parent.mkdir(parents=True, exist_ok=True)
+    staging = pathlib.Path(
+        tempfile.mkdtemp(
+            prefix=".{}-".format(template.name), dir=template.parent
+        )
+    )
+    try:
+        env_dir = staging.joinpath("venv")
+        # Seed from the store if possible. Otherwise let the venv builder do
+        # the work (with ensurepip and pip). Its output refers to the staging
+        # directory, not the venv being created, so only show it on failure.
+        output = io.StringIO()
+        try:
+            with _output.redirect(output):
+                _virtenv.create(
+                    python=python,
+                    env_dir=env_dir,
+                    system=False,
+                    prompt=_PLACEHOLDER_PROMPT,
+                    bare=bool(seeds),
+                )
+        except BaseException:
+            sys.stderr.write(output.getvalue())
+            raise
+        if seeds:
+            _seeds.seed(VirtualEnvironment(env_dir), seeds)
+        marker = {
+            "root": str(env_dir),
+            "prompt": _PLACEHOLDER_PROMPT,
+            "seeds": [seed.name for seed in seeds],
+        }
+        write_text_atomic(env_dir.joinpath(_MARKER_NAME), json.dumps(marker))
+        if _is_complete(template):
+            return  # Another process built it meanwhile. It may be in use.
+        if template.exists():
+            # Incomplete, so nothing can be cloning it (clones need the
+            # marker).
+            shutil.rmtree(str(template))
+        try:
+            env_dir.rename(template)
+        except OSError:
+            # Another process beat us to it. Use theirs.
+            if not _is_complete(template):
+                raise
+    finally:
+        shutil.rmtree(str(staging), ignore_errors=True)
+
+
+def _get_scripts_dir(env_dir: pathlib.Path) -> pathlib.Path:
+    if os.name == "nt":
+        return env_dir.joinpath("Scripts")
+    return env_dir.joinpath("bin")
+
+
+@_trace.span("clone template")
+def clone(
+    template: pathlib.Path, env_dir: pathlib.Path, prompt: typing.Optional[str]
+):
+    """Clone a template venv into env_dir.
+
+    Scripts and ``pyvenv.cfg`` are rewritten to refer to the new location and
+    use the new prompt. Other files are reflinked or hardlinked if possible,
+    and copied otherwise.
+    """
+    if prompt is None:
+        prompt = env_dir.name
+    with template.joinpath(_MARKER_NAME).open(encoding="utf-8") as f:
+        marker = json.load(f)
+    replacements = [
+        (os.fsencode(marker["root"]), os.fsencode(str(env_dir))),
+        (os.fsencode(marker["prompt"]), os.fsencode(prompt)),
+    ]
+
+    scripts_dir = _get_scripts_dir(template)
+    config = template.joinpath("pyvenv.cfg")
+
+    env_dir.mkdir(parents=True)
+    for root, dirnames, filenames in os.walk(str(template)):
+        source_dir = pathlib.Path(root)
+        target_dir = env_dir.joinpath(source_dir.relative_to(template))
+        for name in dirnames + filenames:
+            source = source_dir.joinpath(name)
+            target = target_dir.joinpath(name)
+            if source.is_symlink():
+                link = os.readlink(str(source))
+                if link.startswith(marker["root"]):
+                    link = str(env_dir) + link[len(marker["root"]) :]
+                os.symlink(link, str(target))
+            elif source.is_dir():
+                target.mkdir()
+            elif name == _MARKER_NAME and source_dir == template:
+                continue
+            elif source_dir == scripts_dir or source == config:
+                content = source.read_bytes()
+                for old, new in replacements:
+                    content = content.replace(old, new)
+                target.write_bytes(content)
+                shutil.copymode(str(source), str(target))
+            else:
+                place_file(source, target, _store.SHARE_METHODS)
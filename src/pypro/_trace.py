@@ -0,0 +1,207 @@
+"""Record how long each step takes, in Chrome's trace event format.
+
+The result can be loaded in ``chrome://tracing`` or Perfetto. Each span is a
+complete event (``"ph": "X"``) on the lane of the process and thread that ran
+it. Spans of subprocesses (e.g. hook calls) are put on the lane of the
+subprocess.
+
+Tracing is off unless `enable` is called. Spans cost close to nothing then.
+"""
+
+__all__ = [
+    "add_span",
+    "call",
+    "check_call",
+    "enable",
+    "is_enabled",
+    "span",
+    "write",
+]
+
+import contextlib
+import json
+import os
+import pathlib
+import sys
+import threading
+import time
+import typing
+
+from . import _output
+
+
+# None when tracing is disabled.
+_events: typing.Optional[typing.List[dict]] = None
+
+# Names of processes other than ours seen in spans, by pid.
+_processes: typing.Dict[int, str] = {}
+
+
+def _now() -> int:
+    # Monotonic clocks are shared by processes on the same machine (at least
+    # on Linux, macOS and Windows), so spans from subprocesses line up.
+    return int(time.monotonic() * 1000000)
+
+
+def enable():
+    global _events
+    if _events is None:
+        _events = []
+
+
+def is_enabled() -> bool:
+    return _events is not None
+
+
+def add_span(
+    name: str,
+    start: float,
+    end: float,
+    *,
+    pid: typing.Optional[int] = None,
+    process_name: typing.Optional[str] = None,
+    **args: typing.Any
+):
+    """Record a span measured elsewhere.
+
+    start and end are in seconds, from `time.monotonic` (in the process that
+    measured them). Pass pid to record a span of another process.
+    """
+    if _events is None:
+        return
+    if pid is None:
+        pid = os.getpid()
+        tid = threading.get_ident()
+    else:
+        tid = pid
+    if process_name is not None:
+        _processes[pid] = process_name
+    start_us = int(start * 1000000)
+    _events.append(
+        {
+            "name": name,
+            "ph": "X",
+            "ts": start_us,
+            "dur": int(end * 1000000) - start_us,
+            "pid": pid,
+            "tid": tid,
+            "args": {k: str(v) for k, v in args.items()},
+        }
+    )
+
+
+@contextlib.contextmanager
+def span(name: str, **args: typing.Any) -> typing.Iterator[None]:
+    """Record the time taken by the block.
+
+    This can also be used as a decorator, to record each call of a function.
+    """
+    if _events is None:
+        yield
+        return
+    start = _now()
+    try:
+        yield
+    finally:
+        _events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start,
+                "dur": _now() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {k: str(v) for k, v in args.items()},
+            }
+        )
+
+
+def _get_relays(
+    kwargs: typing.Dict[str, typing.Any]
+) -> typing.Dict[str, typing.TextIO]:
+    # Output the subprocess would write to sys.stdout or sys.stderr, where the
+    # calling thread has redirected them (see `_output.redirect`).
+    relays = {}
+    for name in ["stdout", "stderr"]:
+        target = kwargs.get(name)
+        if target is None:
+            target_name = name
+        elif target is sys.stdout:
+            target_name = "stdout"
+        elif target is sys.stderr:
+            target_name = "stderr"
+        else:
+            continue
+        stream = _output.get_redirected(target_name)
+        if stream is not None:
+            relays[name] = stream
+    return relays
+
+
+def call(args: typing.List[str], **kwargs: typing.Any) -> int:
+    """Like `subprocess.call`, but record a span on the subprocess's lane.
+
+    If the calling thread has redirected sys.stdout or sys.stderr, output the
+    subprocess writes to them is piped and written where they go.
+    """
+    import subprocess  # Slow to import; not needed by every command.
+
+    relays = _get_relays(kwargs)
+    for name in relays:
+        kwargs[name] = subprocess.PIPE
+
+    start = time.monotonic()
+    with subprocess.Popen(args, **kwargs) as proc:
+        threads = [
+            _output.relay(getattr(proc, name), stream)
+            for name, stream in relays.items()
+        ]
+        try:
+            return proc.wait()
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            name = os.path.basename(args[0])
+            add_span(
+                name,
+                start,
+                time.monotonic(),
+                pid=proc.pid,
+                process_name=name,
+                command=" ".join(args),
+            )
+
+
+def check_call(args: typing.List[str], **kwargs: typing.Any):
+    """Like `subprocess.check_call`, but record a span like `call`.
+    """
+    import subprocess  # Slow to import; not needed by every command.
+
+    code = call(args, **kwargs)
+    if code:
+        raise subprocess.CalledProcessError(code, args)
+
+
+def write(path: pathlib.Path):
+    """Write recorded spans to path as JSON.
+    """
+    if _events is None:
+        return
+    metadata = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "args": {"name": "pypro {}".format(" ".join(sys.argv[1:]))},
+        }
+    ]
+    metadata.extend(
+        {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": n}}
+        for pid, n in _processes.items()
+    )
+    data = {"traceEvents": metadata + _events, "displayTimeUnit": "ms"}
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f)
@@ -0,0 +1,136 @@
+"""Remove directory trees without waiting for them to be deleted.
+
+A tree is renamed into a trash directory, which takes one step no matter how
+large the tree is. The trash is then emptied by a detached process, so the
+caller can return immediately.
+
+This file is run by path as the emptying process, so it must only import
+from the standard library.
+"""
+
+__all__ = ["discard", "empty"]
+
+import concurrent.futures
+import os
+import pathlib
+import shutil
+import stat
+import subprocess
+import sys
+import typing
+import uuid
+
+
+def discard(path: pathlib.Path, trash: pathlib.Path):
+    """Move path into the trash directory.
+
+    The trash should be on the same file system as path. If path cannot be
+    moved there, it is deleted in place instead (which blocks).
+    """
+    if not path.exists() and not path.is_symlink():
+        return
+    trash.mkdir(parents=True, exist_ok=True)
+    target = trash.joinpath("{}-{}".format(path.name, uuid.uuid4().hex))
+    try:
+        path.rename(target)
+    except OSError:
+        shutil.rmtree(str(path))
+
+
+def empty(trash: pathlib.Path):
+    """Empty the trash directory in a detached process.
+    """
+    if not trash.is_dir():
+        return
+    kwargs: typing.Dict[str, typing.Any] = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = (
+            subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        subprocess.Popen(
+            [sys.executable, "-I", __file__, str(trash)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **kwargs
+        )
+    except OSError:
+        _empty(trash)
+
+
+def _scan(
+    root: str, files: typing.List[str], directories: typing.List[str]
+):
+    # Walk the tree once. Directories are listed before their content.
+    stack = [root]
+    directories.append(root)
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+                stack.append(entry.path)
+            else:
+                files.append(entry.path)
+
+
+def _unlink_all(paths: typing.List[str]):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except PermissionError:  # Read-only files on Windows.
+            try:
+                os.chmod(path, stat.S_IWRITE)
+                os.unlink(path)
+            except OSError:
+                pass
+        except OSError:
+            pass
+
+
+# Files are unlinked in batches, to keep the overhead of workers down.
+_BATCH_SIZE = 256
+
+
+def _empty(trash: pathlib.Path, jobs: typing.Optional[int] = None):
+    # Claim what is in the trash first, so processes emptying it at the same
+    # time (e.g. started by consecutive removals) do not repeat each other.
+    claimed = trash.joinpath(".emptying-{}".format(uuid.uuid4().hex))
+    claimed.mkdir()
+    for entry in os.scandir(str(trash)):
+        if entry.path != str(claimed):
+            try:
+                os.rename(entry.path, str(claimed.joinpath(entry.name)))
+            except OSError:
+                pass  # Claimed by someone else.
+
+    files: typing.List[str] = []
+    directories: typing.List[str] = []
+    _scan(str(claimed), files, directories)
+
+    if jobs is None:
+        jobs = min(32, (os.cpu_count() or 1) * 4)  # Mostly waiting on I/O.
+    batches = [
+        files[i : i + _BATCH_SIZE] for i in range(0, len(files), _BATCH_SIZE)
+    ]
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(_unlink_all, batches))
+
+    for directory in reversed(directories):  # Content before directories.
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    _empty(pathlib.Path(sys.argv[1]))
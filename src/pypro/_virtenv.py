@@ -2,10 +2,36 @@ from __future__ import print_function
 
 __all__ = ["create", "VirtualenvNotFound"]
 
+import locale
 import os
 import subprocess
 import sys
 
+
+def _call(cmd, **kwargs):
+    """Run a command, writing its output to sys.stdout.
+
+    The output is relayed instead of inherited, so it goes wherever the
+    caller has redirected sys.stdout to.
+    """
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **kwargs
+    )
+    encoding = locale.getpreferredencoding(False)
+    for line in iter(proc.stdout.readline, b""):
+        if sys.version_info >= (3,):  # Python 2 writes bytes as-is.
+            line = line.decode(encoding, "replace")
+        sys.stdout.write(line)
+    proc.stdout.close()
+    return proc.wait()
+
+
+def _check_call(cmd, **kwargs):
+    returncode = _call(cmd, **kwargs)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
 try:
     import venv
 except ImportError:
@@ -49,7 +75,7 @@ else:
                     "PIP_NO_WARN_CONFLICTS": "1",
                 }
             )
-            returncode = subprocess.call(
+            returncode = _call(
                 [
                     context.env_exe,
                     "-m",
@@ -116,7 +142,7 @@ def _create_virtualenv(virtualenv_py, env_dir, system, prompt, bare):
         cmd.append("--system-site-packages")
     if bare:
         cmd.extend(["--no-pip", "--no-setuptools", "--no-wheel"])
-    subprocess.check_call(cmd)
+    _check_call(cmd)
 
 
 def _is_venv_usable(needs_pip):
@@ -165,7 +191,7 @@ def _create_with_python(python, env_dir, system, prompt, bare, virtualenv_py):
         cmd.append("--bare")
     if virtualenv_py:
         cmd.extend(["--virtualenv.py", virtualenv_py])
-    subprocess.check_call(cmd)
+    _check_call(cmd)
 
 
 def create(python, env_dir, system, prompt, bare, virtualenv_py=None):
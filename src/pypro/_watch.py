@@ -0,0 +1,204 @@
+"""Watch files for changes.
+
+Directories containing the watched files are watched, instead of the files
+themselves. Many editors save a file by writing a new one and renaming it
+over the old, which would drop a watch on the file. This also lets us notice
+files created next to watched ones.
+
+inotify is used on Linux, through ctypes. Other platforms poll.
+"""
+
+__all__ = ["create_watcher", "wait_for_changes"]
+
+import ctypes
+import ctypes.util
+import os
+import pathlib
+import select
+import struct
+import sys
+import time
+import typing
+
+
+_Paths = typing.Set[pathlib.Path]
+
+
+# From sys/inotify.h.
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_CLOEXEC = 0o2000000
+
+_IN_MASK = (
+    _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len.
+
+
+class _InotifyWatcher:
+    def __init__(self, libc: ctypes.CDLL):
+        self._libc = libc
+        self._fd = libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: typing.Dict[int, pathlib.Path] = {}
+        self._paths: _Paths = set()
+
+    def watch(self, paths: typing.Iterable[pathlib.Path]):
+        """Watch paths, in addition to those already watched.
+        """
+        paths = set(paths)
+        watched = set(self._directories.values())
+        for directory in {p.parent for p in paths}.difference(watched):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(str(directory)), _IN_MASK
+            )
+            if wd >= 0:  # The directory may not exist (yet).
+                self._directories[wd] = directory
+        self._paths.update(paths)
+
+    def wait(self, timeout: typing.Optional[float]) -> _Paths:
+        """Wait for changes, and return changed paths.
+
+        Returns an empty set if nothing changes before timeout.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self._fd, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, size = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + size].rstrip(b"\0")
+            offset += size
+            if mask & _IN_Q_OVERFLOW:
+                changed.update(self._paths)  # Events lost; assume the worst.
+            elif mask & _IN_IGNORED:
+                self._directories.pop(wd, None)
+            elif wd in self._directories and name:
+                directory = self._directories[wd]
+                changed.add(directory.joinpath(os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+# Signature of a path. None if it does not exist.
+_Signature = typing.Optional[typing.Tuple[int, int]]
+
+
+def _get_signature(path: pathlib.Path) -> _Signature:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _list_directory(directory: pathlib.Path) -> typing.Set[str]:
+    try:
+        return set(os.listdir(str(directory)))
+    except FileNotFoundError:
+        return set()
+
+
+class _PollingWatcher:
+    def __init__(self, interval: float = 0.5):
+        self._interval = interval
+        self._signatures: typing.Dict[pathlib.Path, _Signature] = {}
+        self._listings: typing.Dict[
+            pathlib.Path, typing.Tuple[_Signature, typing.Set[str]]
+        ] = {}
+
+    def watch(self, paths: typing.Iterable[pathlib.Path]):
+        for path in paths:
+            if path not in self._signatures:
+                self._signatures[path] = _get_signature(path)
+            directory = path.parent
+            if directory not in self._listings:
+                self._listings[directory] = (
+                    _get_signature(directory),
+                    _list_directory(directory),
+                )
+
+    def _poll(self) -> _Paths:
+        changed = set()
+        for path, old in self._signatures.items():
+            new = _get_signature(path)
+            if new != old:
+                self._signatures[path] = new
+                changed.add(path)
+        for directory, (old, names) in self._listings.items():
+            new = _get_signature(directory)
+            if new == old:
+                continue
+            new_names = _list_directory(directory)
+            self._listings[directory] = (new, new_names)
+            changed.update(directory.joinpath(n) for n in names ^ new_names)
+        return changed
+
+    def wait(self, timeout: typing.Optional[float]) -> _Paths:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self._poll()
+            if changed:
+                return changed
+            if deadline is None:
+                delay = self._interval
+            else:
+                delay = min(self._interval, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+def create_watcher():
+    """Create a watcher with the best mechanism available.
+
+    A watcher has three methods. ``watch(paths)`` adds paths to watch.
+    ``wait(timeout)`` waits for changes and returns the changed paths.
+    ``close()`` releases resources.
+    """
+    if sys.platform.startswith("linux"):
+        name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            return _InotifyWatcher(libc)
+        except (AttributeError, OSError):  # No inotify.
+            pass
+    return _PollingWatcher()
+
+
+def wait_for_changes(watcher, debounce: float = 0.1) -> _Paths:
+    """Wait until paths change, and return all of them.
+
+    After the first change, wait until nothing has changed for debounce
+    seconds, so a burst of changes (e.g. saving many files, or switching
+    branches) is reported at once.
+    """
+    changed = watcher.wait(None)
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed.update(more)
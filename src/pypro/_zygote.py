@@ -0,0 +1,346 @@
+"""Run scripts in processes forked from a pre-warmed interpreter.
+
+A zygote is a long-lived server process of a runtime's interpreter, with
+modules preloaded. It listens on a Unix socket. For each request, the zygote
+forks a worker, which forks again to run the script with the client's stdio,
+working directory, environment, and arguments. The worker waits for the
+script, and reports its pid and exit status back to the client.
+
+The zygote is single-threaded, so it is always safe to fork. It exits when
+it has been idle for a while, or when a request is made with a different
+fingerprint (e.g. the project has been installed again), so the client can
+start a new one with fresh modules.
+"""
+
+__all__ = ["ZygoteUnavailable", "get_socket_path", "run"]
+
+import array
+import hashlib
+import json
+import os
+import pathlib
+import signal
+import socket
+import subprocess
+import typing
+
+from .utils import get_cache_dir
+
+
+_SERVER_CODE = """
+import array
+import json
+import os
+import runpy
+import signal
+import socket
+import sys
+import traceback
+
+from importlib import import_module
+
+
+def _receive(conn):
+    fds = array.array("i")
+    data, ancdata, _, _ = conn.recvmsg(
+        65536, socket.CMSG_LEN(3 * fds.itemsize)
+    )
+    for level, kind, cdata in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cdata[: len(cdata) - len(cdata) % fds.itemsize])
+    while not data.endswith(b"\\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode("utf-8")), list(fds)
+
+
+def _reopen_stdio():
+    # Standard streams buffer differently depending on whether they are
+    # interactive, so recreate them for the client's stdio.
+    for name, fd in [("stdin", 0), ("stdout", 1), ("stderr", 2)]:
+        old = getattr(sys, name)
+        if name == "stdin":
+            stream = os.fdopen(fd, "r", closefd=False)
+        else:
+            interactive = name == "stderr" or os.isatty(fd)
+            stream = os.fdopen(
+                fd,
+                "w",
+                buffering=1 if interactive else -1,
+                encoding=old.encoding,
+                errors=old.errors,
+                closefd=False,
+            )
+        setattr(sys, name, stream)
+
+
+def _run(request, fds):
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    _reopen_stdio()
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    kind, target = request["target"]
+    sys.argv = [target] + request["args"]
+    code = 0
+    try:
+        if kind == "path":
+            sys.path[0] = os.path.dirname(target)
+            runpy.run_path(target, run_name="__main__")
+        else:
+            sys.path[0] = request["cwd"]
+            runpy.run_module(target, run_name="__main__", alter_sys=True)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(code)
+
+
+def _handle(conn, request, fds):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        _run(request, fds)
+    for fd in fds:
+        os.close(fd)
+    conn.sendall("pid {}\\n".format(pid).encode("ascii"))
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        code = -os.WTERMSIG(status)
+    else:
+        code = os.WEXITSTATUS(status)
+    conn.sendall("exit {}\\n".format(code).encode("ascii"))
+    os._exit(0)
+
+
+def _serve(path, fingerprint, preloads, timeout):
+    for name in preloads:
+        try:
+            import_module(name)
+        except Exception:
+            pass
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    temp = "{}.{}".format(path, os.getpid())
+    server.bind(temp)
+    os.chmod(temp, 0o600)  # Only the user may ask us to run code.
+    server.listen(16)
+    os.replace(temp, path)
+    ino = os.stat(path).st_ino
+    server.settimeout(timeout)
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Reap workers.
+    sys.stdout.write("ready\\n")
+    sys.stdout.flush()
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+
+    while True:
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            break
+        conn.setblocking(True)
+        request, fds = _receive(conn)
+        if request["fingerprint"] != fingerprint:
+            _unlink(path, ino)  # Before replying, so no one connects again.
+            conn.sendall(b"stale\\n")
+            conn.close()
+            for fd in fds:
+                os.close(fd)
+            break
+        if os.fork() == 0:
+            server.close()
+            _handle(conn, request, fds)
+        conn.close()
+        for fd in fds:
+            os.close(fd)
+
+    _unlink(path, ino)
+
+
+def _unlink(path, ino):
+    # Only remove the socket if it has not been taken over by another zygote.
+    try:
+        if os.stat(path).st_ino == ino:
+            os.unlink(path)
+    except OSError:
+        pass
+
+
+path, fingerprint, timeout = sys.argv[1:4]
+_serve(path, json.loads(fingerprint), sys.argv[4:], int(timeout))
+"""
+
+# Seconds a zygote stays alive without receiving requests.
+_IDLE_TIMEOUT = 600
+
+# Forwarded to the script so it can be interrupted as if run directly.
+_FORWARDED_SIGNALS = ["SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT"]
+
+
+class ZygoteUnavailable(Exception):
+    pass
+
+
+def get_socket_path(root: pathlib.Path) -> pathlib.Path:
+    """Get where the zygote of a runtime at root listens.
+
+    Socket paths have a short length limit, so they are named by a hash of
+    the runtime root, in the per-user runtime directory if there is one.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        directory = pathlib.Path(base, "pypro")
+    else:
+        directory = get_cache_dir().joinpath("zygotes")
+    digest = hashlib.sha256(os.fsencode(str(root))).hexdigest()[:16]
+    return directory.joinpath("{}.sock".format(digest))
+
+
+def _start(
+    python: pathlib.Path,
+    path: pathlib.Path,
+    fingerprint: typing.Any,
+    preloads: typing.List[str],
+):
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    args = [
+        str(python),
+        "-c",
+        _SERVER_CODE,
+        str(path),
+        json.dumps(fingerprint),
+        str(_IDLE_TIMEOUT),
+    ]
+    proc = subprocess.Popen(
+        args + preloads,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    stdout = typing.cast(typing.IO[bytes], proc.stdout)
+    with stdout:
+        line = stdout.readline()
+    if line != b"ready\n":
+        proc.wait()
+        raise ZygoteUnavailable("failed to start zygote")
+
+
+def _connect(path: pathlib.Path) -> typing.Optional[socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _request(sock: socket.socket, request: dict) -> typing.Optional[int]:
+    """Send a request, and wait for the script to finish.
+
+    Returns the exit code of the script, or None if the zygote is stale.
+    """
+    payload = json.dumps(request).encode("utf-8") + b"\n"
+    fds = array.array("i", [0, 1, 2])
+    try:
+        sent = sock.sendmsg(
+            [payload], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds.tobytes())]
+        )
+        if sent < len(payload):
+            sock.sendall(payload[sent:])
+    except (BrokenPipeError, ConnectionResetError):
+        return None  # The zygote is exiting. Nothing has run yet.
+
+    with sock.makefile("rb") as f:
+        line = f.readline()
+        if line in (b"", b"stale\n"):
+            # Outdated, or exited before accepting us. Nothing has run yet.
+            return None
+        if not line.startswith(b"pid "):
+            raise ZygoteUnavailable("unexpected response {!r}".format(line))
+        pid = int(line[4:])
+
+        def forward(signum, frame):
+            os.kill(pid, signum)
+
+        handlers = {}
+        for name in _FORWARDED_SIGNALS:
+            signum = getattr(signal, name)
+            handlers[signum] = signal.signal(signum, forward)
+        try:
+            line = f.readline()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    if not line.startswith(b"exit "):
+        raise ZygoteUnavailable("unexpected response {!r}".format(line))
+    code = int(line[5:])
+    if code < 0:  # Killed by a signal; report like a shell does.
+        return 128 - code
+    return code
+
+
+def run(
+    python: pathlib.Path,
+    root: pathlib.Path,
+    target: typing.Tuple[str, str],
+    args: typing.List[str],
+    *,
+    fingerprint: typing.Any,
+    preloads: typing.List[str],
+) -> int:
+    """Run a script in a process forked from the runtime's zygote.
+
+    target is a 2-tuple. The first item is "path" to run a file, or "module"
+    to run a module (like ``python -m``). The zygote is started if it is not
+    running, or if it was started with a different fingerprint.
+
+    Returns the script's exit code. Raises `ZygoteUnavailable` if the zygote
+    cannot be used, e.g. on platforms without fork.
+    """
+    if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        raise ZygoteUnavailable("not supported on this platform")
+    path = get_socket_path(root)
+    request = {
+        "fingerprint": fingerprint,
+        "target": list(target),
+        "args": args,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+    }
+    for _ in range(2):
+        sock = _connect(path)
+        if sock is None:
+            try:
+                _start(python, path, fingerprint, preloads)
+            except OSError as e:
+                raise ZygoteUnavailable(str(e))
+            sock = _connect(path)
+            if sock is None:
+                raise ZygoteUnavailable("cannot connect to zygote")
+        with sock:
+            code = _request(sock, request)
+        if code is not None:
+            return code
+    raise ZygoteUnavailable("zygote keeps being outdated")
@@ -1,3 +1,7 @@
 PROJECT_NOT_FOUND = 1
 
 VENV_NOT_FOUND = 2
+
+SEEDS_UNAVAILABLE = 3
+
+WORKSPACE_NOT_FOUND = 4
@@ -1,57 +1,225 @@
+import atexit
+import csv
+import hashlib
 import json
+import locale
 import os
 import pathlib
 import subprocess
 import sys
+import threading
 import typing
 
+from pypro import _buildenvs, _trace
 from pypro.projects import Build, Project
+from pypro.projects.builds import BuildEnv
+from pypro.projects.runtimes import Runtime
+from pypro.utils import RECORD_CSV_KWARGS, hash_file, write_text_atomic
 
 
+# The worker serves hook calls until its stdin is closed. Each request is one
+# line of JSON, listing calls to make in order; the response is one line with
+# the result (or error) of each. Hooks may print things (e.g. setup.py
+# output), so responses are written to the original stdout, and everything
+# printed during the calls (subprocesses included) is redirected to stderr.
+# Output of each request ends with a line holding a null character, written
+# before the response.
 _API_CODE = """
 import json
+import os
+import sys
+import time
 
-try:
-    input = raw_input
-except NameError:
-    pass
+from importlib import import_module
 
-data = json.loads(input())
+channel = os.fdopen(os.dup(1), "w")
+os.dup2(2, 1)
+sys.stdout = sys.stderr
 
-mod, _, fpath = data["spec"].split(":", 1)
-kwargs = data["kwargs"]
 
-obj = import_module(mod)
-if fpath:
-    for name in fpath.split("."):
-        obj = getattr(obj, name)
+def call(data):
+    mod, _, fpath = data["spec"].partition(":")
+    obj = import_module(mod)
+    if fpath:
+        for name in fpath.split("."):
+            obj = getattr(obj, name)
+    return obj(**data["kwargs"])
 
-try:
-    result = {"r": obj(**kwargs)}
-except Exception as e:
-    result = {"e": str(e)}
 
-print(json.dumps(result))
+for line in iter(sys.stdin.readline, ""):
+    results = []
+    for data in json.loads(line):
+        start = time.monotonic()
+        try:
+            result = {"r": call(data)}
+        except (Exception, SystemExit) as e:
+            result = {"e": str(e)}
+        result["t"] = [start, time.monotonic()]
+        results.append(result)
+    sys.stderr.write("\\0\\n")
+    sys.stderr.flush()
+    channel.write(json.dumps(results) + "\\n")
+    channel.flush()
 """
 
 
-def _call_api(python: os.PathLike, spec: str, kw: dict) -> typing.Any:
-    inp = json.dumps({"spec": spec, "kwargs": kw}).encode(sys.stdin.encoding)
+class HookFailed(RuntimeError):
+    """A hook raised an error.
+    """
 
-    p = subprocess.Popen(
-        [str(python), "-c", _API_CODE],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-    )
-    out, _ = p.communicate(inp)
-    p.wait()
+    def __init__(self, spec: str, message: str):
+        super().__init__(message)
+        self.spec = spec
+
+
+# A hook to call: (spec, kwargs).
+_Call = typing.Tuple[str, dict]
+
+
+class _HookWorker:
+    """A long-lived interpreter to call hooks in.
+
+    This keeps the backend (and setuptools) imported between calls, so each
+    call only costs a round trip through the pipe. Calls can be batched to
+    share a round trip.
+    """
+
+    def __init__(self, python: os.PathLike, cwd: os.PathLike):
+        self._proc = subprocess.Popen(
+            [str(python), "-c", _API_CODE],
+            cwd=str(cwd),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        # All are piped, so never None.
+        self._stdin = typing.cast(typing.IO[bytes], self._proc.stdin)
+        self._stdout = typing.cast(typing.IO[bytes], self._proc.stdout)
+        self._stderr = typing.cast(typing.IO[bytes], self._proc.stderr)
+        self._name = "hook worker ({})".format(cwd)
+
+    @property
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def _relay_output(self):
+        # Relayed by the calling thread, so it goes wherever the thread has
+        # redirected sys.stderr to (see `_output`).
+        encoding = locale.getpreferredencoding(False)
+        for line in iter(self._stderr.readline, b""):
+            if line.rstrip(b"\r\n") == b"\0":
+                break
+            sys.stderr.write(line.decode(encoding, "replace"))
+        sys.stderr.flush()
+
+    def call_many(self, calls: typing.List[_Call]) -> typing.List[typing.Any]:
+        """Make calls in one round trip, in order.
+
+        Returns results in the same order. The result of a call that failed
+        is a `HookFailed` instance. Raises RuntimeError if the worker dies.
+        """
+        inp = json.dumps([{"spec": s, "kwargs": kw} for s, kw in calls])
+        inp += "\n"
+        try:
+            self._stdin.write(inp.encode("utf-8"))
+            self._stdin.flush()
+        except BrokenPipeError:
+            pass  # Worker is dead. Detected below.
+        self._relay_output()
+        out = self._stdout.readline()
+        if not out:
+            code = self._proc.wait()
+            raise RuntimeError("hook worker exited with {}".format(code))
+
+        results = []
+        for (spec, _), result in zip(calls, json.loads(out.decode("utf-8"))):
+            _trace.add_span(
+                spec,
+                *result["t"],
+                pid=self._proc.pid,
+                process_name=self._name,
+            )
+            try:
+                results.append(result["r"])
+            except KeyError:
+                results.append(HookFailed(spec, result.get("e")))
+        return results
+
+    def close(self, timeout: float = 5):
+        try:
+            self._stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self._proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._stdout.close()
+        self._stderr.close()
+
+
+# Idle workers, by interpreter and working directory. A worker is taken out
+# while it serves a call, so calls made at once (e.g. by stages of `ready`
+# running concurrently) each get a worker of their own.
+_workers: typing.Dict[typing.Tuple[str, str], typing.List[_HookWorker]] = {}
+
+_workers_lock = threading.Lock()
+
+
+@atexit.register
+def _close_workers():
+    with _workers_lock:
+        workers = [w for idle in _workers.values() for w in idle]
+        _workers.clear()
+    for worker in workers:
+        worker.close()
+
+
+def _release_worker(key: typing.Tuple[str, str], worker: _HookWorker):
+    if not worker.alive:  # Don't keep a worker that has died.
+        worker.close()
+        return
+    with _workers_lock:
+        _workers.setdefault(key, []).append(worker)
 
-    result = json.loads(out.decode(sys.stdout.encoding))
+
+def _call_api_many(
+    python: os.PathLike, calls: typing.List[_Call], cwd: os.PathLike
+) -> typing.List[typing.Any]:
+    """Call hooks in one round trip to a worker.
+
+    Calls are made in order, so a call may rely on effects of those before
+    it. Returns results in the same order. The result of a call that failed
+    is a `HookFailed` instance; other calls are still made.
+    """
+    key = (str(python), str(cwd))
+    with _workers_lock:
+        idle = _workers.get(key)
+        worker = idle.pop() if idle else None
+    if worker is None:
+        with _trace.span("start hook worker"):
+            worker = _HookWorker(python, cwd)
+    specs = ", ".join(spec for spec, _ in calls)
     try:
-        r = result["r"]
-    except KeyError:
-        raise RuntimeError(result.get("e"))
-    return r
+        with _trace.span("call hooks", specs=specs):
+            results = worker.call_many(calls)
+    except BaseException:
+        worker.close()  # Dead, or interrupted mid-call.
+        raise
+    _release_worker(key, worker)
+    return results
+
+
+def _call_api(
+    python: os.PathLike, spec: str, kw: dict, cwd: os.PathLike
+) -> typing.Any:
+    """Call a hook. Raises `HookFailed` if the hook raises an error.
+    """
+    result, = _call_api_many(python, [(spec, kw)], cwd)
+    if isinstance(result, HookFailed):
+        raise result
+    return result
 
 
 SETUPTOOLS_DEVAPI_PY = (
@@ -61,19 +229,324 @@ SETUPTOOLS_DEVAPI_PY = (
 )
 
 
-def build_py(
-    project: Project, build: Build
-) -> typing.List[typing.Tuple[str, pathlib.Path]]:
+def _inject_backend(env: BuildEnv):
     # HACK: Inject setuptools_devapi into the build environment. In the end
     # we should standardize this and make that module into a build-requires.
     src = SETUPTOOLS_DEVAPI_PY
-    build.env.site_packages.joinpath(src.name).write_text(src.read_text())
+    dst = env.site_packages.joinpath(src.name)
+    content = src.read_text()
+    if not dst.is_file() or dst.read_text() != content:
+        # Atomically, since the env may be used by other projects right now.
+        write_text_atomic(dst, content)
 
-    # TODO: Make these configurable.
-    spec = "setuptools_devapi:collect_pure_for_dev"
-    kwargs = {"config_settings": None}
-    result = _call_api(build.env.python, spec, kwargs)
+
+# Files configuring the build. Results of any hook may change with them.
+_SETUP_FILES = ["MANIFEST.in", "pyproject.toml", "setup.cfg", "setup.py"]
+
+
+def _get_setup_signature(project: Project) -> typing.Dict[str, typing.Any]:
+    signature: typing.Dict[str, typing.Any] = {}
+    for name in _SETUP_FILES:
+        try:
+            st = project.root.joinpath(name).stat()
+        except FileNotFoundError:
+            signature[name] = None
+        else:
+            signature[name] = [st.st_size, st.st_mtime_ns]
+    return signature
+
+
+def _get_requires(project: Project, runtime: Runtime) -> typing.List[str]:
+    # Ask in the env without extra requirements, which always exists.
+    env = _buildenvs.get_env(runtime.python, runtime.name, [])
+    _inject_backend(env)
+    return _call_api(
+        env.python,
+        "setuptools_devapi:get_requires_for_dev",
+        {"config_settings": None},
+        project.root,
+    )
+
+
+@_trace.span("get build")
+def get_build(project: Project, runtime: Runtime) -> Build:
+    """Get the build for a runtime, creating it if needed.
+
+    Build envs are shared by projects with the same build requirements. The
+    requirements are only asked for again if setup files have changed since
+    they were last asked for.
+    """
+    build = project.get_build(runtime.name)
+    signature = _get_setup_signature(project)
+    if (
+        build is not None
+        and build.env.exists()
+        and _read_index(build.requires_index).get("sources") == signature
+    ):
+        return build
+
+    requires = _get_requires(project, runtime)
+    env = _buildenvs.get_env(runtime.python, runtime.name, requires)
+    if build is None:
+        build = project.create_build(runtime.name, env)
+    elif build.env != env:
+        build = project.set_build_env(build, env)
+    index = {"requires": requires, "sources": signature}
+    write_text_atomic(build.requires_index, json.dumps(index, indent=2))
+    return build
+
+
+# Files to install: (installed_path, source_path).
+_Files = typing.List[typing.Tuple[str, pathlib.Path]]
+
+_COLLECT_PURE = "setuptools_devapi:collect_pure_for_dev"
+
+_GET_TRIGGERS = "setuptools_devapi:get_paths_triggering_build"
+
+
+def _to_pure_files(project: Project, rows: typing.List[list]) -> _Files:
     return [
-        (row[0], pathlib.Path(project.root, row[1]).resolve())
-        for row in result
+        (row[0], pathlib.Path(project.root, row[1]).resolve()) for row in rows
     ]
+
+
+def _is_source_dir_name(name: str) -> bool:
+    return not (
+        name.startswith(".")
+        or name == "__pycache__"
+        or name.endswith(".egg-info")
+    )
+
+
+def _get_tree_signature(project: Project) -> str:
+    """Fingerprint the listing of directories in the project.
+
+    A directory's mtime changes when entries are added, removed or renamed in
+    it, so this changes whenever a module or package appears or disappears
+    anywhere in the project, including directories no result has come from
+    yet (e.g. the first package in an empty project). Hidden directories and
+    build outputs are skipped. No file is read.
+    """
+    h = hashlib.sha256()
+    build_dir = str(project.build_dir)
+    for root, dirnames, _ in os.walk(str(project.root)):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if _is_source_dir_name(name)
+            and os.path.join(root, name) != build_dir
+        )
+        try:
+            mtime = os.stat(root).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        relative = os.path.relpath(root, str(project.root))
+        h.update("{}\0{}\0".format(relative, mtime).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _call_memoized(
+    project: Project, build: Build, specs: typing.List[str]
+) -> typing.List[typing.Any]:
+    """Call hooks on the project, reusing results from previous calls.
+
+    Results are memoized in the build container, by hook and config settings,
+    along with signatures of the backend, setup files, and the project's
+    directory listing. A result is reused while none of them has changed.
+    Hooks that need to be called are called in one round trip.
+    """
+    # TODO: Make these configurable.
+    config_settings = None
+
+    memo = _read_index(build.hook_index)
+    # Taken before hooks are called, so changes made while they run are seen
+    # next time.
+    backend = SETUPTOOLS_DEVAPI_PY.stat()
+    signatures = {
+        "backend": [backend.st_size, backend.st_mtime_ns],
+        "setup": _get_setup_signature(project),
+        "tree": _get_tree_signature(project),
+    }
+    results = {}
+    for spec in specs:
+        entry = memo.get(json.dumps([spec, config_settings]))
+        if entry is not None and entry.get("signatures") == signatures:
+            results[spec] = entry["result"]
+
+    missing = [spec for spec in specs if spec not in results]
+    if missing:
+        _inject_backend(build.env)
+        kwargs = {"config_settings": config_settings}
+        calls = [(spec, kwargs) for spec in missing]
+        for spec, result in zip(
+            missing, _call_api_many(build.env.python, calls, project.root)
+        ):
+            if isinstance(result, HookFailed):
+                raise result
+            results[spec] = result
+            memo[json.dumps([spec, config_settings])] = {
+                "signatures": signatures,
+                "result": result,
+            }
+        write_text_atomic(build.hook_index, json.dumps(memo))
+
+    return [results[spec] for spec in specs]
+
+
+@_trace.span("build_py")
+def build_py(project: Project, build: Build) -> _Files:
+    rows, = _call_memoized(project, build, [_COLLECT_PURE])
+    return _to_pure_files(project, rows)
+
+
+@_trace.span("inspect project")
+def inspect_project(
+    project: Project, build: Build
+) -> typing.Tuple[typing.List[str], _Files]:
+    """Get paths triggering an extension build, and pure files to install.
+
+    The backend is asked for both in one round trip, if it needs to be asked
+    at all. Pass the paths to `build_ext`; the files are what `build_py`
+    returns.
+    """
+    specs = [_GET_TRIGGERS, _COLLECT_PURE]
+    paths, rows = _call_memoized(project, build, specs)
+    return paths, _to_pure_files(project, rows)
+
+
+# Fingerprint of a path: [size, mtime_ns, hash], or None if it does not exist.
+_Fingerprint = typing.Optional[typing.List[typing.Any]]
+
+
+def _fingerprint_paths(
+    root: pathlib.Path,
+    paths: typing.Iterable[str],
+    known: typing.Dict[str, _Fingerprint],
+) -> typing.Dict[str, _Fingerprint]:
+    """Fingerprint paths (relative to root).
+
+    Files are only hashed if their size or mtime differ from the known
+    fingerprint, so they need not be read when nothing has changed.
+    """
+    fingerprints: typing.Dict[str, _Fingerprint] = {}
+    for path in paths:
+        full_path = root.joinpath(path)
+        try:
+            st = full_path.stat()
+        except FileNotFoundError:
+            fingerprints[path] = None
+            continue
+        old = known.get(path)
+        if old and old[:2] == [st.st_size, st.st_mtime_ns]:
+            fingerprints[path] = old
+        else:
+            fingerprints[path] = [
+                st.st_size,
+                st.st_mtime_ns,
+                hash_file(full_path),
+            ]
+    return fingerprints
+
+
+def _get_hashes(
+    fingerprints: typing.Dict[str, _Fingerprint]
+) -> typing.Dict[str, typing.Optional[str]]:
+    return {k: (v[2] if v else None) for k, v in fingerprints.items()}
+
+
+def _read_index(path: pathlib.Path) -> typing.Dict[str, typing.Any]:
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_depends(build_directory: pathlib.Path) -> typing.List[str]:
+    try:
+        f = build_directory.joinpath("DEPENDS").open(
+            newline="", encoding="utf-8"
+        )
+    except FileNotFoundError:
+        return []
+    with f:
+        return [row[0] for row in csv.reader(f, **RECORD_CSV_KWARGS) if row]
+
+
+def get_trigger_paths(
+    project: Project, build: Build
+) -> typing.List[pathlib.Path]:
+    """List paths that trigger a build, as recorded by the last build.
+    """
+    index = _read_index(build.trigger_index)
+    return [project.root.joinpath(p) for p in index.get("paths", {})]
+
+
+@_trace.span("build_ext")
+def build_ext(
+    project: Project,
+    build: Build,
+    *,
+    rebuild: bool = True,
+    trigger_paths: typing.Optional[typing.List[str]] = None,
+) -> _Files:
+    """Build extensions in the project if needed, and list the built files.
+
+    The backend reports paths that trigger a build, unless they are given as
+    `trigger_paths` (see `inspect_project`), and files the last build was
+    found to depend on (e.g. headers included by sources). Their fingerprints
+    are stored in the build container after each build, and the build is
+    skipped if none of the paths has changed (by content) since.
+
+    If `rebuild` is false, never build; only list previously built files.
+    """
+    build_directory = build.root_for_build_ext
+    built = build_directory.joinpath("BUILT")
+
+    if rebuild:
+        # TODO: Make these configurable.
+        config_settings = None
+
+        paths = trigger_paths
+        if paths is None:
+            paths, = _call_memoized(project, build, [_GET_TRIGGERS])
+        index = _read_index(build.trigger_index)
+        fingerprints = _fingerprint_paths(
+            project.root,
+            list(paths) + _read_depends(build_directory),
+            index.get("paths", {}),
+        )
+        if (
+            not built.is_file()
+            or index.get("config_settings") != config_settings
+            or _get_hashes(index.get("paths", {})) != _get_hashes(fingerprints)
+        ):
+            build_directory.mkdir(parents=True, exist_ok=True)
+            _inject_backend(build.env)
+            _call_api(
+                build.env.python,
+                "setuptools_devapi:build_for_dev",
+                {
+                    "build_directory": str(build_directory),
+                    "config_settings": config_settings,
+                },
+                project.root,
+            )
+            # Keep fingerprints taken before the build, so changes made while
+            # it runs are seen next time. Only newly found depends are new.
+            depends = _read_depends(build_directory)
+            found = _fingerprint_paths(
+                project.root, [p for p in depends if p not in fingerprints], {}
+            )
+            fingerprints = {
+                path: (found if path in found else fingerprints)[path]
+                for path in list(paths) + depends
+            }
+        index = {"config_settings": config_settings, "paths": fingerprints}
+        write_text_atomic(build.trigger_index, json.dumps(index, indent=2))
+
+    if not built.is_file():
+        return []
+    with built.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f, **RECORD_CSV_KWARGS))
+    return [(row[0], build_directory.joinpath(row[1])) for row in rows]
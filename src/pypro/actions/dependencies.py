@@ -0,0 +1,261 @@
+__all__ = [
+    "SyncResult",
+    "WheelNotFound",
+    "get_lock_path",
+    "sync_dependencies",
+]
+
+import csv
+import dataclasses
+import json
+import os
+import pathlib
+import re
+import shutil
+import typing
+
+from pypro import _trace, wheels
+from pypro.projects import Project, runtimes
+from pypro.utils import RECORD_CSV_KWARGS, write_text_atomic
+
+
+# Packages needed to manage the runtime itself. Never removed by sync.
+_PROTECTED = {"pip", "setuptools", "wheel"}
+
+_STATE_NAME = "pypro-synced.json"
+
+_LOCK_LINE_RE = re.compile(
+    r"^(?P<name>[A-Za-z0-9._-]+)\s*==\s*(?P<version>[^\s;]+)"
+)
+
+
+def _canonicalize(name: str) -> str:
+    # PEP 503 normalization.
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+class WheelNotFound(Exception):
+    def __init__(self, name: str, version: str, wheels_dir: pathlib.Path):
+        super().__init__(
+            "no wheel for {}=={} in {}".format(name, version, wheels_dir)
+        )
+        self.name = name
+        self.version = version
+
+
+@dataclasses.dataclass()
+class SyncResult:
+    installed: typing.List[str]
+    removed: typing.List[str]
+
+
+def get_lock_path(project: Project) -> pathlib.Path:
+    return project.root.joinpath("pypro.lock")
+
+
+def _read_lock(
+    path: pathlib.Path,
+) -> typing.Dict[str, typing.Tuple[str, str]]:
+    """Read the lock file.
+
+    Each line pins a package as ``name==version``, optionally followed by
+    other requirement options (e.g. ``--hash``), which are ignored. Empty
+    lines and comments (``#``) are allowed.
+    """
+    locked = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        match = _LOCK_LINE_RE.match(line)
+        if not match:
+            raise ValueError("invalid lock line: {!r}".format(line))
+        name, version = match.group("name", "version")
+        locked[_canonicalize(name)] = (name, version)
+    return locked
+
+
+def _index_installed(
+    site_packages: pathlib.Path,
+) -> typing.Dict[str, typing.Tuple[str, pathlib.Path]]:
+    """Index installed distributions by canonical name.
+
+    Names and versions are read from dist-info directory names, so we only
+    need one directory listing.
+    """
+    installed = {}
+    for entry in os.scandir(str(site_packages)):
+        if not entry.name.endswith(".dist-info") or not entry.is_dir():
+            continue
+        name, _, version = entry.name[: -len(".dist-info")].partition("-")
+        installed[_canonicalize(name)] = (version, pathlib.Path(entry.path))
+    return installed
+
+
+def _get_fingerprint(
+    lock: pathlib.Path, site_packages: pathlib.Path
+) -> typing.List[typing.Optional[int]]:
+    lock_fingerprint: typing.List[typing.Optional[int]]
+    try:
+        st = lock.stat()
+    except FileNotFoundError:
+        lock_fingerprint = [None, None]
+    else:
+        lock_fingerprint = [st.st_mtime_ns, st.st_size]
+    # A distribution being added or removed always changes the directory's
+    # mtime, since it adds or removes a dist-info directory.
+    return lock_fingerprint + [site_packages.stat().st_mtime_ns]
+
+
+def _uninstall(site_packages: pathlib.Path, dist_info: pathlib.Path):
+    """Remove files listed in a distribution's RECORD.
+    """
+    with dist_info.joinpath("RECORD").open(newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f, **RECORD_CSV_KWARGS))
+    directories = set()
+    for row in rows:
+        path = site_packages.joinpath(row[0])
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        directories.add(path.parent)
+    # Remove directories left empty (except bytecode caches), deepest first.
+    for directory in sorted(directories, key=lambda p: -len(p.parts)):
+        if site_packages not in directory.parents or not directory.is_dir():
+            continue
+        if all(e.name == "__pycache__" for e in directory.iterdir()):
+            shutil.rmtree(str(directory))
+    if dist_info.exists():
+        shutil.rmtree(str(dist_info))
+
+
+def _get_wheels_dir(runtime: runtimes.Runtime) -> pathlib.Path:
+    return wheels.get_wheel_cache(runtime.name)
+
+
+def _find_wheel(
+    wheels_dir: pathlib.Path, name: str, version: str
+) -> typing.Optional[pathlib.Path]:
+    key = (_canonicalize(name), version)
+    for path in wheels_dir.glob("*.whl"):
+        parts = path.name.split("-", 2)
+        if (_canonicalize(parts[0]), parts[1]) == key:
+            return path
+    return None
+
+
+def _get_wheels(
+    runtime: runtimes.Runtime,
+    requirements: typing.List[typing.Tuple[str, str]],
+) -> typing.List[pathlib.Path]:
+    """Get wheels of pinned requirements for the runtime.
+
+    Wheels are downloaded into a cache shared by runtimes of the same name,
+    if they are not there yet. Raises `WheelNotFound` if pip did not download
+    a wheel matching a requirement.
+    """
+    wheels_dir = _get_wheels_dir(runtime)
+    missing = [
+        "{}=={}".format(name, version)
+        for name, version in requirements
+        if _find_wheel(wheels_dir, name, version) is None
+    ]
+    if missing:
+        env = os.environ.copy()
+        env["PIP_DISABLE_PIP_VERSION_CHECK"] = "1"
+        # Run pip in the runtime, so it picks wheels compatible with it.
+        _trace.check_call(
+            [
+                str(runtime.python),
+                "-m",
+                "pip",
+                "download",
+                "--only-binary=:all:",
+                "--no-deps",
+                "--dest",
+                str(wheels_dir),
+            ]
+            + missing,
+            env=env,
+        )
+    paths = []
+    for name, version in requirements:
+        path = _find_wheel(wheels_dir, name, version)
+        if path is None:
+            raise WheelNotFound(name, version, wheels_dir)
+        paths.append(path)
+    return paths
+
+
+def _read_state(state_path: pathlib.Path) -> typing.Dict[str, typing.Any]:
+    try:
+        with state_path.open(encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict):  # Written by an older version.
+        return {}
+    return state
+
+
+@_trace.span("sync dependencies")
+def sync_dependencies(
+    project: Project, runtime: runtimes.Runtime
+) -> SyncResult:
+    """Make packages in the runtime match the lock file.
+
+    Only locked packages that are missing or have a different version are
+    installed, and only packages dropped from the lock since the last sync
+    are removed. Packages never in the lock (e.g. installed by the user with
+    pip) are left alone. Nothing is done if the project has no lock file.
+    Wheels to install are all downloaded before anything is removed.
+
+    The lock file and site-packages are fingerprinted after each sync. If
+    neither has changed since, the sync is skipped without looking further.
+    """
+    lock = get_lock_path(project)
+    if not lock.is_file():
+        return SyncResult(installed=[], removed=[])
+
+    site_packages = runtime.site_packages
+    state_path = runtime.root.joinpath(_STATE_NAME)
+
+    state = _read_state(state_path)
+    if state.get("fingerprint") == _get_fingerprint(lock, site_packages):
+        return SyncResult(installed=[], removed=[])
+
+    locked = _read_lock(lock)
+    installed = _index_installed(site_packages)
+
+    to_install = sorted(
+        (name, version)
+        for key, (name, version) in locked.items()
+        if key not in installed or installed[key][0] != version
+    )
+    to_remove = sorted(
+        key
+        for key in state.get("locked", [])
+        if key in installed and key not in locked and key not in _PROTECTED
+    )
+
+    # Get every wheel first, so the runtime is left as is if one cannot be.
+    to_unpack = _get_wheels(runtime, to_install) if to_install else []
+
+    # Outdated versions are removed before new ones are installed.
+    for key in to_remove + [_canonicalize(name) for name, _ in to_install]:
+        if key in installed:
+            _uninstall(site_packages, installed[key][1])
+    if to_unpack:
+        wheels.install_all(to_unpack, runtime)
+
+    state = {
+        "fingerprint": _get_fingerprint(lock, site_packages),
+        "locked": sorted(locked),
+    }
+    write_text_atomic(state_path, json.dumps(state))
+
+    return SyncResult(
+        installed=["{}=={}".format(n, v) for n, v in to_install],
+        removed=to_remove,
+    )
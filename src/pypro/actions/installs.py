@@ -0,0 +1,217 @@
+__all__ = [
+    "INSTALL_MODES",
+    "InstallResult",
+    "get_installed_paths",
+    "get_manifest_path",
+    "install_project",
+]
+
+import csv
+import dataclasses
+import io
+import pathlib
+import typing
+
+from pypro import _trace
+from pypro.projects import runtimes
+from pypro.utils import (
+    RECORD_CSV_KWARGS,
+    hash_file,
+    place_file,
+    write_text_atomic,
+)
+
+
+_MANIFEST_NAME = "pypro-installed.csv"
+
+
+@dataclasses.dataclass()
+class _Entry:
+    """A row in the install manifest.
+
+    Columns are the installed path (relative to site-packages, like RECORD's
+    first column), hash, size, mtime (in nanoseconds), source path, the
+    install mode requested, and how the file was actually placed (see
+    `place_file`). The size and mtime are of the source file when it was
+    installed, so we can tell whether it needs to be re-installed without
+    reading it.
+    """
+
+    installed: str
+    hash: str
+    size: int
+    mtime: int
+    source: str
+    mode: str
+    method: str
+
+    @classmethod
+    def from_row(cls, row: typing.List[str]) -> "_Entry":
+        """Parse a row.
+
+        A row that cannot be parsed (e.g. written by an older version) gives
+        an entry of unknown content, so the file is installed again, or
+        removed if it is no longer to be installed.
+        """
+        try:
+            installed, hash_, size, mtime, source, mode, method = row
+            return cls(
+                installed, hash_, int(size), int(mtime), source, mode, method
+            )
+        except ValueError:
+            return cls(row[0], "", -1, -1, "", "", "")
+
+    def to_row(self) -> typing.List[str]:
+        return [
+            self.installed,
+            self.hash,
+            str(self.size),
+            str(self.mtime),
+            self.source,
+            self.mode,
+            self.method,
+        ]
+
+
+# Methods to try for each mode, cheapest first. Copying always works, so it is
+# the last resort for every mode.
+INSTALL_MODES = {
+    "auto": ["symlink", "hardlink", "reflink", "copy"],
+    "symlink": ["symlink", "copy"],
+    "hardlink": ["hardlink", "copy"],
+    "reflink": ["reflink", "copy"],
+    "copy": ["copy"],
+}
+
+
+@dataclasses.dataclass()
+class InstallResult:
+    installed: typing.List[str]
+    removed: typing.List[str]
+    unchanged: int
+
+
+def get_manifest_path(runtime: runtimes.Runtime) -> pathlib.Path:
+    return runtime.root.joinpath(_MANIFEST_NAME)
+
+
+def _read_manifest(path: pathlib.Path) -> typing.Dict[str, _Entry]:
+    try:
+        f = path.open(newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return {}
+    with f:
+        rows = list(csv.reader(f, **RECORD_CSV_KWARGS))
+    return {row[0]: _Entry.from_row(row) for row in rows if row}
+
+
+def get_installed_paths(
+    runtime: runtimes.Runtime,
+) -> typing.List[pathlib.Path]:
+    """Get paths of project files installed into the runtime.
+    """
+    entries = _read_manifest(get_manifest_path(runtime))
+    return [runtime.site_packages.joinpath(name) for name in entries]
+
+
+def _write_manifest(path: pathlib.Path, entries: typing.Iterable[_Entry]):
+    f = io.StringIO()
+    rows = sorted(e.to_row() for e in entries)
+    csv.writer(f, **RECORD_CSV_KWARGS).writerows(rows)
+    write_text_atomic(path, f.getvalue())
+
+
+def _remove_installed(base: pathlib.Path, installed: str):
+    target = base.joinpath(installed)
+    try:
+        target.unlink()
+    except FileNotFoundError:
+        pass
+    # Clean up directories left empty, but never go beyond the base.
+    for parent in target.parents:
+        if parent == base or base not in parent.parents:
+            break
+        try:
+            parent.rmdir()
+        except OSError:  # Not empty.
+            break
+
+
+@_trace.span("install project")
+def install_project(
+    runtime: runtimes.Runtime,
+    files: typing.Iterable[typing.Tuple[str, pathlib.Path]],
+    mode: str = "copy",
+) -> InstallResult:
+    """Install files into the runtime's site-packages.
+
+    `files` is a list of 2-tuples `(installed_path, source_path)`, as returned
+    by `builds.build_py`.
+
+    `mode` is a key in `INSTALL_MODES`, specifying how files are placed into
+    site-packages. Link modes fall back to copying for files that cannot be
+    linked; "auto" picks the cheapest method that works for each file.
+
+    A manifest of installed files is kept in the runtime, so only files that
+    are new or changed since the last install are placed, and files no longer
+    in the list are removed. A source file is considered unchanged if its size
+    and mtime match the manifest; if they don't, its content hash is checked
+    before placing it again. Files installed with a different mode are always
+    placed again.
+    """
+    methods = INSTALL_MODES[mode]
+    base = runtime.site_packages
+    manifest_path = get_manifest_path(runtime)
+    old_entries = _read_manifest(manifest_path)
+
+    new_entries = {}
+    installed_paths = []
+    unchanged = 0
+    for installed, source in files:
+        st = source.stat()
+        source_str = str(source)
+        old = old_entries.get(installed)
+        if old is not None and (old.source != source_str or old.mode != mode):
+            old = None
+        if (
+            old is not None
+            and old.size == st.st_size
+            and old.mtime == st.st_mtime_ns
+        ):
+            new_entries[installed] = old
+            unchanged += 1
+            continue
+
+        entry = _Entry(
+            installed=installed,
+            hash=hash_file(source),
+            size=st.st_size,
+            mtime=st.st_mtime_ns,
+            source=source_str,
+            mode=mode,
+            method="",
+        )
+        new_entries[installed] = entry
+
+        # A symlink always reflects the source's content, so it is up-to-date
+        # as long as it points to the right file. Other methods need to be
+        # redone if the content changed.
+        if old is not None and (
+            old.method == "symlink" or old.hash == entry.hash
+        ):
+            entry.method = old.method
+            unchanged += 1
+            continue
+
+        entry.method = place_file(source, base.joinpath(installed), methods)
+        installed_paths.append(installed)
+
+    removed = sorted(set(old_entries).difference(new_entries))
+    for installed in removed:
+        _remove_installed(base, installed)
+
+    _write_manifest(manifest_path, new_entries.values())
+
+    return InstallResult(
+        installed=installed_paths, removed=removed, unchanged=unchanged
+    )
@@ -2,11 +2,13 @@ import os
 import sys
 import typing
 
+from pypro import _trace
 from pypro.projects import Project, ProjectNotFound
 
-from ._errors import PROJECT_NOT_FOUND
+from ._errors import PROJECT_NOT_FOUND, VENV_NOT_FOUND
 
 
+@_trace.span("discover project")
 def find() -> typing.Tuple[typing.Optional[Project], int]:
     try:
         project = Project.discover()
@@ -16,3 +18,41 @@ def find() -> typing.Tuple[typing.Optional[Project], int]:
         return None, PROJECT_NOT_FOUND
 
     return project, 0
+
+
+def clean(project: Project, *, recreate_venvs: bool = True) -> int:
+    """Remove builds and runtimes of the project, and create runtimes again.
+
+    Removed directories are deleted in the background, so this returns
+    before they are gone. Runtimes are recreated with the interpreters they
+    were created from, and the active one stays active.
+    """
+    project.clear_builds()
+    print("Removed builds")
+
+    code = 0
+    active = project.get_active_runtime()
+    for runtime in list(project.iter_runtimes()):
+        python = runtime.get_base_python()
+        project.remove_runtime(runtime)
+        print("Removed runtime {!r}".format(runtime.name))
+        if not recreate_venvs:
+            continue
+        if python is None:
+            message = "Error: Cannot recreate {!r}; base interpreter unknown"
+            print(message.format(runtime.name), file=sys.stderr)
+            code = VENV_NOT_FOUND
+            continue
+        try:
+            new_runtime = project.create_runtime(str(python))
+        except Exception as e:
+            message = "Error: Failed to recreate {!r}\n{}".format(
+                runtime.name, e
+            )
+            print(message, file=sys.stderr)
+            code = VENV_NOT_FOUND
+            continue
+        if runtime == active:
+            project.activate_runtime(new_runtime)
+        print("Created runtime {!r}".format(new_runtime.name))
+    return code
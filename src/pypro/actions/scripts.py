@@ -0,0 +1,89 @@
+__all__ = ["run_script"]
+
+import csv
+import os
+import sys
+import typing
+
+from pypro import _trace, _zygote
+from pypro.projects import runtimes
+from pypro.utils import RECORD_CSV_KWARGS, find_in_paths, hash_file
+
+from .installs import get_manifest_path
+
+
+def _get_preloads(runtime: runtimes.Runtime) -> typing.List[str]:
+    """Get top-level modules of the installed project.
+
+    Importing these also imports what the project depends on.
+    """
+    try:
+        f = get_manifest_path(runtime).open(newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return []
+    with f:
+        names = {
+            row[0].split("/", 1)[0].split(".", 1)[0]
+            for row in csv.reader(f, **RECORD_CSV_KWARGS)
+        }
+    return sorted(name for name in names if name.isidentifier())
+
+
+def _get_fingerprint(runtime: runtimes.Runtime) -> typing.List[typing.Any]:
+    """Fingerprint what modules preloaded by a zygote depend on.
+
+    The install manifest changes when any project file changes, and
+    site-packages' mtime changes when any distribution is added or removed.
+    """
+    manifest = get_manifest_path(runtime)
+    return [
+        hash_file(manifest) if manifest.is_file() else None,
+        runtime.site_packages.stat().st_mtime_ns,
+        os.environ.get("PYTHONPATH"),
+    ]
+
+
+@_trace.span("run script")
+def run_script(
+    runtime: runtimes.Runtime,
+    name: str,
+    args: typing.List[str],
+    *,
+    zygote: bool = False,
+) -> int:
+    """Run a script in the runtime.
+
+    The name is looked up in the runtime's scripts directory first, and run
+    as a module (like ``python -m``) if there is no such script.
+
+    If zygote is true, the script is run in a process forked from a
+    pre-warmed interpreter of the runtime instead, with the project already
+    imported. This falls back to launching the script normally where forking
+    is not supported.
+
+    Returns the script's exit code.
+    """
+    python = runtime.python
+    script = find_in_paths(name, prefixes=[python.parent])
+    if zygote:
+        if script is None:
+            target = ("module", name)
+        else:
+            target = ("path", str(script))
+        try:
+            return _zygote.run(
+                python,
+                runtime.root,
+                target,
+                args,
+                fingerprint=_get_fingerprint(runtime),
+                preloads=_get_preloads(runtime),
+            )
+        except _zygote.ZygoteUnavailable as e:
+            message = "Warning: zygote unavailable ({}), running directly"
+            print(message.format(e), file=sys.stderr)
+    if script is None:
+        command = [str(python), "-m", name]
+    else:
+        command = [str(script)]
+    return _trace.call(command + args)
@@ -0,0 +1,63 @@
+from pypro import _store
+from pypro.projects import Project
+
+from .installs import get_installed_paths
+
+
+def _format_size(size: float) -> str:
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return "{:.1f} {}".format(size, unit)
+
+
+def show() -> int:
+    usage = _store.get_usage()
+    rows = [
+        ("Stored files", str(usage.files)),
+        ("Size", _format_size(usage.size)),
+        ("Saved by sharing", _format_size(usage.saved)),
+        ("Unreferenced", _format_size(usage.unreferenced)),
+    ]
+    for label, value in rows:
+        print("{:<18}{}".format(label + ":", value))
+    return 0
+
+
+def collect_garbage() -> int:
+    count, reclaimed = _store.collect_garbage()
+    message = "Removed {} unreferenced files, reclaimed {}".format(
+        count, _format_size(reclaimed)
+    )
+    print(message)
+    return 0
+
+
+def dedup(project: Project) -> int:
+    """Link identical files in the project's runtimes to the store.
+
+    This is for runtimes created before the store existed, or populated by
+    other tools (e.g. pip) since. Files of the project itself are skipped,
+    since they may be linked to its sources.
+    """
+    total_count = total_reclaimed = 0
+    for runtime in project.iter_runtimes():
+        count, reclaimed = _store.link_tree(
+            runtime.root, exclude=get_installed_paths(runtime)
+        )
+        print(
+            "{}: linked {} files, reclaimed {}".format(
+                runtime.name, count, _format_size(reclaimed)
+            )
+        )
+        total_count += count
+        total_reclaimed += reclaimed
+    print(
+        "Linked {} files, reclaimed {}".format(
+            total_count, _format_size(total_reclaimed)
+        )
+    )
+    return 0
@@ -1,10 +1,13 @@
+import concurrent.futures
 import os
+import subprocess
 import sys
 import typing
 
+from pypro import _output
 from pypro.projects import Project, runtimes
 
-from ._errors import VENV_NOT_FOUND
+from ._errors import SEEDS_UNAVAILABLE, VENV_NOT_FOUND
 
 
 def _find_runtime_match(
@@ -25,32 +28,74 @@ def _find_runtime_match(
     return None
 
 
-def add(project: Project, python: str) -> int:
-    try:
-        runtime = project.create_runtime(python)
-    except runtimes.RuntimeExists as e:
-        message = "Error: a runtime already exists at {!r}".format(
+def get_active(
+    project: Project,
+) -> typing.Tuple[typing.Optional[runtimes.Runtime], int]:
+    runtime = project.get_active_runtime()
+    if runtime is None:
+        message = "Error: no active venv; create one with `venv --add`"
+        print(message, file=sys.stderr)
+        return None, VENV_NOT_FOUND
+    project.state.touch("runtime", runtime.name)
+    return runtime, 0
+
+
+def _format_add_error(e: Exception) -> str:
+    if isinstance(e, runtimes.RuntimeExists):
+        return "Error: a runtime already exists at {!r}".format(
             e.runtime.root
         )
-        print(message, file=sys.stderr)
-        return VENV_NOT_FOUND
-    except runtimes.InterpreterNotFound as e:
-        message = "Error: {!r} is not a valid interpreter".format(e.spec)
-        print(message, file=sys.stderr)
-        return VENV_NOT_FOUND
-    except runtimes.PyUnavailable:
+    if isinstance(e, runtimes.InterpreterNotFound):
+        return "Error: {!r} is not a valid interpreter".format(e.spec)
+    if isinstance(e, runtimes.PyUnavailable):
         if os.name == "nt":
             url = "https://docs.python.org/3/using/windows.html"
         else:
             url = "https://github.com/brettcannon/python-launcher"
-        message = (
+        return (
             "Error: Specifying Python with version requires the Python "
             "Launcher. More information:\n{url}"
         ).format(url=url)
-        print(message, file=sys.stderr)
-        return VENV_NOT_FOUND
-    print("Created runtime {!r}".format(runtime.name))
-    return 0
+    return "Error: Failed to create runtime\n{}".format(e)
+
+
+def add(
+    project: Project,
+    pythons: typing.List[str],
+    jobs: typing.Optional[int] = None,
+) -> int:
+    """Create runtimes for each of the given interpreters.
+
+    Runtimes are created concurrently, with at most `jobs` at a time (default
+    to the number of CPUs). When more than one runtime is requested, output
+    of each (including output of subprocesses creating it) is written a line
+    at a time, prefixed by the interpreter it is for. A failure to create one
+    runtime (whatever the error) is reported for it, and does not stop others
+    from being created.
+    """
+
+    def create(python):
+        try:
+            runtime = project.create_runtime(python)
+        except Exception as e:
+            print(_format_add_error(e), file=sys.stderr)
+            return VENV_NOT_FOUND
+        print("Created runtime {!r}".format(runtime.name))
+        return 0
+
+    def add_one(python):
+        if len(pythons) == 1:
+            return create(python)
+        with _output.prefixed("[{}] ".format(python)):
+            print("Creating runtime...")
+            return create(python)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    workers = max(1, min(jobs, len(pythons)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_output.bind(add_one), pythons))
+    return next((r for r in results if r), 0)
 
 
 def remove(project: Project, alias: str) -> int:
@@ -79,6 +124,22 @@ def activate(project: Project, alias: str) -> int:
     return 0
 
 
+def refresh_seeds() -> int:
+    from pypro import _seeds  # Slow to import; only needed here.
+
+    try:
+        refreshed = _seeds.refresh()
+    except subprocess.CalledProcessError as e:
+        message = "Error: Failed to download seed packages\n{}".format(e)
+        print(message, file=sys.stderr)
+        return SEEDS_UNAVAILABLE
+    if not refreshed:
+        print("No interpreters have been seeded yet")
+    for quintuplet, names in refreshed.items():
+        print("Seed packages for {}: {}".format(quintuplet, ", ".join(names)))
+    return 0
+
+
 def show_all(project: Project) -> int:
     print("  Quintuplet")
     print("=" * 45)
@@ -0,0 +1,65 @@
+import concurrent.futures
+import os
+import sys
+import typing
+
+from pypro import _output
+from pypro.projects import Project, Workspace, WorkspaceNotFound
+
+from ._errors import WORKSPACE_NOT_FOUND
+
+
+def find() -> typing.Tuple[typing.Optional[Workspace], int]:
+    try:
+        workspace = Workspace.discover()
+    except WorkspaceNotFound:
+        message = "Error: Workspace not found at {!r}".format(os.getcwd())
+        print(message, file=sys.stderr)
+        return None, WORKSPACE_NOT_FOUND
+
+    return workspace, 0
+
+
+def run_all(
+    workspace: Workspace,
+    func: typing.Callable[[Project], typing.Optional[int]],
+    jobs: typing.Optional[int] = None,
+) -> int:
+    """Call func with each member project of the workspace.
+
+    Members are worked on concurrently, with at most `jobs` at a time (default
+    to the number of CPUs). Output of each member (including output of
+    subprocesses working on it) is written a line at a time, prefixed by its
+    path, and ends with a line reporting its outcome. A failing member does
+    not stop others.
+
+    Returns the first non-zero code returned by func, or 0.
+    """
+    members = workspace.get_members()
+
+    def run(project):
+        try:
+            code = func(project) or 0
+        except Exception as e:
+            print("Error: {}".format(e), file=sys.stderr)
+            return 1
+        if code:
+            print("Failed", file=sys.stderr)
+        else:
+            print("Done")
+        return code
+
+    def run_one(project):
+        name = os.path.relpath(str(project.root), str(workspace.root))
+        with _output.prefixed("[{}] ".format(name)):
+            return run(project)
+
+    if not members:
+        print("Warning: Workspace has no members", file=sys.stderr)
+        return 0
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    workers = max(1, min(jobs, len(members)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_output.bind(run_one), members))
+    return next((r for r in results if r), 0)
@@ -1,11 +1,38 @@
-from . import clean, new, ready, run, venv
+import importlib
 
 
-_subcommands = [clean, new, ready, run, venv]
+# Subcommand modules are imported only when dispatched, so startup does not
+# pay for everything a subcommand needs.
+_subcommands = ["clean", "new", "ready", "run", "store", "venv"]
 
+# Options before the subcommand that take a value (see __main__).
+_options_with_values = {"--trace"}
 
-def build_subcommands(subparsers):
-    for command in _subcommands:
+
+def _find_subcommand(argv):
+    args = iter(argv)
+    for arg in args:
+        if arg in _subcommands:
+            return arg
+        if arg in _options_with_values:
+            next(args, None)
+        elif not arg.startswith("-"):
+            break
+    return None
+
+
+def build_subcommands(subparsers, argv):
+    """Add subcommands to a parser.
+
+    Only the subcommand named in argv is imported and configured. Others are
+    added without their arguments, so they are still listed in help.
+    """
+    selected = _find_subcommand(argv)
+    for name in _subcommands:
+        if name != selected:
+            subparsers.add_parser(name)
+            continue
+        command = importlib.import_module(".{}".format(name), __name__)
         parser = subparsers.add_parser(command.name, **command.options)
         command.configure(parser)
         parser.set_defaults(func=command.run)
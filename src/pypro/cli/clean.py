@@ -1,11 +1,45 @@
+from pypro.actions import projects, workspaces
+
 name = "clean"
 
 options = {"usage": "Remove all built artifacts and reset all venvs"}
 
 
 def configure(parser):
-    parser.add_argument("--no-venv", help="do not recreate venvs")
+    parser.add_argument(
+        "--no-venv",
+        help="do not recreate venvs",
+        dest="recreate_venvs",
+        action="store_false",
+    )
+    parser.add_argument(
+        "--workspace",
+        help="clean every project in the workspace",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of projects to clean at once with --workspace",
+        type=int,
+        default=None,
+    )
 
 
 def run(options):
-    print(options)
+    if options.workspace:
+        workspace, error = workspaces.find()
+        if workspace is None:
+            return error
+        return workspaces.run_all(
+            workspace,
+            lambda project: projects.clean(
+                project, recreate_venvs=options.recreate_venvs
+            ),
+            jobs=options.jobs,
+        )
+
+    project, error = projects.find()
+    if project is None:
+        return error
+    return projects.clean(project, recreate_venvs=options.recreate_venvs)
@@ -1,4 +1,14 @@
-from .. import actions
+import sys
+
+from .. import _pipeline, _trace, _watch
+from ..actions import (
+    builds,
+    dependencies,
+    installs,
+    projects,
+    venvs,
+    workspaces,
+)
 
 
 # This command is intentionally named like this to avoid ambiguity whether the
@@ -16,11 +26,189 @@ def configure(parser):
         dest="builds_ext",
         action="store_false",
     )
+    parser.add_argument(
+        "--install-mode",
+        help="how to place project files into the venv (default: copy)",
+        choices=sorted(installs.INSTALL_MODES),
+        default="copy",
+    )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--watch",
+        help="keep running, and ready again when project files change",
+        action="store_true",
+    )
+    mode_group.add_argument(
+        "--workspace",
+        help="ready every project in the workspace",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of steps (or projects with --workspace) to run at once",
+        type=int,
+        default=None,
+    )
+
+
+@_trace.span("ready")
+def ready_runtime(
+    project, runtime, *, build_ext=True, install_mode="copy", jobs=None
+):
+    """Build the project, and sync it and its dependencies into the runtime.
+
+    Steps not depending on each other run concurrently, with at most `jobs`
+    at a time. Dependencies are synced while the project is built. Files are
+    installed when both are done.
+    """
+
+    def inspect(build):
+        # Hooks not depending on each other are batched into one round trip,
+        # so the backend is only loaded into one worker.
+        if build_ext:
+            return builds.inspect_project(project, build)
+        return None, builds.build_py(project, build)
+
+    def ext(build, inspected):
+        paths, _ = inspected
+        return builds.build_ext(
+            project, build, rebuild=build_ext, trigger_paths=paths
+        )
+
+    def install(ext_files, inspected, _):
+        _, py_files = inspected
+        installs.install_project(
+            runtime, ext_files + py_files, mode=install_mode
+        )
+
+    pipeline = _pipeline.Pipeline(jobs)
+    pipeline.add("build", lambda: builds.get_build(project, runtime))
+    pipeline.add("inspect", inspect, requires=["build"])
+    pipeline.add("ext", ext, requires=["build", "inspect"])
+    pipeline.add(
+        "sync", lambda: dependencies.sync_dependencies(project, runtime)
+    )
+    # After syncing too, so the two never change site-packages at once.
+    pipeline.add("install", install, requires=["ext", "inspect", "sync"])
+    pipeline.run()
+
+
+# Changes to these may change what files are collected too.
+_CONFIG_NAMES = {"pyproject.toml", "setup.cfg", "setup.py"}
+
+
+def _is_new_source(path):
+    # Editors and interpreters create files next to sources all the time.
+    # Only new modules and packages matter.
+    if path.name.startswith(".") or path.name == "__pycache__":
+        return False
+    return path.suffix == ".py" or path.is_dir()
+
+
+def _watch_runtime(project, runtime, *, build_ext, install_mode):
+    """Ready the runtime, and again whenever its inputs change.
+
+    Only stages affected by the changes are run. Pure files are collected
+    again only if files are added or removed; extensions are built if paths
+    triggering a build change (unless `build_ext` is false); dependencies are
+    synced if the lock changes. Stages that fail are run again on the next
+    change.
+    """
+    build = builds.get_build(project, runtime)
+    lock = dependencies.get_lock_path(project).resolve()
+    ext_files, py_files = [], []
+    pending = {"ext", "py", "sync", "install"}
+
+    watcher = _watch.create_watcher()
+    try:
+        while True:
+            try:
+                if "ext" in pending:
+                    ext_files = builds.build_ext(
+                        project, build, rebuild=build_ext
+                    )
+                    pending.discard("ext")
+                if "py" in pending:
+                    py_files = builds.build_py(project, build)
+                    pending.discard("py")
+                if "sync" in pending:
+                    dependencies.sync_dependencies(project, runtime)
+                    pending.discard("sync")
+                if "install" in pending:
+                    files = ext_files + py_files
+                    installs.install_project(runtime, files, mode=install_mode)
+                    pending.discard("install")
+            except Exception as e:
+                print("Error: {}".format(e), file=sys.stderr)
+
+            sources = {source.resolve() for _, source in py_files}
+            triggers = {
+                p.resolve() for p in builds.get_trigger_paths(project, build)
+            }
+            watcher.watch(sources | triggers | {lock})
+            print("Watching for changes (press Ctrl+C to stop)")
+
+            changed = _watch.wait_for_changes(watcher)
+            if lock in changed:
+                pending.add("sync")
+            if changed & triggers:
+                pending.update(["ext", "install"])
+                if any(p.name in _CONFIG_NAMES for p in changed & triggers):
+                    pending.add("py")
+            if changed & sources:
+                pending.add("install")
+            if any(
+                (p in sources and not p.exists())
+                or (p not in sources and _is_new_source(p))
+                for p in changed
+            ):
+                pending.update(["py", "install"])
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+
+
+def _ready_project(project, options, jobs):
+    runtime, error = venvs.get_active(project)
+    if runtime is None:
+        return error
+    ready_runtime(
+        project,
+        runtime,
+        build_ext=options.builds_ext,
+        install_mode=options.install_mode,
+        jobs=jobs,
+    )
+    return 0
 
 
 def run(options):
-    if options.builds_ext:
-        actions.builds_ext()
-    actions.build_py()
-    actions.sync_dependencies()
-    actions.install_project()
+    if options.workspace:
+        workspace, error = workspaces.find()
+        if workspace is None:
+            return error
+        # Projects are readied concurrently, so run steps of each one at a
+        # time, to stay within the job limit.
+        return workspaces.run_all(
+            workspace,
+            lambda project: _ready_project(project, options, jobs=1),
+            jobs=options.jobs,
+        )
+
+    project, error = projects.find()
+    if project is None:
+        return error
+    if not options.watch:
+        return _ready_project(project, options, jobs=options.jobs)
+
+    runtime, error = venvs.get_active(project)
+    if runtime is None:
+        return error
+    return _watch_runtime(
+        project,
+        runtime,
+        build_ext=options.builds_ext,
+        install_mode=options.install_mode,
+    )
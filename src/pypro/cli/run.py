@@ -1,4 +1,5 @@
-from .. import actions
+from ..actions import projects, scripts, venvs
+from .ready import ready_runtime
 
 
 _epilog = """
@@ -19,14 +20,33 @@ def configure(parser):
         dest="builds_ext",
         action="store_false",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of steps to run at once when readying",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--zygote",
+        help="run in a process forked from a pre-warmed interpreter",
+        action="store_true",
+    )
     parser.add_argument("name")
     parser.add_argument("args", metavar="arg", nargs="*")
 
 
 def run(options):
-    if options.builds_ext:
-        actions.builds_ext()
-    actions.build_py()
-    actions.install_project()
-    actions.sync_dependencies()
-    actions.run_script()
+    project, error = projects.find()
+    if project is None:
+        return error
+    runtime, error = venvs.get_active(project)
+    if runtime is None:
+        return error
+
+    ready_runtime(
+        project, runtime, build_ext=options.builds_ext, jobs=options.jobs
+    )
+    return scripts.run_script(
+        runtime, options.name, options.args, zygote=options.zygote
+    )
@@ -0,0 +1,30 @@
+from pypro.actions import projects, store
+
+name = "store"
+
+options = {"usage": "Show and clean up files shared between venvs"}
+
+
+def configure(parser):
+    action_group = parser.add_mutually_exclusive_group()
+    action_group.add_argument(
+        "--gc",
+        help="remove shared files no venv uses anymore",
+        action="store_true",
+    )
+    action_group.add_argument(
+        "--dedup",
+        help="share identical files in this project's venvs",
+        action="store_true",
+    )
+
+
+def run(options):
+    if options.gc:
+        return store.collect_garbage()
+    if options.dedup:
+        project, error = projects.find()
+        if project is None:
+            return error
+        return store.dedup(project)
+    return store.show()
@@ -1,4 +1,6 @@
-from pypro.actions import projects, venvs
+import sys
+
+from pypro.actions import projects, venvs, workspaces
 
 name = "venv"
 
@@ -9,18 +11,56 @@ def configure(parser):
     action_group = parser.add_mutually_exclusive_group()
     action_group.add_argument("venv", nargs="?", help="activate venv")
     action_group.add_argument(
-        "--add", help="create new venv with given base interpreter"
+        "--add",
+        help="create new venvs with given base interpreters",
+        metavar="PYTHON",
+        nargs="+",
     )
     action_group.add_argument("--remove", help="remove the venv")
+    action_group.add_argument(
+        "--refresh-seeds",
+        help="download latest pip, setuptools, and wheel for new venvs",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workspace",
+        help="with --add, create venvs for every project in the workspace",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of venvs to create at once with --add",
+        type=int,
+        default=None,
+    )
 
 
 def run(options):
+    if options.refresh_seeds:
+        return venvs.refresh_seeds()
+
+    if options.workspace:
+        if not options.add:
+            print("Error: --workspace requires --add", file=sys.stderr)
+            return 2
+        workspace, error = workspaces.find()
+        if workspace is None:
+            return error
+        # Members are worked on concurrently, so create venvs of each one at
+        # a time, to stay within the job limit.
+        return workspaces.run_all(
+            workspace,
+            lambda project: venvs.add(project, options.add, jobs=1),
+            jobs=options.jobs,
+        )
+
     project, error = projects.find()
     if project is None:
         return error
 
     if options.add:
-        return venvs.add(project, options.add)
+        return venvs.add(project, options.add, jobs=options.jobs)
     if options.remove:
         return venvs.remove(project, options.remove)
     if options.venv:
@@ -0,0 +1,501 @@
+__all__ = [
+    "Interpreter",
+    "find_by_name",
+    "find_by_version",
+    "get_interpreter",
+    "get_interpreters",
+]
+
+import concurrent.futures
+import dataclasses
+import glob
+import json
+import os
+import pathlib
+import re
+import subprocess
+import sys
+import threading
+import typing
+
+from . import _trace
+from .utils import get_cache_dir, write_text_atomic
+
+
+# The prefix part is adopted from Virtualenv's approach. This allows us to find
+# the most "base" prefix as possible, going through both virtualenv and venv
+# boundaries. In particular `real_prefix` must be tried first since virtualenv
+# does not preserve any other values.
+# https://github.com/pypa/virtualenv/blob/16.7.7/virtualenv.py#L1419-L1426
+#
+# Install paths are reported relative to the (not base) prefix, preferring the
+# venv scheme if available, so the layout is the same whether the probe is run
+# by a venv or the interpreter behind it.
+_PROBE_CODE = """
+from __future__ import print_function
+import hashlib
+import json
+import os
+import platform
+import sys
+import sysconfig
+
+try:
+    prefix = sys.real_prefix
+except AttributeError:
+    try:
+        prefix = sys.base_prefix
+    except AttributeError:
+        prefix = sys.prefix
+
+prefix = prefix.encode(sys.getfilesystemencoding(), "ignore")
+
+try:
+    from importlib.machinery import EXTENSION_SUFFIXES
+except ImportError:
+    import imp
+    EXTENSION_SUFFIXES = [
+        s for s, _, t in imp.get_suffixes() if t == imp.C_EXTENSION
+    ]
+
+if "venv" in sysconfig.get_scheme_names():
+    scheme_paths = sysconfig.get_paths(scheme="venv")
+else:
+    scheme_paths = sysconfig.get_paths()
+
+bases = {"purelib": sys.prefix, "scripts": sys.prefix, "data": sys.prefix}
+paths = {}
+for key, value in scheme_paths.items():
+    base = bases.get(key, sys.exec_prefix)
+    if value == base or value.startswith(base + os.sep):
+        value = os.path.relpath(value, base)
+    paths[key] = value.replace(os.sep, "/")
+
+uname = platform.uname()
+
+print(json.dumps({
+    "implementation": platform.python_implementation(),
+    "version": list(sys.version_info[:3]),
+    "system": uname[0],
+    "machine": uname[4],
+    "prefix_hash": hashlib.sha256(prefix).hexdigest()[:8],
+    "soabi": sysconfig.get_config_var("SOABI"),
+    "extension_suffixes": list(EXTENSION_SUFFIXES),
+    "paths": paths,
+}))
+"""
+
+
+@dataclasses.dataclass()
+class Interpreter:
+    """Record of a Python interpreter, as reported by the interpreter itself.
+    """
+
+    implementation: str
+    version: typing.Tuple[int, int, int]
+    system: str
+    machine: str
+    prefix_hash: str
+
+    # ABI information, used to decide what extension modules can be loaded.
+    soabi: typing.Optional[str]
+    extension_suffixes: typing.List[str]
+
+    # Install scheme (from sysconfig), relative to the prefix when possible.
+    paths: typing.Dict[str, str]
+
+    @classmethod
+    def from_dict(cls, data: typing.Dict[str, typing.Any]) -> "Interpreter":
+        kwargs = dict(data)
+        kwargs["version"] = tuple(kwargs["version"])
+        return cls(**kwargs)
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        data = dataclasses.asdict(self)
+        data["version"] = list(self.version)
+        return data
+
+    @property
+    def quintuplet(self) -> str:
+        return "{}-{}.{}-{}-{}-{}".format(
+            self.implementation,
+            self.version[0],
+            self.version[1],
+            self.system,
+            self.machine,
+            self.prefix_hash,
+        ).lower()
+
+
+# Probing an interpreter means launching it, which is slow. Results are
+# therefore cached on disk, keyed by the interpreter's resolved path. Each
+# entry also records a fingerprint of the executable (inode, mtime, and size),
+# so a cached record is discarded when the interpreter is changed.
+_CACHE_VERSION = 1
+
+_Fingerprint = typing.List[int]
+
+# Process-level memo in front of the on-disk cache.
+_memo: typing.Dict[str, typing.Tuple[_Fingerprint, Interpreter]] = {}
+
+# Guards read-modify-write of the on-disk cache between threads.
+_cache_lock = threading.Lock()
+
+# Held while an interpreter is being probed, so threads asking for the same
+# interpreter at once (e.g. projects in a workspace) only probe it once.
+_probe_locks: typing.Dict[str, threading.Lock] = {}
+
+
+def _get_cache_path() -> pathlib.Path:
+    return get_cache_dir().joinpath("interpreters.json")
+
+
+def _fingerprint(path: str) -> _Fingerprint:
+    st = os.stat(path)
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def _load_cache() -> typing.Dict[str, typing.Any]:
+    try:
+        with _get_cache_path().open(encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != _CACHE_VERSION:
+        return {}
+    return data.get("interpreters", {})
+
+
+def _save_cache(
+    updates: typing.Dict[str, typing.Tuple[_Fingerprint, Interpreter]]
+):
+    with _cache_lock:
+        entries = _load_cache()
+        for key, (fingerprint, info) in updates.items():
+            entries[key] = {"fingerprint": fingerprint, "info": info.to_dict()}
+        data = {"version": _CACHE_VERSION, "interpreters": entries}
+        try:
+            write_text_atomic(_get_cache_path(), json.dumps(data, indent=2))
+        except OSError:  # Cache is not writable. Not a big deal.
+            pass
+
+
+@_trace.span("probe interpreter")
+def _probe(python: os.PathLike) -> Interpreter:
+    out = subprocess.check_output(
+        [str(python), "-c", _PROBE_CODE], stderr=subprocess.DEVNULL
+    )
+    return Interpreter.from_dict(json.loads(out.decode(sys.stdout.encoding)))
+
+
+def _get_memoized(
+    key: str, fingerprint: _Fingerprint
+) -> typing.Optional[Interpreter]:
+    memoized = _memo.get(key)
+    if memoized and memoized[0] == fingerprint:
+        return memoized[1]
+    return None
+
+
+def _get_cached(
+    key: str, fingerprint: _Fingerprint, entries: typing.Dict[str, typing.Any]
+) -> typing.Optional[Interpreter]:
+    entry = entries.get(key)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return None
+    try:
+        info = Interpreter.from_dict(entry["info"])
+    except (KeyError, TypeError):  # Malformed entry; probe again.
+        return None
+    _memo[key] = (fingerprint, info)
+    return info
+
+
+def get_interpreter(python: os.PathLike) -> Interpreter:
+    """Get information about an interpreter, probing it if needed.
+
+    The interpreter is only launched if there is no cached record for it, or
+    the executable has changed since the record was made.
+    """
+    key = os.path.realpath(str(python))
+    fingerprint = _fingerprint(key)
+
+    info = _get_memoized(key, fingerprint)
+    if info is not None:
+        return info
+    with _probe_locks.setdefault(key, threading.Lock()):
+        info = _get_memoized(key, fingerprint)  # Probed while we waited?
+        if info is None:
+            info = _get_cached(key, fingerprint, _load_cache())
+        if info is None:
+            info = _probe(python)
+            _memo[key] = (fingerprint, info)
+            _save_cache({key: (fingerprint, info)})
+    return info
+
+
+def get_interpreters(
+    pythons: typing.Iterable[typing.Union[str, os.PathLike]],
+) -> typing.Dict[str, typing.Optional[Interpreter]]:
+    """Get information about many interpreters.
+
+    Interpreters without cached records are probed concurrently. The result
+    is keyed by the given paths (as strings). An interpreter that fails to be
+    probed (or does not exist) maps to None.
+    """
+    entries = None
+    results: typing.Dict[str, typing.Optional[Interpreter]] = {}
+    pending: typing.Dict[str, typing.Tuple[str, _Fingerprint]] = {}
+    for python in map(str, pythons):
+        key = os.path.realpath(python)
+        try:
+            fingerprint = _fingerprint(key)
+        except OSError:
+            results[python] = None
+            continue
+        info = _get_memoized(key, fingerprint)
+        if info is None:
+            if entries is None:
+                entries = _load_cache()
+            info = _get_cached(key, fingerprint, entries)
+        if info is None:
+            pending[python] = (key, fingerprint)
+        results[python] = info
+
+    def probe(python):
+        try:
+            return _probe(python)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+
+    if not pending:
+        return results
+    updates = {}
+    workers = min(len(pending), (os.cpu_count() or 1) * 4)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        probed = pool.map(probe, pending)
+        for python, info in zip(pending, probed):
+            results[python] = info
+            if info is not None:
+                key, fingerprint = pending[python]
+                _memo[key] = (fingerprint, info)
+                updates[key] = (fingerprint, info)
+    if updates:
+        _save_cache(updates)
+    return results
+
+
+# Executables considered to be Python interpreters in discovery.
+_PYTHON_NAME_RE = re.compile(
+    r"^(?:python|pypy)(?:\d+(?:\.\d+)?)?(?:\.exe)?$", re.IGNORECASE
+)
+
+
+def _get_well_known_patterns() -> typing.List[str]:
+    """Directories (glob patterns) where Pythons are commonly installed.
+    """
+    if os.name == "nt":
+        local = os.environ.get("LOCALAPPDATA", "")
+        return [
+            os.path.join(local, "Programs", "Python", "Python*"),
+            "C:\\Python*",
+        ]
+    pyenv_root = os.environ.get("PYENV_ROOT") or os.path.expanduser(
+        "~/.pyenv"
+    )
+    return [
+        os.path.join(pyenv_root, "versions", "*", "bin"),
+        "/usr/local/bin",
+        "/usr/bin",
+        "/opt/homebrew/bin",
+        "/opt/local/bin",
+        "/Library/Frameworks/Python.framework/Versions/*/bin",
+    ]
+
+
+def _get_glob_root(pattern: str) -> str:
+    """Get the deepest directory in pattern that does not contain wildcards.
+    """
+    root = pattern
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root
+
+
+def _is_shim_dir(directory: str) -> bool:
+    # Shims (pyenv, asdf) choose the actual interpreter dynamically, so what
+    # they point to can change without the shim itself changing.
+    return os.path.basename(os.path.normpath(directory)) == "shims"
+
+
+def _get_mtime(path: str) -> typing.Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@dataclasses.dataclass()
+class _Candidate:
+    path: str
+    on_path: bool
+    implementation: typing.Optional[str] = None
+    version: typing.Optional[typing.List[int]] = None
+
+
+_DISCOVERY_VERSION = 1
+
+# Process-level memo of the discovery index: (PATH, watched, candidates).
+_discovery_memo: typing.Optional[
+    typing.Tuple[str, typing.Dict[str, typing.Optional[int]], list]
+] = None
+
+
+def _get_discovery_path() -> pathlib.Path:
+    return get_cache_dir().joinpath("discovery.json")
+
+
+@_trace.span("scan for interpreters")
+def _scan(
+    path_env: str,
+) -> typing.Tuple[typing.Dict[str, typing.Optional[int]], list]:
+    """Scan PATH and well-known locations for Python interpreters.
+
+    Returns mtimes of directories to watch (a change in any of them means
+    the scan result may be outdated), and found candidates in search order.
+    """
+    directories = [(d, True) for d in path_env.split(os.pathsep) if d]
+    watched = {}
+    for pattern in _get_well_known_patterns():
+        root = _get_glob_root(pattern)
+        watched[root] = _get_mtime(root)
+        directories.extend((d, False) for d in sorted(glob.glob(pattern)))
+
+    candidates = []
+    seen = set()
+    for directory, on_path in directories:
+        key = os.path.normcase(os.path.abspath(directory))
+        if key in seen:
+            continue
+        seen.add(key)
+        watched[directory] = _get_mtime(directory)
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if not _PYTHON_NAME_RE.match(entry.name):
+                continue
+            try:
+                if not entry.is_file() or not os.access(entry.path, os.X_OK):
+                    continue
+            except OSError:
+                continue
+            candidates.append(_Candidate(entry.path, on_path))
+
+    probed = [
+        c.path
+        for c in candidates
+        if not _is_shim_dir(os.path.dirname(c.path))
+    ]
+    infos = get_interpreters(probed)
+    for candidate in candidates:
+        info = infos.get(candidate.path)
+        if info is not None:
+            candidate.implementation = info.implementation
+            candidate.version = list(info.version)
+    return watched, candidates
+
+
+def _is_fresh(
+    index: typing.Tuple[str, typing.Dict[str, typing.Optional[int]], list],
+    path_env: str,
+) -> bool:
+    indexed_path, watched, _ = index
+    if indexed_path != path_env:
+        return False
+    return all(_get_mtime(d) == mtime for d, mtime in watched.items())
+
+
+def _load_discovery() -> typing.Optional[tuple]:
+    try:
+        with _get_discovery_path().open(encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != _DISCOVERY_VERSION:
+            return None
+        candidates = [_Candidate(**c) for c in data["candidates"]]
+        return (data["path"], data["watched"], candidates)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_discovery(index: tuple):
+    path_env, watched, candidates = index
+    data = {
+        "version": _DISCOVERY_VERSION,
+        "path": path_env,
+        "watched": watched,
+        "candidates": [dataclasses.asdict(c) for c in candidates],
+    }
+    try:
+        write_text_atomic(_get_discovery_path(), json.dumps(data, indent=2))
+    except OSError:  # Cache is not writable. Not a big deal.
+        pass
+
+
+def _discover() -> typing.List[_Candidate]:
+    """Get Python interpreters found in PATH and well-known locations.
+
+    The result is cached (both in memory and on disk), and only re-scanned if
+    PATH or the content of any searched directory changes.
+    """
+    global _discovery_memo
+
+    path_env = os.environ.get("PATH", "")
+    if _discovery_memo is not None and _is_fresh(_discovery_memo, path_env):
+        return _discovery_memo[2]
+
+    index = _load_discovery()
+    if index is None or not _is_fresh(index, path_env):
+        index = (path_env,) + _scan(path_env)
+        _save_discovery(index)
+    _discovery_memo = index
+    return index[2]
+
+
+def find_by_version(
+    major: int, minor: typing.Optional[int] = None
+) -> typing.Optional[pathlib.Path]:
+    """Find an interpreter matching the given version.
+
+    Interpreters on PATH are preferred to those in well-known locations, and
+    CPython is preferred to other implementations. Returns None if there are
+    no matches.
+    """
+    matches = [
+        c
+        for c in _discover()
+        if c.version
+        and c.version[0] == major
+        and (minor is None or c.version[1] == minor)
+    ]
+    if not matches:
+        return None
+    matches.sort(key=lambda c: (not c.on_path, c.implementation != "CPython"))
+    return pathlib.Path(matches[0].path)
+
+
+def find_by_name(name: str) -> typing.Optional[pathlib.Path]:
+    """Find an interpreter on PATH by its executable name.
+
+    Only names that look like Python interpreters (``python3``, ``pypy`` etc.)
+    are indexed. Returns None if there are no matches.
+    """
+    name = os.path.normcase(name)
+    for candidate in _discover():
+        if not candidate.on_path:
+            continue
+        basename = os.path.normcase(os.path.basename(candidate.path))
+        if basename == name or os.path.splitext(basename)[0] == name:
+            return pathlib.Path(candidate.path)
+    return None
@@ -1,6 +1,14 @@
-__all__ = ["Build", "Project", "ProjectNotFound"]
+__all__ = [
+    "Build",
+    "Project",
+    "ProjectNotFound",
+    "Workspace",
+    "WorkspaceNotFound",
+]
 
+import dataclasses
 import pathlib
+import typing
 
 from .base import BaseProject
 from .builds import Build, ProjectBuildManagementMixin
@@ -30,3 +38,54 @@ class Project(
             if _is_project_root(path):
                 return cls(root=path)
         raise ProjectNotFound()
+
+
+_WORKSPACE_DESCRIPTOR_NAME = "pypro.workspace"
+
+
+class WorkspaceNotFound(Exception):
+    pass
+
+
+@dataclasses.dataclass()
+class Workspace:
+    """A directory containing several projects, to be worked on together.
+
+    Members are listed in a ``pypro.workspace`` file at the root, one path
+    (relative to the root) per line. Paths may contain glob patterns, e.g.
+    ``packages/*``. Text after ``#`` is ignored.
+    """
+
+    root: pathlib.Path
+
+    @classmethod
+    def discover(cls, start=None):
+        if not start:
+            start = pathlib.Path()
+        else:
+            start = pathlib.Path(start)
+        for path in start.resolve().joinpath("pypro.workspace").parents:
+            if path.joinpath(_WORKSPACE_DESCRIPTOR_NAME).is_file():
+                return cls(root=path)
+        raise WorkspaceNotFound()
+
+    @property
+    def descriptor(self) -> pathlib.Path:
+        return self.root.joinpath(_WORKSPACE_DESCRIPTOR_NAME)
+
+    def get_members(self) -> typing.List[Project]:
+        """Get member projects, in the order they are listed.
+
+        Patterns matching directories that are not projects are skipped. A
+        project matched by several patterns is only included once.
+        """
+        members: typing.Dict[pathlib.Path, None] = {}
+        with self.descriptor.open(encoding="utf-8") as f:
+            for line in f:
+                pattern = line.split("#", 1)[0].strip()
+                if not pattern:
+                    continue
+                for path in sorted(self.root.glob(pattern)):
+                    if _is_project_root(path):
+                        members.setdefault(path.resolve(), None)
+        return [Project(root=root) for root in members]
@@ -13,7 +13,7 @@ import subprocess
 import sys
 import typing
 
-from pypro import _virtenv
+from pypro import _trace, interpreters
 from pypro.utils import find_in_paths
 
 
@@ -28,7 +28,7 @@ def _get_command_output(*args, **kwargs) -> str:
     return out
 
 
-_PY_VER_RE = re.compile(r"^(?P<major>\d+)(:?\.(?P<minor>\d+))?")
+_PY_VER_RE = re.compile(r"^(?P<major>\d+)(?:\.(?P<minor>\d+))?")
 
 
 def _find_python_with_py(python: str) -> typing.Optional[pathlib.Path]:
@@ -53,42 +53,29 @@ def looks_like_path(v: typing.Union[pathlib.Path, str]) -> bool:
 
 
 def resolve_python(python: str) -> typing.Optional[pathlib.Path]:
+    """Resolve an interpreter spec to the interpreter's path.
+
+    Version specs (``3`` or ``3.7``) are looked up in the discovery index,
+    and passed to the Python launcher (if available) if there's no match, or
+    the spec is more complex than the index can handle. Names are looked up
+    in the index, falling back to a PATH search.
+    """
     match = _PY_VER_RE.match(python)
     if match:
-        return _find_python_with_py(python)
+        if match.end() == len(python):
+            minor = match.group("minor")
+            found = interpreters.find_by_version(
+                int(match.group("major")), int(minor) if minor else None
+            )
+            if found:
+                return found
+        try:
+            return _find_python_with_py(python)
+        except PyUnavailable:
+            return None
     if looks_like_path(python):
         return pathlib.Path(python)
-    return find_in_paths(python)
-
-
-# The prefix part is adopted from Virtualenv's approach. This allows us to find
-# the most "base" prefix as possible, going through both virtualenv and venv
-# boundaries. In particular `real_prefix` must be tried first since virtualenv
-# does not preserve any other values.
-# https://github.com/pypa/virtualenv/blob/16.7.7/virtualenv.py#L1419-L1426
-_VENV_NAME_CODE = """
-from __future__ import print_function
-import hashlib
-import sys
-import platform
-
-try:
-    prefix = sys.real_prefix
-except AttributeError:
-    try:
-        prefix = sys.base_prefix
-    except AttributeError:
-        prefix = sys.prefix
-
-prefix = prefix.encode(sys.getfilesystemencoding(), "ignore")
-
-print("{0}-{1[0]}.{1[1]}-{2.system}-{2.machine}-{3}".format(
-    platform.python_implementation(),
-    sys.version_info,
-    platform.uname(),
-    hashlib.sha256(prefix).hexdigest()[:8],
-).lower())
-"""
+    return interpreters.find_by_name(python) or find_in_paths(python)
 
 
 def get_interpreter_quintuplet(python: os.PathLike) -> str:
@@ -104,11 +91,22 @@ def get_interpreter_quintuplet(python: os.PathLike) -> str:
     * A 8-char hash of the interpreter prefix for disambiguation.
 
     Example: `cpython-3.7-darwin-x86_64-3d3725a6`.
+
+    The result is cached, so the interpreter is only launched the first time
+    it is seen (or after it is changed).
     """
-    return _get_command_output([str(python), "-c", _VENV_NAME_CODE])
+    return interpreters.get_interpreter(python).quintuplet
 
 
+@_trace.span("create venv")
 def create_venv(python, env_dir, prompt):
-    _virtenv.create(
-        python=python, env_dir=env_dir, system=False, prompt=prompt, bare=False
-    )
+    """Create a venv by cloning the template venv of the interpreter.
+
+    The template is created (and seeded) the first time the interpreter is
+    used, and shared by all venvs created from the interpreter afterwards.
+    """
+    from pypro import _templates  # Slow to import; only needed here.
+
+    quintuplet = get_interpreter_quintuplet(python)
+    template = _templates.get_template(python, quintuplet)
+    _templates.clone(template, pathlib.Path(env_dir), prompt)
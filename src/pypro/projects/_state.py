@@ -0,0 +1,232 @@
+__all__ = ["ProjectState"]
+
+import contextlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import typing
+
+
+# Columns parsed from a quintuplet, in order.
+FIELDS = ["implementation", "version", "system", "machine", "hash"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS environments (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    implementation TEXT NOT NULL,
+    version TEXT NOT NULL,
+    system TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL,
+    PRIMARY KEY (kind, name)
+);
+CREATE INDEX IF NOT EXISTS environments_fields ON environments (
+    kind, implementation, version, system, machine, hash
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+PRAGMA user_version = 1;
+"""
+
+# Recorded in the database by the schema, so it is only run on new databases.
+_SCHEMA_VERSION = 1
+
+# Seconds an environment's last use time is kept for. Uses within this period
+# are not recorded, so most lookups only read from the database.
+_TOUCH_INTERVAL = 3600
+
+
+def _get_mtime(path: pathlib.Path) -> typing.Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _parse(name: str) -> typing.Optional[typing.List[str]]:
+    parts = name.lower().split("-")
+    if len(parts) != len(FIELDS):
+        return None
+    return parts
+
+
+class ProjectState:
+    """Index of a project's runtimes and builds, stored in SQLite.
+
+    The filesystem is always the source of truth. Each kind of environment is
+    indexed from its container directory, and the container's mtime recorded.
+    The container is only scanned again when its mtime changes, i.e. when an
+    entry is added or removed (by us or anyone else).
+
+    One connection is opened on first use, and shared by threads. Operations
+    take turns on it, each in a transaction of its own.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self._path = path
+        self._conn: typing.Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            str(self._path), timeout=30, check_same_thread=False
+        )
+        version, = conn.execute("PRAGMA user_version").fetchone()
+        if version < _SCHEMA_VERSION:
+            conn.executescript(_SCHEMA)
+        return conn
+
+    @contextlib.contextmanager
+    def _connect(self) -> typing.Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._open()
+            with self._conn:
+                yield self._conn
+
+    def _get_setting(self, conn: sqlite3.Connection, key: str) -> typing.Any:
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _set_setting(self, conn: sqlite3.Connection, key: str, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def _insert(self, conn: sqlite3.Connection, kind: str, name: str):
+        parts = _parse(name)
+        if parts is None:
+            return
+        conn.execute(
+            "INSERT OR IGNORE INTO environments "
+            "(kind, name, {}, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)".format(
+                ", ".join(FIELDS)
+            ),
+            [kind, name] + parts + [time.time()],
+        )
+
+    def sync(self, kind: str, container: pathlib.Path):
+        """Re-index environments of kind if the container has changed.
+        """
+        mtime = _get_mtime(container)
+        key = "mtime:{}".format(kind)
+        with self._connect() as conn:
+            if self._get_setting(conn, key) == mtime:
+                return
+            names = set()
+            if mtime is not None:
+                names = {e.name for e in os.scandir(container) if e.is_dir()}
+            indexed = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM environments WHERE kind = ?", (kind,)
+                )
+            }
+            for name in indexed - names:
+                conn.execute(
+                    "DELETE FROM environments WHERE kind = ? AND name = ?",
+                    (kind, name),
+                )
+            for name in names - indexed:
+                self._insert(conn, kind, name)
+            self._set_setting(conn, key, mtime)
+
+    def add(self, kind: str, name: str, container: pathlib.Path):
+        """Record a new environment we created in container.
+        """
+        self.sync(kind, container)
+        with self._connect() as conn:
+            self._insert(conn, kind, name)
+            mtime = _get_mtime(container)
+            self._set_setting(conn, "mtime:{}".format(kind), mtime)
+
+    def remove(self, kind: str, name: str, container: pathlib.Path):
+        """Forget an environment we removed from container.
+        """
+        self.sync(kind, container)
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM environments WHERE kind = ? AND name = ?",
+                (kind, name),
+            )
+            mtime = _get_mtime(container)
+            self._set_setting(conn, "mtime:{}".format(kind), mtime)
+
+    def touch(self, kind: str, name: str):
+        """Record an environment as used now.
+
+        Nothing is written if a use was recorded in the last hour, since
+        environments are looked up all the time (e.g. by every ready).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_used FROM environments "
+                "WHERE kind = ? AND name = ?",
+                (kind, name),
+            ).fetchone()
+            if row is None or (row[0] or 0) > now - _TOUCH_INTERVAL:
+                return
+            conn.execute(
+                "UPDATE environments SET last_used = ? "
+                "WHERE kind = ? AND name = ?",
+                (now, kind, name),
+            )
+
+    def has(self, kind: str, name: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM environments WHERE kind = ? AND name = ?",
+                (kind, name),
+            ).fetchone()
+        return row is not None
+
+    def find(
+        self, kind: str, filters: typing.Optional[typing.Dict[str, str]] = None
+    ) -> typing.List[str]:
+        """Find names of environments of kind, matching given field values.
+        """
+        filters = filters or {}
+        clauses = ["kind = ?"]
+        params = [kind]
+        for field in FIELDS:
+            if field in filters:
+                clauses.append("{} = ?".format(field))
+                params.append(filters[field])
+        query = "SELECT name FROM environments WHERE {} ORDER BY name".format(
+            " AND ".join(clauses)
+        )
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(query, params)]
+
+    def get_active(
+        self, marker_mtime: int
+    ) -> typing.Tuple[bool, typing.Optional[str]]:
+        """Get the recorded active runtime name.
+
+        Returns a 2-tuple. The first item is whether the record is usable, i.e.
+        it was made against a marker of the same mtime.
+        """
+        with self._connect() as conn:
+            value = self._get_setting(conn, "active")
+        if not value or value[0] != marker_mtime:
+            return False, None
+        return True, value[1]
+
+    def set_active(self, marker_mtime: int, name: typing.Optional[str]):
+        with self._connect() as conn:
+            self._set_setting(conn, "active", [marker_mtime, name])
@@ -1,11 +1,33 @@
 import dataclasses
 import pathlib
+import typing
+
+from ._state import ProjectState
 
 
 @dataclasses.dataclass()
 class BaseProject:
     root: pathlib.Path
 
+    _state: typing.Optional[ProjectState] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def state(self) -> ProjectState:
+        """Index of runtimes and builds in this project.
+        """
+        if self._state is None:
+            path = self.root.joinpath(".venvs", ".pypro", "state.db")
+            self._state = ProjectState(path)
+        return self._state
+
+    @property
+    def _trash_dir(self) -> pathlib.Path:
+        # Where removed runtimes and builds are moved to be deleted. This
+        # should be on the same file system as them, so moving is quick.
+        return self.root.joinpath(".venvs", ".pypro", "trash")
+
     @property
     def name(self):
         # TODO: Make this configurable.
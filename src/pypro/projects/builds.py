@@ -1,14 +1,15 @@
 __all__ = ["Build", "ProjectBuildManagementMixin"]
 
 import dataclasses
+import json
 import pathlib
-import shutil
 import typing
 
+from pypro import _trash
+from pypro.utils import write_text_atomic
 from pypro.venvs import VirtualEnvironment
 
 from .runtimes import ProjectRuntimeManagementMixin
-from ._envs import create_venv, get_interpreter_quintuplet
 
 
 BuildEnv = VirtualEnvironment
@@ -17,15 +18,28 @@ BuildEnv = VirtualEnvironment
 @dataclasses.dataclass()
 class Build:
     container: pathlib.Path
-
-    @property
-    def env(self) -> BuildEnv:
-        return BuildEnv(self.container.joinpath("venv"))
+    env: BuildEnv
 
     @property
     def root_for_build_ext(self) -> pathlib.Path:
         return self.container.joinpath("ext")
 
+    @property
+    def trigger_index(self) -> pathlib.Path:
+        return self.container.joinpath("triggers.json")
+
+    @property
+    def requires_index(self) -> pathlib.Path:
+        return self.container.joinpath("requires.json")
+
+    @property
+    def hook_index(self) -> pathlib.Path:
+        return self.container.joinpath("hooks.json")
+
+
+def _get_env_index(container: pathlib.Path) -> pathlib.Path:
+    return container.joinpath("env.json")
+
 
 @dataclasses.dataclass()
 class BuildExists(Exception):
@@ -40,10 +54,16 @@ class ProjectBuildManagementMixin(ProjectRuntimeManagementMixin):
         <project_root>/
             build/
                 <quintuplet>/
-                    ext/    # Build root for build tools.
-                    venv/   # Build env.
+                    ext/            # Build root for build tools.
+                    env.json        # Location of the build env.
+                    hooks.json      # Memoized results of backend hooks.
+                    requires.json   # Build requirements, and their sources.
+                    triggers.json   # Fingerprints of the last ext build.
                 (more quintuplets)
             (other project files)
+
+    Build envs live outside the project, and are shared by projects with the
+    same build requirements.
     """
 
     @property
@@ -59,33 +79,52 @@ class ProjectBuildManagementMixin(ProjectRuntimeManagementMixin):
         This ensures the build directory exists, but does not check whether it
         is actually in working condition or not.
         """
+        self.state.sync("build", self._build_dir)
+        if not self.state.has("build", quintuplet):
+            return None
+        self.state.touch("build", quintuplet)
         container = self._get_build_container(quintuplet)
-        if container.exists():
-            return Build(container)
-        return None
+        try:
+            with _get_env_index(container).open(encoding="utf-8") as f:
+                env_root = json.load(f)["root"]
+        except (OSError, KeyError, ValueError):
+            return None  # Interrupted, or created by an older version.
+        return Build(container, BuildEnv(pathlib.Path(env_root)))
 
-    def create_build(self, python: pathlib.Path) -> Build:
-        """Create build environment.
+    def create_build(self, quintuplet: str, env: BuildEnv) -> Build:
+        """Create a build of quintuplet, building with env.
 
-        Raises `BuildExists` if the directory already exists, othereise creates
-        a container directory and a venv for building.
+        Raises `BuildExists` if the build already exists, otherwise creates a
+        container directory, and records env in it.
 
         This function always raises an error if the build exists, even if it is
         not actually in working condition, and never attempts to fix the build.
         """
-        quintuplet = get_interpreter_quintuplet(python)
-        build_container = self._get_build_container(quintuplet)
-        build = Build(build_container)
-
-        if build_container.exists():
-            raise BuildExists(build)
-        build_container.mkdir(parents=True)
-
-        # TODO: Make prompt configurable? Include quintuplet in prompt?
-        create_venv(python=python, env_dir=build.env.root, prompt=self.name)
+        container = self._get_build_container(quintuplet)
+        index = _get_env_index(container)
+        if index.exists():
+            raise BuildExists(Build(container, env))
+        container.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(index, json.dumps({"root": str(env.root)}))
+        self.state.add("build", quintuplet, self._build_dir)
+        return Build(container, env)
+
+    def set_build_env(self, build: Build, env: BuildEnv) -> Build:
+        """Make build use another build env.
+        """
+        index = _get_env_index(build.container)
+        write_text_atomic(index, json.dumps({"root": str(env.root)}))
+        return dataclasses.replace(build, env=env)
 
-        return build
+    def clear_builds(self):
+        """Remove all builds, and anything else in the build directory.
+        """
+        _trash.discard(self._build_dir, self._trash_dir)
+        _trash.empty(self._trash_dir)
+        self.state.sync("build", self._build_dir)
 
     def remove_build(self, build: Build):
-        if build.container.exists():
-            shutil.rmtree(str(build.container))
+        # Move the build away, and delete it in the background.
+        _trash.discard(build.container, self._trash_dir)
+        _trash.empty(self._trash_dir)
+        self.state.remove("build", build.container.name, self._build_dir)
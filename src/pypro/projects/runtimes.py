@@ -12,12 +12,14 @@ __all__ = [
 ]
 
 import dataclasses
+import os
 import pathlib
-import shutil
 import typing
 
+from pypro import _trash
 from pypro.venvs import VirtualEnvironment
 
+from . import _state
 from .base import BaseProject
 from ._envs import (
     PyUnavailable,
@@ -86,14 +88,11 @@ class _QuintapletMatcher:
             raise ValueError(alias)
         return ctor(parts)
 
-    def match(self, runtime):
-        parts = runtime.name.split("-")
-        if len(parts) != 5:
-            return False
-        hash_ = parts.pop()
-        if self._hash and self._hash != hash_:
-            return False
-        return all(a == b for a, b in zip(parts, self._parts) if a and b)
+    def get_filters(self) -> typing.Dict[str, str]:
+        """Get values of quintuplet fields a runtime needs to match.
+        """
+        values = self._parts + [self._hash]
+        return {k: v for k, v in zip(_state.FIELDS, values) if v}
 
 
 @dataclasses.dataclass()
@@ -133,13 +132,13 @@ class ProjectRuntimeManagementMixin(BaseProject):
         """
         return Runtime(self._runtime_container.joinpath(name))
 
+    def _sync_runtimes(self):
+        self.state.sync("runtime", self._runtime_container)
+
     def iter_runtimes(self) -> typing.Iterator[Runtime]:
-        if not self._runtime_container.is_dir():
-            return
-        for entry in self._runtime_container.iterdir():
-            if not entry.is_dir():
-                continue
-            yield Runtime(entry)
+        self._sync_runtimes()
+        for name in self.state.find("runtime"):
+            yield self._get_runtime(name)
 
     def create_runtime(self, interpreter_spec: str) -> Runtime:
         """Create a new runtime based on given base interpreter.
@@ -154,6 +153,7 @@ class ProjectRuntimeManagementMixin(BaseProject):
 
         # TODO: Make prompt configurable? Include quintuplet in prompt?
         create_venv(python=python, env_dir=runtime.root, prompt=self.name)
+        self.state.add("runtime", runtime.name, self._runtime_container)
 
         return runtime
 
@@ -176,15 +176,16 @@ class ProjectRuntimeManagementMixin(BaseProject):
             matcher = _QuintapletMatcher.from_alias(alias)
         except ValueError:
             raise NoRuntimes(alias, list(self.iter_runtimes()))
+        self._sync_runtimes()
         matches = [
-            runtime
-            for runtime in self.iter_runtimes()
-            if matcher.match(runtime)
+            self._get_runtime(name)
+            for name in self.state.find("runtime", matcher.get_filters())
         ]
         if not matches:
             raise NoRuntimes(alias, list(self.iter_runtimes()))
         if len(matches) > 1:
             raise MultipleRuntimes(alias, matches)
+        self.state.touch("runtime", matches[0].name)
         return matches[0]
 
     def activate_runtime(self, runtime: Runtime):
@@ -200,10 +201,30 @@ class ProjectRuntimeManagementMixin(BaseProject):
         if marker.exists() and not marker.is_file():
             raise PermissionError("Not a file: {!r}".format(str(marker)))
         marker.write_text(".venvs/{}".format(runtime.name))
+        self.state.set_active(marker.stat().st_mtime_ns, runtime.name)
+        self.state.touch("runtime", runtime.name)
 
     def get_active_runtime(self) -> typing.Optional[Runtime]:
         """Get the active runtime.
+
+        The result is recorded in the project state, and reused until the
+        marker or the runtime container changes.
         """
+        try:
+            marker_mtime = os.lstat(str(self._runtime_marker)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        self._sync_runtimes()
+        usable, name = self.state.get_active(marker_mtime)
+        if not usable:
+            runtime = self._read_active_runtime()
+            name = runtime.name if runtime else None
+            self.state.set_active(marker_mtime, name)
+        if name is None or not self.state.has("runtime", name):
+            return None
+        return self._get_runtime(name)
+
+    def _read_active_runtime(self) -> typing.Optional[Runtime]:
         # Normal case: marker is a file. It should contain a relative path
         # pointing to a venv in `{root}/.venvs`.
         if self._runtime_marker.is_file():
@@ -234,5 +255,7 @@ class ProjectRuntimeManagementMixin(BaseProject):
         # Deactivate env if it is going to be removed.
         if self.get_active_runtime() == runtime:
             self._runtime_marker.unlink()
-        if runtime.exists():
-            shutil.rmtree(str(runtime.root))
+        # Move the runtime away, and delete it in the background.
+        _trash.discard(runtime.root, self._trash_dir)
+        _trash.empty(self._trash_dir)
+        self.state.remove("runtime", runtime.name, self._runtime_container)
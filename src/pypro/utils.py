@@ -1,12 +1,33 @@
-__all__ = ["find_in_paths"]
+__all__ = [
+    "PLACE_METHODS",
+    "RECORD_CSV_KWARGS",
+    "create_temp_beside",
+    "find_in_paths",
+    "get_cache_dir",
+    "hash_file",
+    "place_file",
+    "write_text_atomic",
+]
 
+import base64
+import hashlib
 import os
 import pathlib
+import shutil
+import sys
+import tempfile
 import typing
 
 
 _EnvPaths = typing.List[os.PathLike]
 
+# Same options as RECORD in wheels.
+RECORD_CSV_KWARGS: typing.Dict[str, typing.Any] = {
+    "delimiter": ",",
+    "quotechar": '"',
+    "lineterminator": "\n",
+}
+
 
 def _get_env_paths() -> _EnvPaths:
     v = os.environ.get("PATH", "")
@@ -38,3 +59,136 @@ def find_in_paths(
             if _is_executable(p):
                 return p
     return None
+
+
+def get_cache_dir() -> pathlib.Path:
+    """Get the user-level cache directory for pypro.
+
+    This can be overridden by setting ``PYPRO_CACHE_DIR``. The directory is
+    not created automatically.
+    """
+    v = os.environ.get("PYPRO_CACHE_DIR")
+    if v:
+        return pathlib.Path(v)
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return pathlib.Path(base, "pypro", "Cache")
+    if sys.platform == "darwin":
+        return pathlib.Path(os.path.expanduser("~/Library/Caches/pypro"))
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return pathlib.Path(base, "pypro")
+
+
+def write_text_atomic(path: pathlib.Path, text: str):
+    """Write text to path, replacing the existing file in one step.
+
+    Readers would see either the old content or the new, never a partially
+    written file. Parent directories are created if needed. The existing
+    file's permission bits are kept.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = path.stat().st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, temp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(temp, mode)
+        os.replace(temp, str(path))
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def create_temp_beside(path: pathlib.Path) -> pathlib.Path:
+    """Create an empty file next to path, to be moved to replace it later.
+
+    Each call gets a file of its own, so concurrent writers to the same path
+    do not write into each other's file.
+    """
+    fd, temp = tempfile.mkstemp(
+        dir=str(path.parent), prefix=".{}.".format(path.name), suffix=".tmp"
+    )
+    os.close(fd)
+    return pathlib.Path(temp)
+
+
+def hash_file(path: pathlib.Path) -> str:
+    """Hash a file's content, formatted like a hash entry in RECORD.
+    """
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    digest = base64.urlsafe_b64encode(h.digest()).rstrip(b"=")
+    return "sha256={}".format(digest.decode("ascii"))
+
+
+def _copy(source: pathlib.Path, target: pathlib.Path):
+    shutil.copy2(str(source), str(target))
+
+
+def _symlink(source: pathlib.Path, target: pathlib.Path):
+    os.symlink(str(source), str(target))
+
+
+def _hardlink(source: pathlib.Path, target: pathlib.Path):
+    os.link(str(source), str(target))
+
+
+_FICLONE = 0x40049409  # From linux/fs.h.
+
+
+def _reflink(source: pathlib.Path, target: pathlib.Path):
+    if not sys.platform.startswith("linux"):
+        raise OSError("reflink is not supported on {}".format(sys.platform))
+    import fcntl
+
+    with source.open("rb") as src, target.open("wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink()
+            raise
+    shutil.copystat(str(source), str(target))
+
+
+PLACE_METHODS = {
+    "symlink": _symlink,
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "copy": _copy,
+}
+
+
+def place_file(
+    source: pathlib.Path, target: pathlib.Path, methods: typing.List[str]
+) -> str:
+    """Place source at target with the first method that works.
+
+    Each method is a key in `PLACE_METHODS`. Returns the method used. If all
+    methods fail, the error from the last one is raised.
+
+    The file is placed at a temporary location first, and moved to replace
+    the target afterwards. We never write into the existing target, which may
+    be a link to the source.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = create_temp_beside(target)
+    for method in methods:
+        if temp.exists() or temp.is_symlink():
+            temp.unlink()
+        try:
+            PLACE_METHODS[method](source, temp)
+        except OSError:
+            if method == methods[-1]:
+                if temp.exists() or temp.is_symlink():
+                    temp.unlink()
+                raise
+            continue
+        os.replace(str(temp), str(target))
+        return method
+    raise ValueError(methods)
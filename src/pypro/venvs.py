@@ -1,5 +1,6 @@
 import dataclasses
 import pathlib
+import typing
 
 from .utils import find_in_paths
 
@@ -44,3 +45,23 @@ class VirtualEnvironment:
                 if path.is_dir():
                     return path
         raise VirtualEnvironmentInvalid(self.root)
+
+    def get_base_python(self) -> typing.Optional[pathlib.Path]:
+        """Get the interpreter the venv was created from.
+
+        Returns None if it cannot be found from ``pyvenv.cfg``.
+        """
+        try:
+            content = self.root.joinpath("pyvenv.cfg").read_text("utf-8")
+        except OSError:
+            return None
+        config = {}
+        for line in content.splitlines():
+            key, _, value = line.partition("=")
+            config[key.strip()] = value.strip()
+        if config.get("executable"):
+            return pathlib.Path(config["executable"])
+        if config.get("home"):
+            home = pathlib.Path(config["home"])
+            return find_in_paths("python", prefixes=[home])
+        return None
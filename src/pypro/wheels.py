@@ -0,0 +1,305 @@
+__all__ = [
+    "get_console_scripts",
+    "get_wheel_cache",
+    "install",
+    "install_all",
+    "unpack",
+    "write_console_scripts",
+]
+
+import base64
+import concurrent.futures
+import configparser
+import csv
+import dataclasses
+import hashlib
+import io
+import os
+import pathlib
+import posixpath
+import typing
+import zipfile
+
+from . import _store, _trace
+from .utils import (
+    RECORD_CSV_KWARGS,
+    create_temp_beside,
+    get_cache_dir,
+    hash_file,
+    write_text_atomic,
+)
+from .venvs import VirtualEnvironment
+
+
+def get_wheel_cache(quintuplet: str) -> pathlib.Path:
+    """Get the directory to keep downloaded wheels for an interpreter in.
+
+    Interpreters of the same quintuplet are compatible with the same wheels.
+    """
+    return get_cache_dir().joinpath("wheels", quintuplet)
+
+
+def unpack(wheel: pathlib.Path, target: pathlib.Path):
+    """Unpack a wheel into a directory as-is.
+
+    This does not handle ``.data`` directories; the result is only useful for
+    wheels that install everything into purelib (or platlib).
+    """
+    with zipfile.ZipFile(str(wheel)) as zf:
+        zf.extractall(str(target))
+
+
+def get_console_scripts(dist_info: pathlib.Path) -> typing.Dict[str, str]:
+    """Read console script entry points in a dist-info directory.
+
+    Returns a mapping of script names to entry point specs
+    (``module:attr``).
+    """
+    path = dist_info.joinpath("entry_points.txt")
+    if not path.is_file():
+        return {}
+    parser = configparser.ConfigParser(delimiters="=")
+    parser.optionxform = str  # type: ignore  # Keep case of script names.
+    parser.read(str(path), encoding="utf-8")
+    if not parser.has_section("console_scripts"):
+        return {}
+    return dict(parser.items("console_scripts"))
+
+
+# Same as the scripts generated by pip.
+_POSIX_SCRIPT = """\
+#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({func}())
+"""
+
+# We don't have launcher executables to use on Windows, so use a batch file.
+_WINDOWS_SCRIPT = """\
+@"{python}" -c "import sys; from {module} import {name}; sys.exit({func}())" %*
+"""
+
+
+def write_console_scripts(
+    dist_info: pathlib.Path, scripts_dir: pathlib.Path, python: pathlib.Path
+) -> typing.List[pathlib.Path]:
+    """Write console scripts declared in a dist-info directory.
+
+    Returns paths to written scripts.
+    """
+    if os.name == "nt":
+        template, suffix = _WINDOWS_SCRIPT, ".cmd"
+    else:
+        template, suffix = _POSIX_SCRIPT, ""
+    scripts_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for script_name, spec in get_console_scripts(dist_info).items():
+        module, _, func = spec.partition(":")
+        func = func.split("[", 1)[0].strip()  # Strip extras.
+        content = template.format(
+            python=python,
+            module=module.strip(),
+            name=func.split(".", 1)[0],
+            func=func,
+        )
+        path = scripts_dir.joinpath(script_name + suffix)
+        # An existing script may be linked to a blob in the store.
+        write_text_atomic(path, content)
+        path.chmod(0o755)
+        paths.append(path)
+    return paths
+
+
+# Signatures of RECORD are invalid once RECORD is rewritten, so drop them.
+_RECORD_FILES = {"RECORD", "RECORD.jws", "RECORD.p7s"}
+
+_CHUNK_SIZE = 65536
+
+
+def _find_dist_info(zf: zipfile.ZipFile) -> str:
+    names = {
+        name.split("/", 1)[0]
+        for name in zf.namelist()
+        if name.count("/") == 1 and name.endswith("/WHEEL")
+    }
+    names = {n for n in names if n.endswith(".dist-info")}
+    if len(names) != 1:
+        raise ValueError("expect one .dist-info directory: {}".format(names))
+    return names.pop()
+
+
+def _get_target(
+    member: str, data_dir: str, scheme: typing.Dict[str, str]
+) -> typing.Tuple[str, pathlib.Path]:
+    """Get the scheme key and target path of a member in a wheel.
+    """
+    parts = posixpath.normpath(member).split("/")
+    if posixpath.isabs(member) or ".." in parts:
+        raise ValueError("unsafe path in wheel: {!r}".format(member))
+    if parts[0] == data_dir and len(parts) > 2 and parts[1] in scheme:
+        return parts[1], pathlib.Path(scheme[parts[1]], *parts[2:])
+    return "purelib", pathlib.Path(scheme["purelib"], *parts)
+
+
+def _extract(
+    zf: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    target: pathlib.Path,
+    shebang: typing.Optional[bytes],
+) -> typing.Tuple[str, int]:
+    """Stream a zip member to target.
+
+    The member is hashed while being written. If shebang is given, a
+    ``#!python`` line at the start of the file is replaced by it, and the file
+    is written to target. Otherwise the file is written into the store, and
+    linked to target, so identical files across venvs share space.
+
+    Returns the RECORD hash and size of the written file.
+    """
+    h = hashlib.sha256()
+    size = 0
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if shebang is None:
+        temp = _store.create_temp()
+    else:
+        # Never write into an existing file, which may be linked elsewhere.
+        temp = create_temp_beside(target)
+    try:
+        with zf.open(info) as src, temp.open("wb") as dst:
+            if shebang is not None:
+                first = src.readline()
+                if first.rstrip() in (b"#!python", b"#!pythonw"):
+                    first = shebang
+                h.update(first)
+                dst.write(first)
+                size += len(first)
+            for chunk in iter(lambda: src.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        temp.unlink()
+        raise
+    if shebang is None:
+        executable = bool((info.external_attr >> 16) & 0o111)
+        _store.link(_store.put(temp, h.hexdigest(), executable), target)
+    else:
+        temp.chmod(0o755)
+        os.replace(str(temp), str(target))
+    digest = base64.urlsafe_b64encode(h.digest()).rstrip(b"=")
+    return "sha256={}".format(digest.decode("ascii")), size
+
+
+@dataclasses.dataclass()
+class _Paths:
+    """Paths in a venv, looked up once to be shared by installations.
+    """
+
+    root: pathlib.Path
+    python: pathlib.Path
+    site_packages: pathlib.Path
+
+    @classmethod
+    def from_env(cls, env: VirtualEnvironment) -> "_Paths":
+        return cls(env.root, env.python, env.site_packages)
+
+    def get_scheme(self, name: str) -> typing.Dict[str, str]:
+        """Get locations to install into for keys in a wheel's ``.data``.
+        """
+        if os.name == "nt":
+            headers = self.root.joinpath("Include", name)
+        else:
+            pyver = self.site_packages.parent.name  # E.g. "python3.8".
+            headers = self.root.joinpath("include", "site", pyver, name)
+        return {
+            "purelib": str(self.site_packages),
+            "platlib": str(self.site_packages),
+            "scripts": str(self.python.parent),
+            "headers": str(headers),
+            "data": str(self.root),
+        }
+
+
+def install(wheel: pathlib.Path, env: VirtualEnvironment) -> pathlib.Path:
+    """Install a wheel into a venv.
+
+    Each file is streamed from the archive into the store (see `_store`), and
+    linked into its target location. Scripts are rewritten to use the venv's
+    interpreter, and console scripts generated for entry points. INSTALLER
+    and RECORD are written last.
+
+    Returns the installed dist-info directory.
+    """
+    return _install(wheel, _Paths.from_env(env))
+
+
+@_trace.span("install wheel")
+def _install(wheel: pathlib.Path, paths: _Paths) -> pathlib.Path:
+    python = paths.python
+    site_packages = paths.site_packages
+    shebang = "#!{}\n".format(python).encode("utf-8")
+
+    rows = []
+
+    def record(path: pathlib.Path, hash_: str, size: typing.Any):
+        rows.append(
+            (os.path.relpath(str(path), str(site_packages)), hash_, size)
+        )
+
+    with zipfile.ZipFile(str(wheel)) as zf:
+        dist_info_name = _find_dist_info(zf)
+        dist_name = dist_info_name[: -len(".dist-info")]
+        data_dir = "{}.data".format(dist_name)
+        scheme = paths.get_scheme(dist_name.split("-", 1)[0])
+        for info in zf.infolist():
+            if info.filename.endswith("/"):
+                continue
+            dirname, _, basename = info.filename.rpartition("/")
+            if dirname == dist_info_name and basename in _RECORD_FILES:
+                continue
+            key, target = _get_target(info.filename, data_dir, scheme)
+            if key == "scripts":
+                hash_, size = _extract(zf, info, target, shebang)
+            else:
+                hash_, size = _extract(zf, info, target, None)
+            record(target, hash_, size)
+
+    dist_info = site_packages.joinpath(dist_info_name)
+    installer = dist_info.joinpath("INSTALLER")
+    write_text_atomic(installer, "pypro\n")
+    scripts = write_console_scripts(dist_info, python.parent, python)
+    for path in [installer] + scripts:
+        record(path, hash_file(path), path.stat().st_size)
+
+    path = dist_info.joinpath("RECORD")
+    f = io.StringIO()
+    writer = csv.writer(f, **RECORD_CSV_KWARGS)
+    writer.writerows(rows)
+    writer.writerow((os.path.relpath(str(path), str(site_packages)), "", ""))
+    write_text_atomic(path, f.getvalue())
+    return dist_info
+
+
+def install_all(
+    wheels: typing.Iterable[pathlib.Path],
+    env: VirtualEnvironment,
+    *,
+    jobs: typing.Optional[int] = None,
+) -> typing.List[pathlib.Path]:
+    """Install wheels into a venv concurrently.
+
+    Wheels are installed independently, so dependencies between them are not
+    considered. Returns installed dist-info directories, in the order of the
+    input wheels. If any wheel fails to install, its error is raised after
+    all other installations finish.
+    """
+    paths = _Paths.from_env(env)
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        futures = [executor.submit(_install, wheel, paths) for wheel in wheels]
+        concurrent.futures.wait(futures)
+    return [future.result() for future in futures]
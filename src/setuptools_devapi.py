@@ -1,14 +1,22 @@
 import csv
 import functools
+import hashlib
 import io
+import json
 import os
+import re
+import shutil
 import sys
+import threading
 import tokenize
 import tempfile
 
+from concurrent.futures import ThreadPoolExecutor
+
 import setuptools
 
 from setuptools import build_meta
+from setuptools.command.build_ext import build_ext
 from setuptools.command.build_py import build_py
 
 
@@ -20,7 +28,7 @@ def _open_setup_script(setup_script):
 
 
 # Copied from Setuptools.
-def _run_setup(self, setup_script="setup.py"):
+def _run_setup(setup_script="setup.py"):
     __file__ = setup_script
     __name__ = "__main__"
     with _open_setup_script(__file__) as f:
@@ -42,20 +50,73 @@ def _read_csv(f):
     return list(csv.reader(f, **_CSV_KWARGS))
 
 
+def _get_global_options(config_settings):
+    if config_settings and "--global-option" in config_settings:
+        return config_settings["--global-option"]
+    return []
+
+
+def _run_command(name, command_class, options, config_settings, attrs=None):
+    """Run a setup.py command with an injected command class.
+
+    The command class is combined with whatever class the project's setup.py
+    provides for the command (if any), so customizations are preserved. It is
+    given a temporary file to write its result to as CSV rows, and extra class
+    attributes from ``attrs``.
+    """
+    global_options = _get_global_options(config_settings)
+
+    with tempfile.TemporaryFile(mode="w+") as tf:
+        setuptools_setup = setuptools.setup
+
+        @functools.wraps(setuptools_setup)
+        def _patched_setup(**kwargs):
+            commands = kwargs.pop("cmdclass", {})
+            base = commands.get(name)
+            if base is None or issubclass(command_class, base):
+                bases = (command_class,)
+            else:
+                bases = (command_class, base)
+            namespace = dict(attrs or {}, _temp_file=tf)
+            commands[name] = type(command_class.__name__, bases, namespace)
+            return setuptools_setup(cmdclass=commands, **kwargs)
+
+        # Restore the patched globals afterwards, since the hook may be called
+        # many times in one process.
+        argv = sys.argv
+        setuptools.setup = _patched_setup
+        sys.argv = sys.argv[:1] + [name] + options + global_options
+        try:
+            _run_setup()
+        except SystemExit as e:
+            if e.args[0]:
+                raise
+        finally:
+            setuptools.setup = setuptools_setup
+            sys.argv = argv
+
+        return _read_csv(tf)
+
+
+def _get_installed_path(package, filename):
+    # Relative to site-packages, with "/" like RECORD, whatever the package's
+    # source directory is (e.g. "src/pkg" in a src layout).
+    parts = package.split(".") if package else []
+    return "/".join(parts + filename.split(os.sep))
+
+
 class _CollectPureCommand(build_py):
     def run(self):
         rows = [
             (
+                _get_installed_path(package, os.path.basename(mod_path)),
                 mod_path,
-                os.path.join(
-                    self.get_package_dir(package), os.path.basename(mod_path)
-                ),
             )
             for package, _, mod_path in self.find_all_modules()
         ] + [
             (
+                _get_installed_path(package, filename),
                 os.path.join(src_dir, filename),
-                os.path.join(self.get_package_dir(package), filename),
             )
             for package, src_dir, _, filenames in self.data_files
             for filename in filenames
@@ -73,32 +134,93 @@ def collect_pure_for_dev(config_settings=None):
       location (similar to RECORD's first element).
     * The path where the file is located, relative to the project root.
     """
-    global_options = []
-    if config_settings and "--global-option" in config_settings:
-        global_options = config_settings["--global-option"]
+    return _run_command("build_py", _CollectPureCommand, [], config_settings)
 
-    with tempfile.TemporaryFile(mode="w+") as tf:
 
-        class CollectPureCommand(_CollectPureCommand):
-            _temp_file = tf
+_SETUP_FILES = ["setup.py", "setup.cfg", "pyproject.toml"]
 
-        setuptools_setup = setuptools.setup
+_HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".inc", ".pxd", ".pxi")
 
-        @functools.wraps(setuptools_setup)
-        def _patched_setup(**kwargs):
-            commands = kwargs.pop("cmdclass", {})
-            commands["build_py"] = CollectPureCommand
-            return setuptools_setup(cmdclass=commands, **kwargs)
 
-        setuptools.setup = _patched_setup
-        sys.argv = sys.argv[:1] + ["build_py"] + global_options
-        try:
-            _run_setup()
-        except SystemExit as e:
-            if e.args[0]:
-                raise
+def _is_project_path(path):
+    return not os.path.isabs(path) and not path.startswith(os.pardir)
 
-        return _read_csv(tf)
+
+def _iter_headers(include_dir):
+    for root, _, filenames in os.walk(include_dir):
+        for filename in filenames:
+            if filename.endswith(_HEADER_EXTENSIONS):
+                yield os.path.join(root, filename)
+
+
+def _iter_local_headers(sources):
+    """Headers next to sources, which ``#include "..."`` finds without -I.
+    """
+    directories = {os.path.dirname(s) for s in sources if _is_project_path(s)}
+    for directory in directories:
+        if not os.path.isdir(directory or os.curdir):
+            continue
+        for filename in os.listdir(directory or os.curdir):
+            if filename.endswith(_HEADER_EXTENSIONS):
+                yield os.path.join(directory, filename)
+
+
+def _to_project_path(path):
+    try:
+        path = os.path.normpath(os.path.relpath(path))
+    except ValueError:  # On another drive.
+        return None
+    return path if _is_project_path(path) else None
+
+
+def _read_depfile(path):
+    """Read prerequisites (except the source) in a depfile written by -MMD.
+    """
+    with open(path) as f:
+        content = f.read().replace("\\\n", " ")
+    # "target: source header ...", with spaces in paths escaped.
+    parts = re.split(r":(?:\s|$)", content, maxsplit=1)
+    if len(parts) != 2:
+        return []
+    paths = re.split(r"(?<!\\)\s+", parts[1].strip())
+    return [p.replace("\\ ", " ") for p in paths[1:] if p]
+
+
+def _iter_depends(build_temp):
+    """Files compiled objects in build_temp were found to depend on.
+    """
+    for root, _, filenames in os.walk(build_temp):
+        for filename in filenames:
+            if filename.endswith(".d"):
+                for path in _read_depfile(os.path.join(root, filename)):
+                    yield path
+
+
+class _CollectTriggersCommand(build_ext):
+    def run(self):
+        paths = set()
+        include_dirs = set()
+        for ext in self.extensions or []:
+            paths.update(ext.sources)
+            paths.update(ext.depends or [])
+            paths.update(_iter_local_headers(ext.sources))
+            include_dirs.update(ext.include_dirs or [])
+        for _, build_info in self.distribution.libraries or []:
+            sources = build_info.get("sources", [])
+            paths.update(sources)
+            paths.update(build_info.get("depends", []))
+            paths.update(_iter_local_headers(sources))
+            include_dirs.update(build_info.get("include_dirs", []))
+        include_dirs.update(self.include_dirs or [])
+        for include_dir in include_dirs:
+            if _is_project_path(include_dir):
+                paths.update(_iter_headers(include_dir))
+        rows = sorted(
+            (os.path.normpath(path),)
+            for path in paths
+            if _is_project_path(path)
+        )
+        _write_csv(self._temp_file, rows)
 
 
 def get_paths_triggering_build(config_settings=None):
@@ -107,7 +229,234 @@ def get_paths_triggering_build(config_settings=None):
     This should return a list of strings specifying items on the filesystem,
     relative to the project root. Frontend is expected to call
     ``build_for_dev`` if any of them is modified later than the last build.
+
+    This includes sources and dependencies of extensions and C libraries,
+    headers next to sources or in include directories inside the project, and
+    setup files. Headers the compiler found to be included by the last build
+    are listed in ``{build_directory}/DEPENDS`` (see ``build_for_dev``).
+    """
+    rows = _run_command(
+        "build_ext", _CollectTriggersCommand, [], config_settings
+    )
+    paths = [row[0] for row in rows]
+    paths.extend(name for name in _SETUP_FILES if os.path.exists(name))
+    return paths
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy_atomic(src, dst):
+    tmp = "{}.{}.tmp".format(dst, threading.get_ident())
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _write_atomic(path, content):
+    tmp = "{}.{}.tmp".format(path, threading.get_ident())
+    with open(tmp, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _writes_depfiles(compiler):
+    # GCC and Clang, which write the headers a source includes with -MMD.
+    return compiler.compiler_type in ("unix", "cygwin", "mingw32")
+
+
+def _get_project_paths(paths, build_directory):
+    """Normalize paths in the project, outside build_directory; drop others.
     """
+    build_directory = _to_project_path(build_directory)
+    paths = (_to_project_path(p) for p in paths)
+    return sorted(
+        {
+            path
+            for path in paths
+            if path is not None
+            and not (
+                build_directory and path.startswith(build_directory + os.sep)
+            )
+        }
+    )
+
+
+class _CachedCompile(object):
+    """Wrap a compiler's ``compile`` to compile sources in parallel.
+
+    Each object file is cached in ``{build_directory}/objects``, keyed by the
+    compiler command and options, the source's path and content, and content
+    of the headers it includes. A source is only compiled if there is no
+    cached object matching the key.
+
+    If the compiler can, each object gets a depfile (``{object}.d``) listing
+    headers its source includes. Headers in the project found by the last
+    compile of a source are recorded in the cache by the rest of the key.
+    Which headers are included can only change if the source or one of them
+    changes, so the recorded ones are all that need to be checked. With
+    other compilers, content of the depends is used instead.
+    """
+
+    def __init__(self, compiler, executor, build_directory):
+        self._compiler = compiler
+        self._compile = compiler.compile
+        self._executor = executor
+        self._build_directory = build_directory
+        self._cache_dir = os.path.join(build_directory, "objects")
+
+    def _get_cached(self, key, headers, obj):
+        key = hashlib.sha256(key.encode("ascii"))
+        for header in headers:
+            if os.path.isfile(header):
+                digest = _hash_file(header)
+            else:
+                digest = ""
+            key.update("{}\0{}\0".format(header, digest).encode("utf-8"))
+        name = key.hexdigest() + os.path.splitext(obj)[1]
+        return os.path.join(self._cache_dir, name)
+
+    def __call__(
+        self,
+        sources,
+        output_dir=None,
+        macros=None,
+        include_dirs=None,
+        debug=0,
+        extra_preargs=None,
+        extra_postargs=None,
+        depends=None,
+    ):
+        kwargs = {
+            "output_dir": output_dir,
+            "macros": macros,
+            "include_dirs": include_dirs,
+            "debug": debug,
+            "extra_preargs": extra_preargs,
+            "extra_postargs": extra_postargs,
+            "depends": depends,
+        }
+        compiler = self._compiler
+        options = json.dumps(
+            [
+                compiler.compiler_type,
+                getattr(compiler, "compiler_so", None),
+                getattr(compiler, "compile_options", None),
+                macros,
+                include_dirs,
+                debug,
+                extra_preargs,
+                extra_postargs,
+            ]
+        )
+        objects = compiler.object_filenames(sources, output_dir=output_dir)
+        depfiles = _writes_depfiles(compiler)
+
+        def compile_one(source, obj):
+            # Includes are looked up next to the source, so its path matters.
+            key = hashlib.sha256(options.encode("utf-8"))
+            key.update(os.path.normpath(source).encode("utf-8"))
+            key.update(_hash_file(source).encode("ascii"))
+            key = key.hexdigest()
+            recorded = os.path.join(self._cache_dir, key + ".json")
+
+            if not depfiles:
+                headers = sorted(depends or [])
+            elif os.path.exists(recorded):
+                with open(recorded) as f:
+                    headers = json.load(f)
+            else:
+                headers = None
+            if headers is not None:
+                cached = self._get_cached(key, headers, obj)
+                if os.path.exists(cached):
+                    compiler.mkpath(os.path.dirname(obj))
+                    _copy_atomic(cached, obj)
+                    if os.path.exists(cached + ".d"):
+                        _copy_atomic(cached + ".d", obj + ".d")
+                    return
+
+            if not depfiles:
+                self._compile([source], **kwargs)
+                _copy_atomic(obj, self._get_cached(key, headers, obj))
+                return
+            postargs = ["-MMD", "-MF", obj + ".d"]
+            self._compile(
+                [source],
+                **dict(
+                    kwargs,
+                    extra_postargs=list(extra_postargs or []) + postargs,
+                )
+            )
+            headers = _get_project_paths(
+                _read_depfile(obj + ".d"), self._build_directory
+            )
+            cached = self._get_cached(key, headers, obj)
+            _copy_atomic(obj + ".d", cached + ".d")
+            _copy_atomic(obj, cached)
+            _write_atomic(recorded, json.dumps(headers))
+
+        futures = [
+            self._executor.submit(compile_one, source, obj)
+            for source, obj in zip(sources, objects)
+        ]
+        for future in futures:
+            future.result()
+        return objects
+
+
+class _BuildForDevCommand(build_ext):
+    def build_extensions(self):
+        # Compile translation units in parallel, sharing one pool between all
+        # extensions (which are also built in parallel). Compiling is done by
+        # compiler subprocesses, so threads are enough to keep cores busy.
+        if self.parallel and self.parallel is not True:
+            workers = self.parallel
+        else:
+            workers = os.cpu_count() or 1
+        self.parallel = workers
+
+        cache_dir = os.path.join(self._build_directory, "objects")
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self.compiler.compile = _CachedCompile(
+                self.compiler, executor, self._build_directory
+            )
+            super(_BuildForDevCommand, self).build_extensions()
+
+    def run(self):
+        # Compilers that write no depfiles are keyed by content of depends
+        # (see _CachedCompile). Add headers, so changing them compiles
+        # sources again.
+        for ext in self.extensions or []:
+            include_dirs = (ext.include_dirs or []) + (self.include_dirs or [])
+            ext.depends = (
+                list(ext.depends or [])
+                + [
+                    header
+                    for include_dir in include_dirs
+                    if _is_project_path(include_dir)
+                    for header in _iter_headers(include_dir)
+                ]
+                + list(_iter_local_headers(ext.sources))
+            )
+        super(_BuildForDevCommand, self).run()
+        depends = _get_project_paths(
+            _iter_depends(self.build_temp), self._build_directory
+        )
+        with open(os.path.join(self._build_directory, "DEPENDS"), "w") as f:
+            _write_csv(f, [(path,) for path in depends])
+        rows = [
+            (os.path.relpath(path, self.build_lib), path)
+            for path in self.get_outputs()
+        ]
+        _write_csv(self._temp_file, rows)
 
 
 def build_for_dev(build_directory, config_settings=None):
@@ -121,13 +470,43 @@ def build_for_dev(build_directory, config_settings=None):
       location (similar to RECORD's first element).
     * The path where the file is located, relative to ``build_directory``.
 
+    Files the build was found to depend on besides those reported by
+    ``get_paths_triggering_build`` (e.g. headers included from elsewhere) are
+    listed in ``{build_directory}/DEPENDS``, one path (relative to the project
+    root) per line. The frontend should treat them as triggers too.
+
     The hook is expected to write files into ``build_directory``, and refer
     them in ``BUILT``. The frontend is expected to pass a consistent value of
     ``build_directory`` across each ``build_for_dev`` call. The hook should
     expect the directory already containing previously-built files, and may
     choose to reuse them if it determines they do not need to be rebuilt.
     """
-    # Basically should do `setup.py build_clib build_ext`.
+    # Basically `setup.py build_clib build_ext`. build_ext runs build_clib
+    # automatically if needed. Compiled objects are cached in
+    # `{build_directory}/objects`, so only changed sources are compiled.
+    # build_ext's own check compares mtimes in whole seconds, and misses
+    # changes made within a second of the last build; the frontend only calls
+    # this after a change anyway, so extensions are always linked again.
+    options = [
+        "--force",
+        "--build-lib",
+        os.path.join(build_directory, "lib"),
+        "--build-temp",
+        os.path.join(build_directory, "temp"),
+    ]
+    rows = _run_command(
+        "build_ext",
+        _BuildForDevCommand,
+        options,
+        config_settings,
+        {"_build_directory": build_directory},
+    )
+    rows = [
+        (installed, os.path.relpath(path, build_directory))
+        for installed, path in rows
+    ]
+    with open(os.path.join(build_directory, "BUILT"), "w") as f:
+        _write_csv(f, rows)
 
 
 # Reuse PEP 517 for now. We can always change our mind and decide they need to
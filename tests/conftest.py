@@ -0,0 +1,18 @@
+import pathlib
+import sys
+
+import pytest
+
+SRC = pathlib.Path(__file__).resolve().parent.parent.joinpath("src")
+
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+
+@pytest.fixture()
+def cache_dir(tmp_path, monkeypatch):
+    """Use an empty cache directory, so the user's cache is never touched.
+    """
+    path = tmp_path.joinpath("cache")
+    monkeypatch.setenv("PYPRO_CACHE_DIR", str(path))
+    return path
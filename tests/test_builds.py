@@ -0,0 +1,127 @@
+import os
+import types
+
+import pytest
+
+from pypro.actions import builds
+from pypro.projects import Project
+
+
+def _age(path):
+    # Directory mtimes only have the resolution of the kernel's clock, so a
+    # change made right after another may not show. Start from the past.
+    os.utime(str(path), ns=(0, 0))
+
+
+@pytest.fixture()
+def project(tmp_path):
+    root = tmp_path.joinpath("project")
+    root.joinpath("src", "pkg").mkdir(parents=True)
+    root.joinpath("src", "pkg", "__init__.py").write_text("")
+    root.joinpath("setup.py").write_text("")
+    project = Project(root=root)
+    project.build_dir  # Created on first use.
+    for path in [root, root.joinpath("src"), root.joinpath("src", "pkg")]:
+        _age(path)
+    return project
+
+
+@pytest.fixture()
+def calls(monkeypatch):
+    """Record hook calls, and return the spec called as the result.
+    """
+    calls = []
+
+    def call_api_many(python, calls_, cwd):
+        calls.append([spec for spec, _ in calls_])
+        return [spec for spec, _ in calls_]
+
+    monkeypatch.setattr(builds, "_call_api_many", call_api_many)
+    monkeypatch.setattr(builds, "_inject_backend", lambda env: None)
+    return calls
+
+
+@pytest.fixture()
+def build(tmp_path):
+    return types.SimpleNamespace(
+        hook_index=tmp_path.joinpath("hooks.json"),
+        env=types.SimpleNamespace(python="python"),
+    )
+
+
+def test_tree_signature_sees_new_packages(project):
+    before = builds._get_tree_signature(project)
+    project.root.joinpath("src", "pkg", "sub").mkdir()
+    assert builds._get_tree_signature(project) != before
+
+
+def test_tree_signature_sees_first_package(project):
+    # No hook result mentions the new directory, so only the listing can tell.
+    before = builds._get_tree_signature(project)
+    project.root.joinpath("other").mkdir()
+    assert builds._get_tree_signature(project) != before
+
+
+def test_tree_signature_ignores_file_content(project):
+    before = builds._get_tree_signature(project)
+    project.root.joinpath("src", "pkg", "__init__.py").write_text("x = 1\n")
+    assert builds._get_tree_signature(project) == before
+
+
+@pytest.mark.parametrize(
+    "parts",
+    [["build"], [".git"], ["src", "__pycache__"], ["src", "pkg.egg-info"]],
+)
+def test_tree_signature_ignores_outputs(project, parts):
+    ignored = project.root.joinpath(*parts)
+    ignored.mkdir(exist_ok=True)
+    _age(ignored.parent)
+    before = builds._get_tree_signature(project)
+    ignored.joinpath("sub").mkdir()
+    ignored.joinpath("sub", "file").write_text("")
+    assert builds._get_tree_signature(project) == before
+
+
+def test_call_memoized_reuses_results(project, build, calls):
+    specs = ["a", "b"]
+    assert builds._call_memoized(project, build, specs) == specs
+    assert builds._call_memoized(project, build, specs) == specs
+    assert calls == [specs]
+
+
+def test_call_memoized_calls_missing_only(project, build, calls):
+    builds._call_memoized(project, build, ["a"])
+    assert builds._call_memoized(project, build, ["a", "b"]) == ["a", "b"]
+    assert calls == [["a"], ["b"]]
+
+
+def test_call_memoized_sees_new_packages(project, build, calls):
+    builds._call_memoized(project, build, ["a"])
+    project.root.joinpath("src", "new").mkdir()
+    builds._call_memoized(project, build, ["a"])
+    assert calls == [["a"], ["a"]]
+
+
+def test_call_memoized_sees_setup_changes(project, build, calls):
+    builds._call_memoized(project, build, ["a"])
+    setup = project.root.joinpath("setup.py")
+    setup.write_text("# changed\n")
+    builds._call_memoized(project, build, ["a"])
+    project.root.joinpath("setup.cfg").write_text("")
+    builds._call_memoized(project, build, ["a"])
+    assert calls == [["a"], ["a"], ["a"]]
+
+
+def test_call_memoized_does_not_keep_failures(
+    project, build, calls, monkeypatch
+):
+    def fail(python, calls_, cwd):
+        calls.append([spec for spec, _ in calls_])
+        return [builds.HookFailed(spec, "error") for spec, _ in calls_]
+
+    with monkeypatch.context() as m:
+        m.setattr(builds, "_call_api_many", fail)
+        with pytest.raises(builds.HookFailed):
+            builds._call_memoized(project, build, ["a"])
+    assert builds._call_memoized(project, build, ["a"]) == ["a"]
+    assert calls == [["a"], ["a"]]
@@ -0,0 +1,158 @@
+import os
+import pathlib
+import sys
+import zipfile
+
+import pytest
+
+from pypro import _trace, wheels
+from pypro.actions import dependencies
+from pypro.projects import Project
+from pypro.venvs import VirtualEnvironment
+
+
+def _make_wheel(directory: pathlib.Path, name: str, version: str):
+    dist_info = "{}-{}.dist-info".format(name, version)
+    path = directory.joinpath("{}-{}-py3-none-any.whl".format(name, version))
+    directory.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(str(path), "w") as zf:
+        zf.writestr(
+            "{}/__init__.py".format(name), "version = {!r}\n".format(version)
+        )
+        zf.writestr(
+            dist_info + "/METADATA",
+            "Metadata-Version: 2.1\nName: {}\nVersion: {}\n".format(
+                name, version
+            ),
+        )
+        zf.writestr(dist_info + "/WHEEL", "Wheel-Version: 1.0\n")
+        zf.writestr(dist_info + "/RECORD", "")
+    return path
+
+
+@pytest.fixture()
+def project(tmp_path):
+    root = tmp_path.joinpath("project")
+    root.mkdir()
+    return Project(root=root)
+
+
+@pytest.fixture()
+def runtime(tmp_path, cache_dir):
+    root = tmp_path.joinpath("venv")
+    root.joinpath("bin").mkdir(parents=True)
+    root.joinpath("bin", "python").symlink_to(sys.executable)
+    root.joinpath("lib", "python3.0", "site-packages").mkdir(parents=True)
+    return VirtualEnvironment(root)
+
+
+@pytest.fixture()
+def wheel_cache(runtime):
+    """Wheels put here are used by sync without running pip.
+    """
+    return dependencies._get_wheels_dir(runtime)
+
+
+@pytest.fixture()
+def pip(monkeypatch):
+    """Record pip downloads, which download nothing.
+    """
+    calls = []
+    monkeypatch.setattr(
+        _trace, "check_call", lambda args, **kwargs: calls.append(args)
+    )
+    return calls
+
+
+def _lock(project: Project, *lines: str):
+    path = dependencies.get_lock_path(project)
+    old = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text("".join(line + "\n" for line in lines))
+    # A rewrite may keep the mtime within the resolution of the clock.
+    if path.stat().st_mtime_ns <= old:
+        os.utime(str(path), ns=(old + 1, old + 1))
+
+
+def _installed(runtime):
+    return {
+        p.name[: -len(".dist-info")]
+        for p in runtime.site_packages.glob("*.dist-info")
+    }
+
+
+def test_no_lock_does_nothing(project, runtime, tmp_path):
+    wheels.install(_make_wheel(tmp_path, "mine", "1.0"), runtime)
+    result = dependencies.sync_dependencies(project, runtime)
+    assert result == dependencies.SyncResult(installed=[], removed=[])
+    assert _installed(runtime) == {"mine-1.0"}
+
+
+def test_installs_locked(project, runtime, wheel_cache, pip):
+    _make_wheel(wheel_cache, "spam", "1.0")
+    _lock(project, "# Comment.", "Spam==1.0 --hash=sha256:00")
+    result = dependencies.sync_dependencies(project, runtime)
+    assert result.installed == ["Spam==1.0"]
+    assert _installed(runtime) == {"spam-1.0"}
+    assert runtime.site_packages.joinpath("spam", "__init__.py").is_file()
+    assert pip == []
+
+
+def test_downloads_missing(project, runtime, pip):
+    _lock(project, "spam==1.0")
+    with pytest.raises(dependencies.WheelNotFound):
+        dependencies.sync_dependencies(project, runtime)
+    (args,) = pip
+    assert args[-1] == "spam==1.0"
+
+
+def test_skips_unchanged(project, runtime, wheel_cache, monkeypatch):
+    _make_wheel(wheel_cache, "spam", "1.0")
+    _lock(project, "spam==1.0")
+    dependencies.sync_dependencies(project, runtime)
+
+    def read_lock(path):
+        raise AssertionError("lock read again")
+
+    monkeypatch.setattr(dependencies, "_read_lock", read_lock)
+    result = dependencies.sync_dependencies(project, runtime)
+    assert result == dependencies.SyncResult(installed=[], removed=[])
+
+
+def test_replaces_changed_versions(project, runtime, wheel_cache):
+    _make_wheel(wheel_cache, "spam", "1.0")
+    _make_wheel(wheel_cache, "spam", "2.0")
+    _lock(project, "spam==1.0")
+    dependencies.sync_dependencies(project, runtime)
+    _lock(project, "spam==2.0")
+    result = dependencies.sync_dependencies(project, runtime)
+    assert result.installed == ["spam==2.0"]
+    assert _installed(runtime) == {"spam-2.0"}
+    content = runtime.site_packages.joinpath("spam", "__init__.py")
+    assert content.read_text() == "version = '2.0'\n"
+
+
+def test_removes_only_dropped(project, runtime, wheel_cache, tmp_path):
+    wheels.install(_make_wheel(tmp_path, "mine", "1.0"), runtime)
+    for name in ["spam", "eggs", "pip"]:
+        _make_wheel(wheel_cache, name, "1.0")
+    _lock(project, "spam==1.0", "eggs==1.0", "pip==1.0")
+    dependencies.sync_dependencies(project, runtime)
+
+    _lock(project, "spam==1.0")
+    result = dependencies.sync_dependencies(project, runtime)
+    assert result.removed == ["eggs"]
+    assert _installed(runtime) == {"mine-1.0", "pip-1.0", "spam-1.0"}
+    assert not runtime.site_packages.joinpath("eggs").exists()
+
+
+def test_gets_wheels_before_removing(project, runtime, wheel_cache, pip):
+    _make_wheel(wheel_cache, "spam", "1.0")
+    _make_wheel(wheel_cache, "eggs", "1.0")
+    _lock(project, "spam==1.0", "eggs==1.0")
+    dependencies.sync_dependencies(project, runtime)
+
+    # spam is dropped and eggs upgraded, but the new eggs cannot be found.
+    _lock(project, "eggs==2.0")
+    with pytest.raises(dependencies.WheelNotFound):
+        dependencies.sync_dependencies(project, runtime)
+    assert _installed(runtime) == {"eggs-1.0", "spam-1.0"}
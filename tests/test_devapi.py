@@ -0,0 +1,169 @@
+"""Call backend hooks in a project, like a hook worker does.
+"""
+
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+SRC = pathlib.Path(__file__).resolve().parent.parent.joinpath("src")
+
+_SETUP = """
+from setuptools import Extension, setup
+
+setup(name="cx", version="1.0", ext_modules=[Extension("cx", ["cext/cx.c"])])
+"""
+
+_SOURCE = """
+#include <Python.h>
+#include "val.h"
+#include "sub/other.h"
+
+static PyObject *get(PyObject *self, PyObject *args)
+{
+    return PyLong_FromLong(VAL + OTHER);
+}
+
+static PyMethodDef methods[] = {{"get", get, METH_NOARGS, ""}, {NULL}};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "cx", NULL, -1, methods
+};
+
+PyMODINIT_FUNC PyInit_cx(void) { return PyModule_Create(&module); }
+"""
+
+needs_compiler = pytest.mark.skipif(
+    shutil.which("cc") is None, reason="needs a C compiler"
+)
+
+
+def _call(root: pathlib.Path, hook: str, **kwargs):
+    code = (
+        "import json, sys; sys.path.insert(0, {!r}); "
+        "import setuptools_devapi; "
+        "result = setuptools_devapi.{}(**json.loads(sys.argv[1])); "
+        "print(json.dumps(result))"
+    ).format(str(SRC), hook)
+    out = subprocess.run(
+        [sys.executable, "-c", code, json.dumps(kwargs)],
+        cwd=str(root),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(out.splitlines()[-1])  # After setup.py's messages.
+
+
+def _get(lib: pathlib.Path, module: str = "cx") -> int:
+    code = "import sys; sys.path.insert(0, sys.argv[1]); import {0}; "
+    code += "print({0}.get())"
+    out = subprocess.run(
+        [sys.executable, "-c", code.format(module), str(lib)],
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return int(out)
+
+
+@pytest.fixture()
+def project(tmp_path):
+    root = tmp_path.joinpath("project")
+    root.joinpath("cext", "sub").mkdir(parents=True)
+    root.joinpath("setup.py").write_text(_SETUP)
+    root.joinpath("cext", "cx.c").write_text(_SOURCE)
+    root.joinpath("cext", "val.h").write_text("#define VAL 1\n")
+    root.joinpath("cext", "sub", "other.h").write_text("#define OTHER 10\n")
+    return root
+
+
+def test_triggers_include_local_headers(project):
+    paths = _call(project, "get_paths_triggering_build")
+    assert "cext/val.h" in [pathlib.Path(p).as_posix() for p in paths]
+
+
+@needs_compiler
+def test_build_finds_included_headers(project, tmp_path):
+    build = tmp_path.joinpath("build")
+    _call(project, "build_for_dev", build_directory=str(build))
+    assert _get(build.joinpath("lib")) == 11
+
+    depends = build.joinpath("DEPENDS").read_text().split()
+    assert [pathlib.Path(p).as_posix() for p in depends] == [
+        "cext/sub/other.h",
+        "cext/val.h",
+    ]
+
+    # Changed right after the build, within the same second.
+    project.joinpath("cext", "val.h").write_text("#define VAL 2\n")
+    _call(project, "build_for_dev", build_directory=str(build))
+    assert _get(build.joinpath("lib")) == 12
+
+    project.joinpath("cext", "sub", "other.h").write_text("#define OTHER 20\n")
+    _call(project, "build_for_dev", build_directory=str(build))
+    assert _get(build.joinpath("lib")) == 22
+
+
+@needs_compiler
+def test_objects_are_reused_by_included_headers(project, tmp_path):
+    build = tmp_path.joinpath("build")
+    val = project.joinpath("cext", "val.h")
+    for content, expected in [("1", 11), ("2", 12), ("1", 11)]:
+        val.write_text("#define VAL {}\n".format(content))
+        _call(project, "build_for_dev", build_directory=str(build))
+        assert _get(build.joinpath("lib")) == expected
+    assert len(list(build.joinpath("objects").glob("*.o"))) == 2
+
+
+# Identical sources, each including a header next to it.
+_TWIN_SETUP = """
+from setuptools import Extension, setup
+
+setup(
+    name="twins",
+    version="1.0",
+    ext_modules=[Extension("a", ["a/x.c"]), Extension("b", ["b/x.c"])],
+)
+"""
+
+_TWIN_SOURCE = """
+#include <Python.h>
+#include "name.h"
+
+static PyObject *get(PyObject *self, PyObject *args)
+{
+    return PyLong_FromLong(VAL);
+}
+
+static PyMethodDef methods[] = {{"get", get, METH_NOARGS, ""}, {NULL}};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, NAME, NULL, -1, methods
+};
+
+PyMODINIT_FUNC INIT(void) { return PyModule_Create(&module); }
+"""
+
+
+@needs_compiler
+def test_objects_are_not_shared_by_identical_sources(tmp_path):
+    root = tmp_path.joinpath("project")
+    root.mkdir()
+    root.joinpath("setup.py").write_text(_TWIN_SETUP)
+    for name, value in [("a", 1), ("b", 2)]:
+        root.joinpath(name).mkdir()
+        root.joinpath(name, "x.c").write_text(_TWIN_SOURCE)
+        root.joinpath(name, "name.h").write_text(
+            '#define NAME "{0}"\n#define INIT PyInit_{0}\n'
+            "#define VAL {1}\n".format(name, value)
+        )
+
+    build = tmp_path.joinpath("build")
+    _call(root, "build_for_dev", build_directory=str(build))
+    assert _get(build.joinpath("lib"), "a") == 1
+    assert _get(build.joinpath("lib"), "b") == 2
@@ -0,0 +1,82 @@
+"""Keep the start-up cost of common commands in check.
+
+pypro runs in shell hooks and editor integrations, so everything imported
+before a command starts working is paid for on every invocation. Each test
+imports what `pypro <command>` imports before running the command, in a new
+interpreter with ``-X importtime``, and checks the total against a budget.
+"""
+
+import pathlib
+import subprocess
+import sys
+import typing
+
+import pytest
+
+SRC = pathlib.Path(__file__).resolve().parent.parent.joinpath("src")
+
+# Set up the command line parser like `pypro.__main__.main`, which imports
+# the module of the command named in argv, and nothing else.
+_CODE = """
+import argparse, sys
+sys.path.insert(0, {src!r})
+import pypro.__main__
+from pypro import cli
+cli.build_subcommands(argparse.ArgumentParser().add_subparsers(), {argv!r})
+"""
+
+# Timings vary between runs; the fastest of these is checked.
+_REPEAT = 5
+
+
+def _import(argv: typing.List[str]) -> typing.Tuple[int, typing.Set[str]]:
+    """Get the total import time (in microseconds), and modules imported.
+    """
+    code = _CODE.format(src=str(SRC), argv=argv)
+    # Isolated, and without site, so only imports made by pypro are seen.
+    args = [sys.executable, "-I", "-S", "-X", "importtime", "-c", code]
+    out = subprocess.run(
+        args,
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stderr
+
+    total = 0
+    modules = set()
+    for line in out.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header.
+        modules.add(name.strip())
+        # Nested imports are indented, and included in their importer's time.
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total, modules
+
+
+# Budgets are in milliseconds, with room for slower machines. Modules listed
+# are not needed by the command, and must not be imported at all.
+@pytest.mark.parametrize(
+    "argv, budget, unwanted",
+    [
+        (
+            ["--help"],
+            100,
+            {"pypro.actions", "pypro.projects", "sqlite3", "subprocess"},
+        ),
+        (
+            ["ready"],
+            300,
+            {"pypro._seeds", "pypro._templates", "pypro._zygote"},
+        ),
+        (["run"], 300, {"pypro._seeds", "pypro._templates"}),
+    ],
+)
+def test_import_budget(argv, budget, unwanted):
+    results = [_import(argv) for _ in range(_REPEAT)]
+    total = min(t for t, _ in results) // 1000
+    assert total <= budget, "imports took {} ms".format(total)
+    assert not unwanted & results[0][1]
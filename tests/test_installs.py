@@ -0,0 +1,209 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import venv
+
+import pytest
+
+from pypro import utils
+from pypro.actions import builds, installs
+from pypro.projects import Project
+from pypro.venvs import VirtualEnvironment
+
+SRC = pathlib.Path(__file__).resolve().parent.parent.joinpath("src")
+
+_SRC_LAYOUT_SETUP = """
+from setuptools import setup
+
+setup(
+    name="pkg",
+    version="1.0",
+    package_dir={"": "src"},
+    packages=["pkg", "pkg.sub"],
+    py_modules=["top"],
+    package_data={"pkg": ["data/*.txt"]},
+)
+"""
+
+
+@pytest.fixture()
+def runtime(tmp_path):
+    root = tmp_path.joinpath("venv")
+    venv.create(str(root), with_pip=False)
+    return VirtualEnvironment(root)
+
+
+def _collect_pure(project: Project) -> builds._Files:
+    # Call the hook like a hook worker does, in the project directory.
+    code = (
+        "import json, sys; sys.path.insert(0, {!r}); "
+        "import setuptools_devapi; "
+        "print(json.dumps(setuptools_devapi.collect_pure_for_dev()))"
+    ).format(str(SRC))
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=str(project.root),
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    rows = json.loads(out.splitlines()[-1])  # After build_py's messages.
+    return builds._to_pure_files(project, rows)
+
+
+def test_src_layout(tmp_path, runtime):
+    root = tmp_path.joinpath("project")
+    for path in ["pkg/sub", "pkg/data"]:
+        root.joinpath("src", path).mkdir(parents=True)
+    root.joinpath("setup.py").write_text(_SRC_LAYOUT_SETUP)
+    root.joinpath("src", "pkg", "__init__.py").write_text("value = 1\n")
+    root.joinpath("src", "pkg", "sub", "__init__.py").write_text("")
+    root.joinpath("src", "pkg", "data", "a.txt").write_text("data\n")
+    root.joinpath("src", "top.py").write_text("")
+
+    files = _collect_pure(Project(root=root))
+    result = installs.install_project(runtime, files)
+
+    assert sorted(result.installed) == [
+        "pkg/__init__.py",
+        "pkg/data/a.txt",
+        "pkg/sub/__init__.py",
+        "top.py",
+    ]
+    code = (
+        "import pathlib, pkg, pkg.sub, top; "
+        "print(pkg.value, pathlib.Path(pkg.__file__).parent.parent)"
+    )
+    out = subprocess.run(
+        [str(runtime.python), "-c", code],
+        cwd=str(tmp_path),
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    assert out.split() == ["1", str(runtime.site_packages)]
+
+
+@pytest.fixture()
+def sources(tmp_path):
+    root = tmp_path.joinpath("sources")
+    root.joinpath("pkg", "sub").mkdir(parents=True)
+    for name in ["a.py", "b.py", "sub/c.py"]:
+        root.joinpath("pkg", name).write_text("# {}\n".format(name))
+    return root
+
+
+def _files(sources, *names):
+    return [("pkg/{}".format(n), sources.joinpath("pkg", n)) for n in names]
+
+
+def _touch(path):
+    old = path.stat().st_mtime_ns
+    os.utime(str(path), ns=(old + 1000, old + 1000))
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("not expected to be called")
+
+
+def test_skips_unchanged(runtime, sources, monkeypatch):
+    files = _files(sources, "a.py", "sub/c.py")
+    installs.install_project(runtime, files)
+
+    monkeypatch.setattr(installs, "hash_file", _fail)
+    monkeypatch.setattr(installs, "place_file", _fail)
+    result = installs.install_project(runtime, files)
+    assert result == installs.InstallResult([], [], unchanged=2)
+
+
+def test_places_changed(runtime, sources):
+    files = _files(sources, "a.py", "b.py")
+    installs.install_project(runtime, files)
+    sources.joinpath("pkg", "a.py").write_text("# changed\n")
+    _touch(sources.joinpath("pkg", "a.py"))
+
+    result = installs.install_project(runtime, files)
+    assert result == installs.InstallResult(["pkg/a.py"], [], unchanged=1)
+    content = runtime.site_packages.joinpath("pkg", "a.py").read_text()
+    assert content == "# changed\n"
+
+
+def test_touched_files_are_not_placed(runtime, sources, monkeypatch):
+    files = _files(sources, "a.py")
+    installs.install_project(runtime, files)
+    _touch(sources.joinpath("pkg", "a.py"))
+
+    with monkeypatch.context() as m:
+        m.setattr(installs, "place_file", _fail)
+        result = installs.install_project(runtime, files)
+    assert result == installs.InstallResult([], [], unchanged=1)
+
+    # The new mtime is recorded, so the file is not hashed again.
+    monkeypatch.setattr(installs, "hash_file", _fail)
+    installs.install_project(runtime, files)
+
+
+def test_removes_dropped(runtime, sources):
+    installs.install_project(runtime, _files(sources, "a.py", "sub/c.py"))
+    result = installs.install_project(runtime, _files(sources, "a.py"))
+    assert result == installs.InstallResult([], ["pkg/sub/c.py"], unchanged=1)
+    assert not runtime.site_packages.joinpath("pkg", "sub").exists()
+    assert [str(p) for p in installs.get_installed_paths(runtime)] == [
+        str(runtime.site_packages.joinpath("pkg", "a.py"))
+    ]
+
+
+def test_reads_old_manifests(runtime, sources):
+    # Written by a version that recorded fewer columns.
+    installs.get_manifest_path(runtime).write_text(
+        "pkg/a.py,sha256=spam,5\npkg/gone.py,sha256=eggs,5\n"
+    )
+    gone = runtime.site_packages.joinpath("pkg", "gone.py")
+    gone.parent.mkdir()
+    gone.write_text("")
+
+    result = installs.install_project(runtime, _files(sources, "a.py"))
+    assert result == installs.InstallResult(
+        ["pkg/a.py"], ["pkg/gone.py"], unchanged=0
+    )
+    assert not gone.exists()
+    content = runtime.site_packages.joinpath("pkg", "a.py").read_text()
+    assert content == "# a.py\n"
+
+
+def _methods(runtime):
+    entries = installs._read_manifest(installs.get_manifest_path(runtime))
+    return {name: entry.method for name, entry in entries.items()}
+
+
+def test_switching_modes(runtime, sources):
+    files = _files(sources, "a.py")
+    target = runtime.site_packages.joinpath("pkg", "a.py")
+    for mode in ["copy", "symlink", "hardlink", "copy"]:
+        result = installs.install_project(runtime, files, mode=mode)
+        assert result.installed == ["pkg/a.py"]
+        assert _methods(runtime) == {"pkg/a.py": mode}
+        assert target.is_symlink() == (mode == "symlink")
+        assert os.path.samefile(str(target), str(files[0][1])) == (
+            mode != "copy"
+        )
+    # Placing a file over a link never writes into the source.
+    assert files[0][1].read_text() == "# a.py\n"
+
+
+@pytest.mark.parametrize("mode", ["symlink", "hardlink", "reflink", "auto"])
+def test_falls_back_to_copy(runtime, sources, monkeypatch, mode):
+    def fail(source, target):
+        raise OSError("not supported")
+
+    for method in ["symlink", "hardlink", "reflink"]:
+        monkeypatch.setitem(utils.PLACE_METHODS, method, fail)
+
+    files = _files(sources, "a.py")
+    installs.install_project(runtime, files, mode=mode)
+    assert _methods(runtime) == {"pkg/a.py": "copy"}
+    target = runtime.site_packages.joinpath("pkg", "a.py")
+    assert not os.path.samefile(str(target), str(files[0][1]))
+    assert target.read_text() == "# a.py\n"
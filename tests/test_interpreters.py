@@ -0,0 +1,153 @@
+import os
+import sys
+
+import pytest
+
+from pypro import interpreters
+
+pytestmark = pytest.mark.skipif(
+    os.name == "nt", reason="fake interpreters are shell scripts"
+)
+
+# Records each launch, and runs the real interpreter.
+_FAKE_PYTHON = """\
+#!/bin/sh
+echo "$0" >> "{log}"
+exec "{python}" "$@"
+"""
+
+
+def _touch(path):
+    # A change made right after another may keep the mtime within the
+    # resolution of the clock, so make sure it moves.
+    old = path.stat().st_mtime_ns
+    os.utime(str(path), ns=(old + 1000, old + 1000))
+
+
+@pytest.fixture(autouse=True)
+def memo(monkeypatch, cache_dir):
+    """Start each test without interpreters known to the process.
+    """
+    monkeypatch.setattr(interpreters, "_memo", {})
+    monkeypatch.setattr(interpreters, "_discovery_memo", None)
+    monkeypatch.setattr(interpreters, "_get_well_known_patterns", lambda: [])
+
+
+@pytest.fixture()
+def launches(tmp_path):
+    """Paths of fake interpreters launched, in order.
+    """
+    log = tmp_path.joinpath("launches.log")
+    log.write_text("")
+
+    def read():
+        return log.read_text().splitlines()
+
+    return read
+
+
+@pytest.fixture()
+def make_python(tmp_path, launches):
+    def make(path, extra=""):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = _FAKE_PYTHON.format(
+            log=tmp_path.joinpath("launches.log"), python=sys.executable
+        )
+        path.write_text(content + extra)
+        path.chmod(0o755)
+        return path
+
+    return make
+
+
+@pytest.fixture()
+def python(tmp_path, make_python):
+    return make_python(tmp_path.joinpath("bin", "python3"))
+
+
+def _forget():
+    interpreters._memo.clear()
+
+
+def test_probe_result_is_cached(python, launches):
+    info = interpreters.get_interpreter(python)
+    assert info.version == tuple(sys.version_info[:3])
+    assert interpreters.get_interpreter(python) == info
+    _forget()  # Read from disk.
+    assert interpreters.get_interpreter(python) == info
+    assert launches() == [str(python)]
+
+
+def test_modified_interpreter_is_probed_again(python, launches):
+    interpreters.get_interpreter(python)
+    python.write_text(python.read_text() + "# Changed.\n")
+    interpreters.get_interpreter(python)
+    assert len(launches()) == 2
+
+
+def test_touched_interpreter_is_probed_again(python, launches):
+    interpreters.get_interpreter(python)
+    _touch(python)
+    _forget()
+    interpreters.get_interpreter(python)
+    assert len(launches()) == 2
+
+
+def test_replaced_interpreter_is_probed_again(
+    python, launches, make_python, tmp_path
+):
+    interpreters.get_interpreter(python)
+    stat = python.stat()
+
+    # Same content and times, but a different file.
+    new = make_python(tmp_path.joinpath("new"))
+    os.utime(str(new), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(str(new), str(python))
+    assert python.stat().st_ino != stat.st_ino
+
+    _forget()
+    interpreters.get_interpreter(python)
+    assert len(launches()) == 2
+
+
+def test_get_interpreters(python, launches, tmp_path):
+    missing = str(tmp_path.joinpath("missing"))
+    result = interpreters.get_interpreters([python, missing])
+    assert result[missing] is None
+    assert result[str(python)] == interpreters.get_interpreter(python)
+    assert len(launches()) == 1
+
+
+def test_discovery_is_reused(python, launches, monkeypatch):
+    monkeypatch.setenv("PATH", str(python.parent))
+    assert interpreters.find_by_name("python3") == python
+    version = sys.version_info
+    assert interpreters.find_by_version(version[0], version[1]) == python
+
+    def scan(path_env):
+        raise AssertionError("scanned again")
+
+    monkeypatch.setattr(interpreters, "_scan", scan)
+    monkeypatch.setattr(interpreters, "_discovery_memo", None)
+    assert interpreters.find_by_name("python3") == python
+    assert len(launches()) == 1
+
+
+def test_discovery_sees_new_interpreters(
+    python, launches, make_python, monkeypatch
+):
+    monkeypatch.setenv("PATH", str(python.parent))
+    assert interpreters.find_by_name("python3.99") is None
+
+    new = make_python(python.parent.joinpath("python3.99"))
+    _touch(python.parent)
+    assert interpreters.find_by_name("python3.99") == new
+    assert launches() == [str(python), str(new)]  # Not the old one again.
+
+
+def test_discovery_follows_path(python, make_python, monkeypatch, tmp_path):
+    other = make_python(tmp_path.joinpath("other", "python3"))
+    monkeypatch.setenv("PATH", str(python.parent))
+    assert interpreters.find_by_name("python3") == python
+    monkeypatch.setenv("PATH", str(other.parent))
+    assert interpreters.find_by_name("python3") == other
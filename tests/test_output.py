@@ -0,0 +1,60 @@
+import concurrent.futures
+import io
+import sys
+
+from pypro import _output, _trace
+
+
+def _print_both(message):
+    print(message)
+    print(message, file=sys.stderr)
+
+
+def test_prefixed():
+    out = io.StringIO()
+    err = io.StringIO()
+    with _output.redirect(out, err):
+        with _output.prefixed("[a] "):
+            print("one")
+            print("two", file=sys.stderr)
+        print("three")
+    assert out.getvalue() == "[a] one\nthree\n"
+    assert err.getvalue() == "[a] two\n"
+
+
+def test_prefixed_nests():
+    out = io.StringIO()
+    with _output.redirect(out):
+        with _output.prefixed("[a] "), _output.prefixed("[b] "):
+            print("spam")
+    assert out.getvalue() == "[a] [b] spam\n"
+
+
+def test_prefixed_completes_last_line():
+    out = io.StringIO()
+    with _output.redirect(out):
+        with _output.prefixed("[a] "):
+            print("spam", end="")
+    assert out.getvalue() == "[a] spam\n"
+
+
+def test_bind_follows_caller():
+    out = io.StringIO()
+    with _output.redirect(out), _output.prefixed("[a] "):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(_output.bind(_print_both), "spam").result()
+    assert out.getvalue() == "[a] spam\n[a] spam\n"
+
+
+def test_bind_without_redirect():
+    assert _output.bind(_print_both) is _print_both
+
+
+def test_call_relays_subprocess_output():
+    out = io.StringIO()
+    err = io.StringIO()
+    code = "import sys; print('spam'); print('eggs', file=sys.stderr)"
+    with _output.redirect(out, err), _output.prefixed("[a] "):
+        assert _trace.call([sys.executable, "-c", code]) == 0
+    assert out.getvalue() == "[a] spam\n"
+    assert err.getvalue() == "[a] eggs\n"
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from pypro._pipeline import Pipeline
+
+
+def test_results_are_passed_to_dependents():
+    pipeline = Pipeline()
+    pipeline.add("a", lambda: 2)
+    pipeline.add("b", lambda: 3)
+    pipeline.add("sum", lambda a, b: a + b, requires=["a", "b"])
+    pipeline.add("double", lambda s: s * 2, requires=["sum"])
+    assert pipeline.run() == {"a": 2, "b": 3, "sum": 5, "double": 10}
+
+
+def test_steps_wait_for_dependencies():
+    order = []
+    pipeline = Pipeline()
+    pipeline.add("first", lambda: order.append("first"))
+    pipeline.add("second", lambda _: order.append("second"), ["first"])
+    pipeline.add("third", lambda _: order.append("third"), ["second"])
+    pipeline.run()
+    assert order == ["first", "second", "third"]
+
+
+def test_independent_steps_run_concurrently():
+    # Each step waits until the other has started, which times out if they
+    # run one at a time.
+    barrier = threading.Barrier(2, timeout=5)
+    pipeline = Pipeline()
+    pipeline.add("a", barrier.wait)
+    pipeline.add("b", barrier.wait)
+    pipeline.run()
+
+
+def test_jobs_limit_concurrency():
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def step():
+        with lock:
+            running.append(None)
+            peak.append(len(running))
+        threading.Event().wait(0.01)
+        with lock:
+            running.pop()
+
+    pipeline = Pipeline(jobs=2)
+    for i in range(6):
+        pipeline.add(str(i), step)
+    pipeline.run()
+    assert max(peak) <= 2
+
+
+def test_unknown_dependency():
+    pipeline = Pipeline()
+    with pytest.raises(ValueError):
+        pipeline.add("a", lambda x: x, requires=["missing"])
+
+
+def test_error_cancels_dependents():
+    called = []
+
+    def fail():
+        raise KeyError("spam")
+
+    pipeline = Pipeline()
+    pipeline.add("fail", fail)
+    pipeline.add("after", lambda _: called.append("after"), ["fail"])
+    with pytest.raises(KeyError, match="spam"):
+        pipeline.run()
+    assert called == []
+
+
+def test_error_waits_for_running_steps():
+    started = threading.Event()
+    finished = []
+
+    def fail():
+        started.wait(5)
+        raise KeyError("spam")
+
+    def slow():
+        started.set()
+        threading.Event().wait(0.05)
+        finished.append("slow")
+
+    pipeline = Pipeline()
+    pipeline.add("fail", fail)
+    pipeline.add("slow", slow)
+    with pytest.raises(KeyError):
+        pipeline.run()
+    assert finished == ["slow"]
@@ -0,0 +1,152 @@
+import os
+import shutil
+
+import pytest
+
+from pypro.projects import Project
+from pypro.projects._state import ProjectState
+
+_NAMES = [
+    "cpython-3.11-linux-x86_64-0123abcd",
+    "cpython-3.12-linux-x86_64-4567cdef",
+    "pypy-3.11-linux-x86_64-89ab0123",
+]
+
+
+def _touch(path):
+    # A change made right after another may keep the mtime within the
+    # resolution of the clock, so make sure it moves.
+    old = path.stat().st_mtime_ns
+    os.utime(str(path), ns=(old + 1000, old + 1000))
+
+
+@pytest.fixture()
+def container(tmp_path):
+    path = tmp_path.joinpath("envs")
+    path.mkdir()
+    return path
+
+
+@pytest.fixture()
+def state(tmp_path):
+    return ProjectState(tmp_path.joinpath("state.db"))
+
+
+def test_sync_sees_changes_made_elsewhere(state, container):
+    state.sync("runtime", container)
+    assert state.find("runtime") == []
+
+    container.joinpath(_NAMES[0]).mkdir()
+    _touch(container)
+    state.sync("runtime", container)
+    assert state.find("runtime") == [_NAMES[0]]
+
+    container.joinpath(_NAMES[0]).rmdir()
+    _touch(container)
+    state.sync("runtime", container)
+    assert state.find("runtime") == []
+
+
+def test_sync_skips_unchanged_container(state, container):
+    state.sync("runtime", container)
+    mtime = container.stat().st_mtime_ns
+    container.joinpath(_NAMES[0]).mkdir()
+    os.utime(str(container), ns=(mtime, mtime))
+    state.sync("runtime", container)
+    assert state.find("runtime") == []
+
+
+def test_sync_ignores_other_entries(state, container):
+    for name in [_NAMES[0], ".pypro", "not-a-quintuplet"]:
+        container.joinpath(name).mkdir()
+    container.joinpath(_NAMES[1]).write_text("")  # Not a directory.
+    state.sync("runtime", container)
+    assert state.find("runtime") == [_NAMES[0]]
+
+
+def test_sync_missing_container(state, tmp_path):
+    state.sync("runtime", tmp_path.joinpath("missing"))
+    assert state.find("runtime") == []
+
+
+def test_add_and_remove(state, container):
+    container.joinpath(_NAMES[0]).mkdir()
+    state.add("runtime", _NAMES[0], container)
+    assert state.has("runtime", _NAMES[0])
+    shutil.rmtree(str(container.joinpath(_NAMES[0])))
+    state.remove("runtime", _NAMES[0], container)
+    assert not state.has("runtime", _NAMES[0])
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        (None, _NAMES),
+        ({"version": "3.11"}, [_NAMES[0], _NAMES[2]]),
+        ({"implementation": "cpython", "version": "3.11"}, [_NAMES[0]]),
+        ({"hash": "4567cdef"}, [_NAMES[1]]),
+        ({"machine": "arm64"}, []),
+        ({"unknown": "spam"}, _NAMES),
+    ],
+)
+def test_find_filters(state, container, filters, expected):
+    for name in _NAMES:
+        container.joinpath(name).mkdir()
+    state.sync("runtime", container)
+    assert state.find("runtime", filters) == expected
+
+
+def test_find_keeps_kinds_apart(state, tmp_path):
+    tmp_path.joinpath("runtime", _NAMES[0]).mkdir(parents=True)
+    tmp_path.joinpath("build", _NAMES[1]).mkdir(parents=True)
+    state.sync("runtime", tmp_path.joinpath("runtime"))
+    state.sync("build", tmp_path.joinpath("build"))
+    assert state.find("runtime") == [_NAMES[0]]
+    assert state.find("build") == [_NAMES[1]]
+
+
+def test_active_is_kept_for_marker_mtime(state):
+    assert state.get_active(1) == (False, None)
+    state.set_active(1, _NAMES[0])
+    assert state.get_active(1) == (True, _NAMES[0])
+    assert state.get_active(2) == (False, None)
+    state.set_active(2, None)
+    assert state.get_active(2) == (True, None)
+
+
+@pytest.fixture()
+def project(tmp_path):
+    root = tmp_path.joinpath("project")
+    for name in _NAMES[:2]:
+        root.joinpath(".venvs", name).mkdir(parents=True)
+    return Project(root=root)
+
+
+def test_active_runtime_follows_marker(project):
+    first, second = (project.find_runtime(n) for n in _NAMES[:2])
+    project.activate_runtime(first)
+    assert project.get_active_runtime() == first
+
+    # Changed outside pypro.
+    marker = project.root.joinpath(".venv")
+    marker.write_text(".venvs/{}".format(second.name))
+    _touch(marker)
+    assert project.get_active_runtime() == second
+
+    marker.unlink()
+    assert project.get_active_runtime() is None
+
+
+def test_active_runtime_removed_elsewhere(project):
+    runtime = project.find_runtime(_NAMES[0])
+    project.activate_runtime(runtime)
+    shutil.rmtree(str(runtime.root))
+    _touch(runtime.root.parent)
+    assert project.get_active_runtime() is None
+
+
+def test_find_runtime_sees_runtimes_added_elsewhere(project):
+    project.find_runtime("3.11")
+    project.root.joinpath(".venvs", _NAMES[2]).mkdir()
+    _touch(project.root.joinpath(".venvs"))
+    assert project.find_runtime("pypy-3.11").name == _NAMES[2]
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import pathlib
+
+from pypro import _store
+
+
+def _write(path: pathlib.Path, content: bytes, mode: int = 0o644):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    path.chmod(mode)
+    return path
+
+
+def _put(content: bytes, executable: bool = False) -> pathlib.Path:
+    temp = _store.create_temp()
+    temp.write_bytes(content)
+    digest = hashlib.sha256(content).hexdigest()
+    return _store.put(temp, digest, executable)
+
+
+def test_put_stores_content_once(cache_dir):
+    first = _put(b"spam")
+    second = _put(b"spam")
+    assert first == second
+    assert first.read_bytes() == b"spam"
+    assert _store.get_usage().files == 1
+    assert not any(cache_dir.joinpath("store", "tmp").iterdir())
+
+
+def test_put_keeps_executables_apart(cache_dir):
+    plain = _put(b"spam")
+    executable = _put(b"spam", executable=True)
+    assert plain != executable
+    assert executable.stat().st_mode & 0o111
+    assert not plain.stat().st_mode & 0o111
+
+
+def test_link_tree_shares_identical_files(cache_dir, tmp_path):
+    a = _write(tmp_path.joinpath("a", "mod.py"), b"x = 1\n")
+    b = _write(tmp_path.joinpath("b", "mod.py"), b"x = 1\n")
+
+    # The first file is adopted as the stored one; nothing to reclaim.
+    assert _store.link_tree(a.parent) == (0, 0)
+    assert _store.link_tree(b.parent) == (1, len(b"x = 1\n"))
+    assert os.path.samefile(str(a), str(b))
+    assert a.stat().st_nlink == 3  # Both files, and the store.
+
+
+def test_link_tree_copies_files_linked_elsewhere(cache_dir, tmp_path):
+    # e.g. a file hardlinked from a project's sources.
+    source = _write(tmp_path.joinpath("project", "mod.py"), b"x = 1\n")
+    target = tmp_path.joinpath("venv", "mod.py")
+    target.parent.mkdir()
+    os.link(str(source), str(target))
+
+    _store.link_tree(target.parent)
+
+    assert target.stat().st_nlink == 2
+    store = cache_dir.joinpath("store")
+    (blob,) = [p for p in store.rglob("*") if p.is_file()]
+    assert not os.path.samefile(str(blob), str(source))
+
+    # Editing the source must not change the stored content.
+    source.write_bytes(b"x = 2\n")
+    assert blob.read_bytes() == b"x = 1\n"
+
+
+def test_link_tree_leaves_excluded_files(cache_dir, tmp_path):
+    excluded = _write(tmp_path.joinpath("venv", "a.py"), b"a\n")
+    included = _write(tmp_path.joinpath("venv", "b.py"), b"b\n")
+
+    _store.link_tree(excluded.parent, exclude=[excluded])
+
+    assert excluded.stat().st_nlink == 1
+    assert included.stat().st_nlink == 2
+    assert _store.get_usage().files == 1
+
+
+def test_link_tree_leaves_other_permissions(cache_dir, tmp_path):
+    path = _write(tmp_path.joinpath("venv", "secret"), b"s\n", mode=0o600)
+    _store.link_tree(path.parent)
+    assert path.stat().st_nlink == 1
+    assert os.stat(str(path)).st_mode & 0o777 == 0o600
+    assert _store.get_usage().files == 0
+
+
+def test_collect_garbage_removes_unreferenced(cache_dir, tmp_path):
+    kept = _write(tmp_path.joinpath("a", "kept.py"), b"kept\n")
+    removed = _write(tmp_path.joinpath("a", "removed.py"), b"removed\n")
+    _store.link_tree(kept.parent)
+    removed.unlink()
+
+    assert _store.get_usage().unreferenced == len(b"removed\n")
+    assert _store.collect_garbage() == (1, len(b"removed\n"))
+
+    usage = _store.get_usage()
+    assert usage.files == 1
+    assert usage.unreferenced == 0
+    assert kept.read_bytes() == b"kept\n"
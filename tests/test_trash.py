@@ -0,0 +1,109 @@
+import pathlib
+import time
+
+import pytest
+
+from pypro import _trash
+
+
+def _make_tree(root: pathlib.Path, files: int = 3) -> pathlib.Path:
+    root.joinpath("sub", "deeper").mkdir(parents=True)
+    for i in range(files):
+        root.joinpath("sub", "file{}".format(i)).write_text(str(i))
+    root.joinpath("sub", "deeper", "file").write_text("")
+    readonly = root.joinpath("readonly")
+    readonly.write_text("")
+    readonly.chmod(0o444)
+    return root
+
+
+@pytest.fixture()
+def trash(tmp_path):
+    return tmp_path.joinpath("trash")
+
+
+def test_discard_moves_into_trash(tmp_path, trash):
+    tree = _make_tree(tmp_path.joinpath("tree"))
+    inode = tree.stat().st_ino
+    _trash.discard(tree, trash)
+    assert not tree.exists()
+    (moved,) = trash.iterdir()
+    assert moved.name.startswith("tree-")
+    assert moved.stat().st_ino == inode
+    assert moved.joinpath("sub", "file0").read_text() == "0"
+
+
+def test_discard_same_name_twice(tmp_path, trash):
+    for _ in range(2):
+        _trash.discard(_make_tree(tmp_path.joinpath("tree")), trash)
+    assert len(list(trash.iterdir())) == 2
+
+
+def test_discard_missing(tmp_path, trash):
+    _trash.discard(tmp_path.joinpath("missing"), trash)
+    assert not trash.exists()
+
+
+def test_discard_deletes_if_not_movable(tmp_path, trash, monkeypatch):
+    def rename(self, target):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(pathlib.Path, "rename", rename)
+    tree = _make_tree(tmp_path.joinpath("tree"))
+    _trash.discard(tree, trash)
+    assert not tree.exists()
+    assert list(trash.iterdir()) == []
+
+
+def test_empty_removes_everything(tmp_path, trash):
+    _trash.discard(_make_tree(tmp_path.joinpath("a"), files=600), trash)
+    _trash.discard(_make_tree(tmp_path.joinpath("b")), trash)
+    _trash._empty(trash, jobs=2)
+    assert list(trash.iterdir()) == []
+
+
+def test_empty_leaves_link_targets(tmp_path, trash):
+    outside = _make_tree(tmp_path.joinpath("outside"))
+    tree = tmp_path.joinpath("tree")
+    tree.mkdir()
+    tree.joinpath("link").symlink_to(outside, target_is_directory=True)
+    _trash.discard(tree, trash)
+    _trash._empty(trash)
+    assert list(trash.iterdir()) == []
+    assert outside.joinpath("sub", "file0").read_text() == "0"
+
+
+def test_empty_finishes_interrupted_runs(tmp_path, trash):
+    # Left by a run that claimed the content and stopped halfway.
+    stale = trash.joinpath(".emptying-0123", "tree-0123")
+    _make_tree(stale)
+    stale.joinpath("sub", "file0").unlink()
+    _trash.discard(_make_tree(tmp_path.joinpath("tree")), trash)
+
+    _trash._empty(trash)
+    assert list(trash.iterdir()) == []
+
+
+def test_empty_in_background(tmp_path, trash):
+    _trash.discard(_make_tree(tmp_path.joinpath("tree")), trash)
+    _trash.empty(trash)
+    deadline = time.monotonic() + 30
+    while any(trash.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert list(trash.iterdir()) == []
+
+
+def test_empty_in_place_if_not_started(tmp_path, trash, monkeypatch):
+    def popen(*args, **kwargs):
+        raise OSError("cannot start")
+
+    monkeypatch.setattr(_trash.subprocess, "Popen", popen)
+    _trash.discard(_make_tree(tmp_path.joinpath("tree")), trash)
+    _trash.empty(trash)
+    assert list(trash.iterdir()) == []
+
+
+def test_empty_missing_trash(trash):
+    _trash.empty(trash)
+    assert not trash.exists()
+
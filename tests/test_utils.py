@@ -0,0 +1,31 @@
+import concurrent.futures
+import os
+
+import pytest
+
+from pypro import utils
+
+
+def test_place_file_concurrently(tmp_path):
+    sources = []
+    for i in range(4):
+        sources.append(tmp_path.joinpath("source{}".format(i)))
+        sources[-1].write_text(str(i))
+    target = tmp_path.joinpath("target", "file")
+
+    def place(source):
+        for _ in range(50):
+            utils.place_file(source, target, ["copy"])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(place, sources))
+
+    assert target.read_text() in {"0", "1", "2", "3"}
+    assert os.listdir(str(target.parent)) == ["file"]
+
+
+def test_place_file_cleans_up_failures(tmp_path):
+    target = tmp_path.joinpath("target", "file")
+    with pytest.raises(OSError):
+        utils.place_file(tmp_path.joinpath("missing"), target, ["copy"])
+    assert os.listdir(str(target.parent)) == []
@@ -0,0 +1,21 @@
+import types
+
+from pypro.actions import venvs
+from pypro.actions._errors import VENV_NOT_FOUND
+from pypro.projects import Project
+
+
+def test_add_reports_any_failure(tmp_path, monkeypatch, capsys):
+    def create_runtime(self, python):
+        if python == "bad":
+            raise RuntimeError("boom")
+        return types.SimpleNamespace(name=python)
+
+    monkeypatch.setattr(Project, "create_runtime", create_runtime)
+    project = Project(root=tmp_path)
+
+    assert venvs.add(project, ["good", "bad"]) == VENV_NOT_FOUND
+
+    out, err = capsys.readouterr()
+    assert "[good] Created runtime 'good'\n" in out
+    assert "[bad] Error: Failed to create runtime\n[bad] boom\n" in err
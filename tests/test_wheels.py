@@ -0,0 +1,31 @@
+import os
+import pathlib
+
+from pypro import _store, wheels
+
+
+def _write_entry_points(dist_info: pathlib.Path, *lines: str):
+    dist_info.mkdir(parents=True, exist_ok=True)
+    content = "[console_scripts]\n" + "".join(line + "\n" for line in lines)
+    dist_info.joinpath("entry_points.txt").write_text(content)
+
+
+def test_console_scripts_replace_linked_files(cache_dir, tmp_path):
+    dist_info = tmp_path.joinpath("spam-1.0.dist-info")
+    _write_entry_points(dist_info, "spam = spam:main")
+    scripts_dir = tmp_path.joinpath("bin")
+    script = scripts_dir.joinpath("spam" if os.name != "nt" else "spam.cmd")
+    scripts_dir.mkdir()
+    script.write_text("old\n")
+    _store.link_tree(scripts_dir)
+    (blob,) = [
+        p for p in cache_dir.joinpath("store").rglob("*") if p.is_file()
+    ]
+
+    python = tmp_path.joinpath("python")
+    assert wheels.write_console_scripts(dist_info, scripts_dir, python) == [
+        script
+    ]
+    assert "from spam import main" in script.read_text()
+    assert os.access(str(script), os.X_OK)
+    assert blob.read_text() == "old\n"